@@ -1,3 +1,7 @@
 from .core import *
 from .data import *
+from .market_store import *
+from .vol_store import *
+from .trading_calendar import *
+from .fetch import *
 from .data_handler import *
\ No newline at end of file
@@ -2,4 +2,12 @@ from .engine import *
 from .portfolio import *
 from .position import *
 from .performance import *
-from .utils import *
\ No newline at end of file
+from .utils import *
+from .history import *
+from .records import *
+from .pricing import *
+from .equity import *
+from .sweep import *
+from .vectorized import *
+from .factors import *
+from .indicators import *
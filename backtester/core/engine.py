@@ -3,15 +3,26 @@ from ..data_handler import MarketDataHandler
 from .portfolio import Portfolio
 from .position import *
 from .utils import *
+from .history import History
+from .records import RecordBuffer
+from .equity import EquityTracker
+from .vectorized import weights_backtest
+from .factors import FactorPanel, FactorCache, data_version, factor_key
+from ..trading_calendar import trading_days
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 import pandas as pd
+import numpy as np
 from datetime import datetime, date, timedelta 
 from typing import List, Dict, Any
 
 class Backtester(ABC):
     def __init__(self, universe, start_date, end_date,
                  starting_balance, max_leverage, 
-                 frequency = 'EOD', rebuild = False):
+                 frequency = 'EOD', rebuild = False, lookback = None, record_positions = True,
+                 factor_cache = True):
         self.universe = universe
         self.start_iso = start_date
         self.end_iso = end_date
@@ -27,22 +38,39 @@ class Backtester(ABC):
         self.calendar = ql.TARGET()
 
         self.rebuild = rebuild
+        # giorni di warm-up caricati prima di start_date (None = tutta la storia disponibile)
+        self.lookback = lookback
         self.portfolio = Portfolio()
 
         # crea il grid di date in base alla necessità di input se presenti o no
         self.valid_dates = []
         self.unprocessed_dates = []
+        # giorni di trading del periodo, disponibilità (giorni x price_tickers) e righe dello store EOD dei valid_dates
+        self.grid_dates = np.array([], dtype='datetime64[D]')
+        self.availability = np.zeros((0, len(universe)), dtype=bool)
+        self.grid_rows = np.array([], dtype=np.int64)
 
         self.history = {}
-        self.positions_summary = pd.DataFrame()
+        # riepilogo posizioni step per step, materializzato in positions_summary solo quando serve
+        self.summary_buffer = RecordBuffer()
+        # con record_positions=False non si registra il riepilogo per posizione, solo la curva di equity
+        self.record_positions = record_positions
+        self.equity = EquityTracker(starting_balance)
         self.period_pnl = None
 
         self.price_tickers = universe
         self.vol_tickers = []
         self.market =  MarketDataHandler()
-        self.market.load_market(self.universe, self.start_iso, self.end_iso, self.rebuild)
+        self.market.load_market(self.universe, self.start_iso, self.end_iso,
+                                rebuild=self.rebuild, lookback=self.lookback)
         self.factors = []
-        self.factors_df = pd.DataFrame()
+        # fattori calcolati come array allineati (vedi FactorPanel), con factor_cache riletti da disco se già calcolati
+        self.factor_cache = factor_cache
+        self.factor_panel = FactorPanel([], {}, {})
+        # vista point-in-time dei fattori allo step corrente: {nome: DataFrame} e array senza copie
+        self.factor_view = self.factor_panel
+        self._factors_df = None
+        self._factors_history = None
 
     @abstractmethod
     def on_data(self):
@@ -51,6 +79,53 @@ class Backtester(ABC):
         """
         pass
 
+    @property
+    def positions_summary(self) -> pd.DataFrame:
+        return self.summary_buffer.to_frame()
+
+    @property
+    def factors_df(self) -> pd.DataFrame:
+        """Tutti i fattori in un DataFrame a MultiIndex (fattore, simbolo), costruito solo se richiesto."""
+        if self._factors_df is None:
+            self._factors_df = self.factor_panel.to_frame()
+        return self._factors_df
+
+    @property
+    def factors_history(self) -> pd.DataFrame:
+        """
+        factors_df fino alla data dello step corrente (MultiIndex (fattore, simbolo) sulle colonne),
+        costruito solo se richiesto; factor_view dà gli stessi dati senza passare da un DataFrame unico.
+        """
+        if self._factors_history is None or self._factors_history[0] is not self.factor_view:
+            view = self.factor_view
+            self._factors_history = (view, self.factors_df.iloc[view.start:view.stop])
+        return self._factors_history[1]
+
+    @property
+    def equity_curve(self) -> pd.DataFrame:
+        """Equity, massimo storico, drawdown, pnl realizzato/non realizzato e turnover per step (vedi EquityTracker)."""
+        return self.equity.to_frame()
+
+    @property
+    def greeks(self) -> dict:
+        """Greche del portafoglio per sottostante alla data corrente (vedi Portfolio.greeks), calcolate solo se richieste."""
+        return self.portfolio.greeks(self.pricing_data(self.ref_date))
+
+    def pricing_data(self, date_iso: str) -> dict:
+        """
+        Dati di mercato per valutare le opzioni alla data: {'ref_date' (date), 'equity', 'rate', 'volatility'},
+        con i prezzi dello snapshot di history e tassi e superfici di volatilità associati alla data
+        (market.market_data.extra, gli stessi che lo snapshot espone).
+        """
+        snapshot = self.history[date_iso]
+        extra = self.market.market_data.extra(date_iso)
+        return {
+            'ref_date': date.fromisoformat(date_iso),
+            'equity': snapshot['equity'],
+            'rate': extra['rate'],
+            'volatility': extra['volatility'],
+        }
+
     @staticmethod
     def get_dates_between(start_date, end_date):
         dates = []
@@ -61,6 +136,8 @@ class Backtester(ABC):
         return dates
     
     def prices_to_df(self, field = 'close'):
+        if isinstance(self.history, History):
+            return self.history.to_frame(field)
         data = {}
         
         for date, market_data in self.history.items():
@@ -77,23 +154,37 @@ class Backtester(ABC):
 
     def _create_date_grid(self):
         """ 
-        crea la griglia di date per il backtest escludendo i festivi e i giorni non presenti in database
+        crea la griglia di date per il backtest escludendo i festivi e i giorni non presenti in database.
+        La griglia è calcolata in blocco: giorni di trading del calendario intersecati con l'indice dello store EOD,
+        disponibilità dei prezzi come maschera (giorni x price_tickers).
         """
         if self.frequency == 'EOD':
-            for backtest_date in self.backtest_dates:
-                if self.calendar.isHoliday(ql.Date.from_date(backtest_date)):
-                    continue
-                try:
-                    [self.market.market_data[backtest_date.isoformat()]['EOD']['equity'][p]['close'] for p in self.price_tickers]
-                except:
-                    self.unprocessed_dates.append(backtest_date)
-                    continue
-                try:
-                    [self.market.market_data[backtest_date.isoformat()]['EOD']['volatility'][p] for p in self.vol_tickers]
-                except:
-                    self.unprocessed_dates.append(backtest_date)
-                    continue
-                self.valid_dates.append(backtest_date)
+            store = self.market.eod_store
+            days = trading_days(self.start_date, self.end_date, self.calendar)
+            index = store.index.astype('datetime64[D]')
+            rows = np.searchsorted(index, days)
+            in_store = rows < len(index)
+            in_store[in_store] = index[rows[in_store]] == days[in_store]
+            rows = np.where(in_store, rows, 0)
+
+            # i ticker assenti dallo store restano non disponibili
+            availability = np.zeros((len(days), len(self.price_tickers)), dtype=bool)
+            known = [j for j, p in enumerate(self.price_tickers) if p in store.ticker_index]
+            cols = [store.col(self.price_tickers[j]) for j in known]
+            availability[:, known] = ~np.isnan(store.field('close')[rows][:, cols]) & in_store[:, None]
+            valid = availability.all(axis=1) & in_store
+
+            # le volatilità non sono nello store: controllo puntuale solo sui giorni già validi
+            if self.vol_tickers:
+                for i in np.flatnonzero(valid):
+                    volatility = self.market.market_data.extra(str(days[i])).get('volatility', {})
+                    valid[i] = all(p in volatility for p in self.vol_tickers)
+
+            self.grid_dates = days
+            self.availability = availability
+            self.grid_rows = rows[valid]
+            self.valid_dates = days[valid].astype(object).tolist()
+            self.unprocessed_dates = days[~valid].astype(object).tolist()
 
     def _on_start(self):
         ''' 
@@ -107,23 +198,51 @@ class Backtester(ABC):
             raise ValueError("No date available")
         self.first_date = self.valid_dates[0]
         self.last_date = self.valid_dates[-1]
+        # history cresce di uno step alla volta nel backtest, _day_history serve get_history
+        self.history = History(self.market.market_data, self.grid_rows, self.valid_dates, self.frequency)
+        self._day_history = History(self.market.market_data, self.grid_rows, self.valid_dates, None)
         self._compute_all_factors()
 
-    def _compute_all_factors(self) -> pd.DataFrame: ## da aggiungere in on_start, aggiungere self.factors = []
+    def _compute_all_factors(self):
         """
-        Calcola tutti i fattori, produce un unico DataFrame a MultiIndex:
-        livello 0 = nome del fattore, livello 1 = simbolo.
+        Calcola tutti i fattori come array allineati (date x simboli) in factor_panel, una volta sola per backtest.
+        Con factor_cache i fattori che dichiarano param_names sono salvati in cache/factors con chiave (classe,
+        parametri, universo, versione dei dati) e riletti memory-mapped nei run successivi. factor_view è la vista point-in-time dello step.
         """
-        if self.factors == []:
-            return
-        # 1) calcola ciascun DataFrame
-        factor_dfs = {
-            # uso il nome classe minuscolo come chiave del fattore
-            f.__class__.__name__.lower(): f.compute()
-            for f in self.factors
-        }
-        # 2) concatena orizzontalmente con MultiIndex sulle colonne
-        self.factors_df = pd.concat(factor_dfs, axis=1, names=['factor', 'symbol'])
+        self._factors_df = None
+        entries = {}
+        if self.factors:
+            version = None
+            if self.factor_cache:
+                meta = os.path.join(self.market._cache_path("EOD"), "meta.json")
+                version = data_version(meta, self.market.eod_store)
+            # senza cache di mercato su disco non c'è una versione dei dati: nessuna cache dei fattori
+            cache = FactorCache(self.market._cache_path("factors")) if version is not None else None
+            for factor in self.factors:
+                # chiave del fattore: il suo name se indicato, altrimenti il nome classe minuscolo
+                name = getattr(factor, 'name', None) or factor.__class__.__name__.lower()
+                cached = cache is not None and factor.param_names is not None
+                key = factor_key(factor, self.market.eod_store.tickers, version) if cached else None
+                entry = cache.load(key) if cached else None
+                if entry is None:
+                    entry = FactorPanel.frame_arrays(factor.compute())
+                    if cached:
+                        cache.save(key, *entry)
+                entries[name] = entry
+            self._check_factor_lookback()
+        self.factor_panel = FactorPanel.from_arrays(entries)
+        self.factor_view = self.factor_panel
+        # righe dei fattori da first_date (compresa) e fino alla data di ogni step (compresa)
+        self._factor_start = int(np.searchsorted(self.factor_panel.dates, self.history.dates[0])) if len(self.history.dates) else 0
+        self._factor_stops = np.searchsorted(self.factor_panel.dates, self.history.dates, side='right')
+
+    def _check_factor_lookback(self):
+        """Avvisa se il warm-up caricato prima di start_date è più corto del lookback dichiarato dai fattori."""
+        needed = max(getattr(factor, 'lookback', 0) or 0 for factor in self.factors)
+        loaded = int(self.grid_rows[0]) if len(self.grid_rows) else 0
+        if loaded < needed:
+            print(f"Attenzione: {loaded} giorni di warm-up caricati, i fattori ne richiedono {needed} "
+                  f"(aumentare lookback).")
 
     def factor_data(self, ticker: str) -> pd.DataFrame:
         """
@@ -142,7 +261,7 @@ class Backtester(ABC):
         """ Compra o vendi se c'è margine disponibile. """
         
         if assettype == AssetType.EQUITY:
-            position = EquityPosition(ticker, quantity, market, side)
+            position = EquityPosition(ticker, quantity, market, side, trade_ids=self.portfolio.trade_ids)
         else:
             raise ValueError("Tipo di asset non supportato.")
         self.portfolio.add_position(position)
@@ -151,53 +270,305 @@ class Backtester(ABC):
         ''' 
         ritorna tutti i dati disponibili fino alla ref_date in formato history come viene passato al backtester
         '''
-        history = {}
-        for backtest_date in self.valid_dates:
-            if backtest_date > datetime.strptime(ref_date, '%Y-%m-%d').date():
-                break 
-            history[backtest_date.isoformat()] = self.market.market_data[backtest_date.isoformat()]
-        return history
+        if not self.valid_dates:
+            return {}
+        t = int(np.searchsorted(self._day_history.dates, np.datetime64(ref_date, 'D'), side='right'))
+        return self._day_history.until(t)
     
+    def on_train(self, train_dates: list):
+        """
+        Hook opzionale del walk-forward, chiamato prima di ogni finestra di test con le date di train:
+        history, factor_view e factors_history arrivano fino all'ultima data di train. Da usare per stimare i parametri
+        e azzerare lo stato della strategia; di default non fa nulla.
+        """
+        pass
+
+    def _reset_state(self):
+        """Azzera lo stato di un run: portafoglio (con un nuovo allocatore degli id dei trade), balance, riepiloghi, equity."""
+        self.portfolio = Portfolio()
+        self.balance = {}
+        self.summary_buffer.clear()
+        self.period_pnl = None
+        self.ref_dates = []
+
     def backtest(self):
         """ chiama in automatico on_data a ogni iterazione e aggiorna history con i valori noti fino alla data"""
         self._on_start()
-        self.positions_summary = pd.DataFrame()
-        self.ref_dates = []
-        self.ref_date = self.first_date
-        self.balance[self.first_date.isoformat()] = self.starting_balance
+        self._run(0, len(self.valid_dates))
 
-        for i, backtest_date in enumerate(self.valid_dates):
-            self.history[backtest_date.isoformat()] = self.market.market_data[backtest_date.isoformat()][self.frequency]
-            if backtest_date == self.last_date:
+    def _run(self, start: int, end: int):
+        """
+        Esegue on_data sugli step [start, end) della griglia partendo da uno stato vuoto;
+        all'ultimo step chiude tutte le posizioni. history vede sempre tutti i giorni fino allo step corrente.
+        """
+        self._reset_state()
+        dates = self.valid_dates[start:end]
+        first_date, last_date = dates[0], dates[-1]
+        self.equity.start(len(dates))
+        self.ref_date = first_date
+        self.balance[first_date.isoformat()] = self.starting_balance
+
+        for i, backtest_date in enumerate(dates, start):
+            self.history.advance(i + 1)
+            if backtest_date == last_date:
                 self.ref_dates.append(backtest_date)
                 self.portfolio.close_all_positions(self.history[backtest_date.isoformat()])
-                self.factors_history = self.factors_df.loc[self.first_date.isoformat():self.last_date.isoformat()]
+                self.factor_view = self.factor_panel.until(self._factor_start, self._factor_stops[i])
             else:
                 self.ref_dates.append(backtest_date.isoformat())
                 self.ref_date = self.ref_dates[-1] 
-                self.factors_history = self.factors_df.loc[self.first_date.isoformat():self.ref_date]
+                self.factor_view = self.factor_panel.until(self._factor_start, self._factor_stops[i])
                 self.on_data()
-            summary = pd.DataFrame(self.portfolio.get_positions_summary(self.history[backtest_date.isoformat()]))
-            self.positions_summary = pd.concat([self.positions_summary, summary], axis = 0)
-            if summary.empty:
-                pnl = 0
+            snapshot = self.history[backtest_date.isoformat()]
+            if self.record_positions:
+                summary = self.portfolio.positions_columns(snapshot)
+                self.summary_buffer.extend(summary)
+                if len(summary['global_pnl']) == 0:
+                    pnl = 0
+                else:
+                    pnl = np.sum(summary['global_pnl'])
             else:
-                pnl = summary['global_pnl'].sum()
+                pnl = self.portfolio.global_pnl(snapshot) if self.portfolio.positions else 0
             self.balance[backtest_date.isoformat()] = self.starting_balance + pnl
+            self.equity.update(backtest_date.isoformat(), pnl, self.portfolio.get_closed_pnl(),
+                               self.portfolio.get_turnover(), len(self.portfolio.positions))
+        if not self.record_positions:
+            # stesse righe di positions_summary: solo le date con almeno una posizione
+            curve = self.equity_curve
+            curve = curve[curve['positions'] > 0]
+            if curve.empty:
+                return
+            self.period_pnl = pd.DataFrame({'ref_date': curve['ref_date'].to_numpy(),
+                                            'daily_pnl': curve['equity'].to_numpy()})
+            return
         if self.positions_summary.empty:
             return
         self.period_pnl = self.positions_summary.groupby('ref_date')['global_pnl'].sum().reset_index() 
         self.period_pnl = self.period_pnl.rename(columns={'global_pnl': 'daily_pnl'})
         self.period_pnl['daily_pnl'] = self.period_pnl['daily_pnl'] + self.starting_balance
 
+    def _run_window(self, window: tuple) -> dict:
+        """Train e test di una finestra (indici della griglia), ritorna i risultati del test."""
+        train_start, train_end, test_start, test_end = window
+        self.history.advance(train_end)
+        self.ref_date = self.valid_dates[train_end - 1].isoformat()
+        self.factor_view = self.factor_panel.until(self._factor_start, self._factor_stops[train_end - 1])
+        self.on_train(self.valid_dates[train_start:train_end])
+        self._run(test_start, test_end)
+        return {
+            'train': (self.valid_dates[train_start], self.valid_dates[train_end - 1]),
+            'test': (self.valid_dates[test_start], self.valid_dates[test_end - 1]),
+            'equity_curve': self.equity_curve,
+            'positions_summary': self.positions_summary,
+            'period_pnl': self.period_pnl,
+        }
+
+    def walk_forward(self, train: int, test: int, step: int = None, anchored: bool = False,
+                     workers: int = 1) -> pd.DataFrame:
+        """
+        Walk-forward sulla griglia delle date valide: finestre di train di train giorni seguite da test giorni
+        di test, spostate di step giorni (default test). Con anchored=True il train parte sempre dal primo giorno.
+        Store, history e fattori sono caricati/calcolati una volta sola e condivisi da tutte le finestre;
+        ogni test riparte da starting_balance con portafoglio vuoto.
+        Con workers > 1 le finestre girano su processi figli creati con fork (che ereditano store e fattori
+        senza copiarli), dove fork non è disponibile sono eseguite in sequenza.
+
+        :return: curva di equity out-of-sample cucita (vedi stitch_equity); i risultati per finestra
+                 sono in self.windows.
+        """
+        self._on_start()
+        windows = walk_forward_windows(len(self.valid_dates), train, test, step, anchored)
+        if not windows:
+            raise ValueError(f"Date valide insufficienti ({len(self.valid_dates)}) per train={train} e test={test}.")
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            global _WALK_FORWARD
+            _WALK_FORWARD = self
+            try:
+                with ProcessPoolExecutor(min(workers, len(windows)),
+                                         mp_context=multiprocessing.get_context('fork')) as pool:
+                    self.windows = list(pool.map(_run_window, windows))
+            finally:
+                _WALK_FORWARD = None
+        else:
+            self.windows = [self._run_window(window) for window in windows]
+        self.oos_equity = stitch_equity([w['equity_curve'] for w in self.windows], self.starting_balance)
+        return self.oos_equity
+
+    def backtest_vectorized(self, weights, cost: float = 0.0, normalize: bool = False):
+        """
+        Backtest a pesi target calcolato in blocco (vedi vectorized.weights_backtest), alternativo al loop di on_data
+        per le strategie che dipendono solo da prezzi e fattori. Il mercato e i fattori sono caricati una volta sola:
+        più chiamate sulla stessa istanza confrontano varianti diverse dei pesi.
+
+        :param weights: DataFrame date x ticker di pesi target (frazione dell'equity, negativi = short) o di segnali
+                        -1/0/1, oppure una funzione che riceve il backtester (con factors_df calcolato) e lo ritorna.
+                        Su ogni data valida vale l'ultima riga nota, NaN = 0.
+        :param cost: costo per unità di controvalore scambiato.
+        :param normalize: se True ogni riga è riscalata a esposizione lorda 1 (segnali -> pesi equipesati).
+
+        Produce balance, equity_curve, period_pnl e (con record_positions) positions_summary leggibili da Analytics:
+        ogni tratto con lo stesso segno su un ticker è un trade, i trade chiusi compaiono solo alla data di chiusura.
+        """
+        if not isinstance(self.history, History):
+            self._on_start()
+        if callable(weights):
+            weights = weights(self)
+        self._reset_state()
+        n = len(self.valid_dates)
+        self.history.advance(n)
+
+        tickers = list(weights.columns)
+        missing = [tk for tk in tickers if tk not in self.history.store.ticker_index]
+        if missing:
+            raise KeyError(f"Ticker senza prezzi: {missing}")
+        prices = self.history.field('close')[:, [self.history.column(tk) for tk in tickers]]
+        aligned = weights.set_axis(pd.to_datetime(weights.index).normalize())
+        aligned = aligned[~aligned.index.duplicated(keep='last')].sort_index()
+        aligned = aligned.reindex(pd.DatetimeIndex(self.history.dates), method='ffill')
+        w = aligned.to_numpy(dtype=np.float64, na_value=np.nan)
+        w = np.nan_to_num(w)
+        if normalize:
+            gross = np.abs(w).sum(axis=1, keepdims=True)
+            w = np.divide(w, gross, out=np.zeros_like(w), where=gross > 0)
+        exposed = w != 0
+        exposed[1:] |= w[:-1] != 0
+        if np.isnan(prices[exposed]).any():
+            raise ValueError("Pesi non nulli su ticker senza prezzo alla data.")
+
+        result = weights_backtest(prices, w, self.starting_balance, cost)
+        iso = [d.isoformat() for d in self.valid_dates]
+        self.ref_dates = iso
+        self.ref_date = iso[-1]
+        self.balance = dict(zip(iso, result['equity'].tolist()))
+        closed_pnl, close_row = result['closed_pnl'], result['close_row']
+        realized = np.cumsum(np.bincount(close_row[1:], closed_pnl[1:], n))
+        positions = np.cumsum(result['starts'].sum(axis=1))
+        self.equity.start(n)
+        self.equity.extend(iso, result['equity'] - self.starting_balance, realized,
+                           np.cumsum(result['turnover']), positions)
+
+        curve = self.equity_curve
+        curve = curve[curve['positions'] > 0]
+        if not curve.empty:
+            self.period_pnl = pd.DataFrame({'ref_date': curve['ref_date'].to_numpy(),
+                                            'daily_pnl': curve['equity'].to_numpy()})
+        if self.record_positions:
+            self.summary_buffer.extend(self._vectorized_summary(result, prices, tickers, iso))
+
+    @staticmethod
+    def _vectorized_summary(result: dict, prices: np.ndarray, tickers: list, iso: list) -> dict:
+        """Righe di positions_summary del backtest vettoriale: trade aperti a ogni data e chiusure alla loro data."""
+        trade_id = result['trade_id']
+        start_row, start_col = np.nonzero(result['starts'])
+        open_row, open_col = np.nonzero(trade_id)
+        ids = np.arange(1, len(start_row) + 1)
+        close_row = result['close_row'][1:]
+        rows = np.concatenate([open_row, close_row])
+        cols = np.concatenate([open_col, start_col])
+        trades = np.concatenate([trade_id[open_row, open_col], ids])
+        alive = np.arange(len(rows)) < len(open_row)
+        order = np.lexsort((trades, rows))
+        rows, cols, trades, alive = rows[order], cols[order], trades[order], alive[order]
+
+        first = start_row[trades - 1]
+        side = result['side'][first, cols]
+        open_pnl = np.where(alive, result['open_pnl'][rows, cols], 0)
+        closed_pnl = np.where(alive, 0, result['closed_pnl'][trades])
+        iso = np.array(iso, dtype=object)
+        return {
+            "ref_date": iso[rows],
+            "trade_date": iso[first],
+            "trade_id": trades,
+            "symbol": np.array(tickers, dtype=object)[cols],
+            "type": np.full(len(rows), AssetType.EQUITY.value, dtype=object),
+            "side": side,
+            "quantity": np.where(alive, result['quantity'][rows, cols], 0),
+            "entry_price": prices[first, cols],
+            "is_alive": alive,
+            "current_value": prices[rows, cols],
+            "open_pnl": open_pnl,
+            "closed_pnl": closed_pnl,
+            "global_pnl": open_pnl + closed_pnl,
+            "exit_value": np.where(alive, np.nan, prices[rows, cols]),
+        }
+
+
+# backtester del walk-forward in corso, ereditato dai processi figli con fork
+_WALK_FORWARD = None
+
+
+def _run_window(window: tuple) -> dict:
+    return _WALK_FORWARD._run_window(window)
+
+
+def walk_forward_windows(n: int, train: int, test: int, step: int = None, anchored: bool = False) -> list:
+    """
+    Finestre (train_start, train_end, test_start, test_end) su n step, estremi finali esclusi.
+    Il test segue il train; l'ultima finestra di test può essere più corta di test.
+    """
+    if train < 1 or test < 1:
+        raise ValueError("train e test devono essere almeno di un giorno.")
+    step = step or test
+    windows = []
+    start = 0
+    while start + train < n:
+        train_end = start + train
+        windows.append((0 if anchored else start, train_end, train_end, min(train_end + test, n)))
+        start += step
+    return windows
+
+
+def stitch_equity(curves: list, starting_balance: float) -> pd.DataFrame:
+    """
+    Cuce le curve di equity (EquityTracker.to_frame) di finestre consecutive:
+    pnl, pnl realizzato e turnover di ogni finestra si sommano a quelli cumulati delle precedenti,
+    massimo storico e drawdown sono ricalcolati sulla curva complessiva.
+    """
+    frames = []
+    pnl_offset = realized_offset = turnover_offset = 0.0
+    for k, curve in enumerate(curves):
+        if curve.empty:
+            continue
+        curve = curve.copy()
+        pnl = curve['equity'] - starting_balance
+        curve['equity'] = starting_balance + pnl_offset + pnl
+        curve['realized_pnl'] += realized_offset
+        curve['turnover'] += turnover_offset
+        pnl_offset += pnl.iloc[-1]
+        realized_offset = curve['realized_pnl'].iloc[-1]
+        turnover_offset = curve['turnover'].iloc[-1]
+        curve.insert(0, 'window', k)
+        frames.append(curve)
+    if not frames:
+        return pd.DataFrame()
+    stitched = pd.concat(frames, ignore_index=True)
+    equity = stitched['equity'].to_numpy()
+    high_water_mark = np.maximum.accumulate(np.maximum(equity, starting_balance))
+    stitched['high_water_mark'] = high_water_mark
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stitched['drawdown'] = np.where(high_water_mark != 0, (equity - high_water_mark) / high_water_mark, np.nan)
+    return stitched
+
 
 
 class Factor(ABC):
+    # giorni di storia necessari prima del primo valore valido (es. la finestra di una media mobile)
+    lookback = 0
+    # nome in factors_df / factors_history, None = nome della classe in minuscolo
+    name = None
+    # attributi che identificano il fattore nella cache su disco (es. ('window', 'field')),
+    # None = fattore ricalcolato a ogni backtest
+    param_names = None
+
     def __init__(self, history: Dict[date, Any], frequency):
         self.methods = {}
         self.history = history
         self.frequency = frequency
 
+    def params(self) -> dict:
+        """Parametri del fattore per la chiave della cache: gli attributi elencati in param_names."""
+        return {k: getattr(self, k) for k in self.param_names or ()}
+
     @abstractmethod
     def compute(self, name: str, **params):
         return
\ No newline at end of file
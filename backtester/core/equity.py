@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+__all__ = ['EquityTracker']
+
+# serie registrate a ogni step, oltre a ref_date
+_SERIES = ('equity', 'high_water_mark', 'drawdown', 'realized_pnl', 'unrealized_pnl', 'turnover', 'positions')
+
+
+class EquityTracker:
+    """
+    Equity del backtest aggiornata step per step in tempo costante: equity, massimo storico,
+    drawdown (relativo al massimo come Analytics.drawdown), pnl realizzato e non realizzato, turnover cumulato.
+    I valori correnti sono attributi leggibili anche dentro on_data (riferiti all'ultimo step valutato),
+    la serie completa è in array preallocati e diventa un DataFrame solo con to_frame().
+    """
+
+    def __init__(self, starting_balance: float):
+        self.starting_balance = starting_balance
+        self.start(0)
+
+    def start(self, steps: int):
+        """Azzera lo stato e prealloca le serie per il numero di step del backtest."""
+        self.equity = self.starting_balance
+        self.high_water_mark = self.starting_balance
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.realized_pnl = 0.0
+        self.unrealized_pnl = 0.0
+        self.turnover = 0.0
+        self._size = 0
+        self._dates = np.empty(steps, dtype=object)
+        self._series = {name: np.zeros(steps) for name in _SERIES}
+        self._series['positions'] = np.zeros(steps, dtype=np.int64)
+
+    def update(self, ref_date: str, pnl: float, realized_pnl: float, turnover: float, positions: int):
+        """
+        Registra lo step: pnl è il pnl globale del portafoglio (aperto + chiuso), realized_pnl il chiuso,
+        turnover il controvalore scambiato cumulato, positions il numero di posizioni aperte o chiuse.
+        """
+        i = self._size
+        if i == len(self._dates):
+            self._grow()
+        self.equity = self.starting_balance + pnl
+        self.realized_pnl = realized_pnl
+        self.unrealized_pnl = pnl - realized_pnl
+        self.turnover = turnover
+        self.high_water_mark = max(self.high_water_mark, self.equity)
+        self.drawdown = (self.equity - self.high_water_mark) / self.high_water_mark if self.high_water_mark else np.nan
+        self.max_drawdown = min(self.max_drawdown, self.drawdown)
+
+        self._dates[i] = ref_date
+        values = (self.equity, self.high_water_mark, self.drawdown, realized_pnl, self.unrealized_pnl, turnover, positions)
+        for name, value in zip(_SERIES, values):
+            self._series[name][i] = value
+        self._size += 1
+
+    def extend(self, ref_dates, pnl, realized_pnl, turnover, positions):
+        """Registra più step in blocco (stessi argomenti di update, come array), ad esempio da un backtest vettoriale."""
+        pnl = np.asarray(pnl, dtype=np.float64)
+        n = len(pnl)
+        if n == 0:
+            return
+        while self._size + n > len(self._dates):
+            self._grow()
+        equity = self.starting_balance + pnl
+        high_water_mark = np.maximum.accumulate(np.maximum(equity, self.high_water_mark))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = np.where(high_water_mark != 0, (equity - high_water_mark) / high_water_mark, np.nan)
+        realized_pnl = np.asarray(realized_pnl, dtype=np.float64)
+        values = (equity, high_water_mark, drawdown, realized_pnl, pnl - realized_pnl, turnover, positions)
+        i = self._size
+        self._dates[i:i + n] = ref_dates
+        for name, value in zip(_SERIES, values):
+            self._series[name][i:i + n] = value
+        self._size += n
+
+        self.equity = float(equity[-1])
+        self.high_water_mark = float(high_water_mark[-1])
+        self.drawdown = float(drawdown[-1])
+        self.max_drawdown = min(self.max_drawdown, float(np.nanmin(drawdown)))
+        self.realized_pnl = float(realized_pnl[-1])
+        self.unrealized_pnl = float(pnl[-1] - realized_pnl[-1])
+        self.turnover = float(np.asarray(turnover)[-1])
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._dates))
+        dates = np.empty(capacity, dtype=object)
+        dates[:self._size] = self._dates[:self._size]
+        self._dates = dates
+        for name, old in self._series.items():
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            self._series[name] = new
+
+    def __len__(self):
+        return self._size
+
+    def to_frame(self) -> pd.DataFrame:
+        """Serie per step: ref_date e le colonne di _SERIES."""
+        frame = {'ref_date': self._dates[:self._size].copy()}
+        frame.update({name: values[:self._size].copy() for name, values in self._series.items()})
+        return pd.DataFrame(frame)
@@ -0,0 +1,163 @@
+import copy
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+
+__all__ = ['data_version', 'factor_key', 'FactorCache', 'FactorPanel']
+
+
+def data_version(meta_path: str, store) -> str:
+    """
+    Versione dei dati su cui è calcolato un fattore: meta.json della cache di mercato (percorso e mtime,
+    cambia a ogni rebuild) e finestra di date caricata. None se la cache non esiste (fattori non salvati).
+    """
+    if not os.path.exists(meta_path):
+        return None
+    window = (str(store.index[0]), str(store.index[-1]), len(store.index)) if len(store.index) else ()
+    text = repr((os.path.abspath(meta_path), os.path.getmtime(meta_path), window))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def factor_key(factor, universe, version: str) -> str:
+    """Chiave della cache di un fattore: classe, parametri dichiarati (param_names), frequenza, universo e versione dei dati."""
+    cls = type(factor)
+    params = sorted((k, repr(v)) for k, v in factor.params().items())
+    frequency = getattr(factor, 'frequency', None)
+    text = repr((f"{cls.__module__}.{cls.__qualname__}", params, frequency, list(universe), version))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class FactorCache:
+    """
+    Risultati dei fattori su disco, una cartella {path}/{chiave}/ con values.npy (date x simboli),
+    index.npy (datetime64[D]) e meta.json con i simboli. I valori sono riletti memory-mapped.
+    Sono tenute al più max_entries voci: a ogni save le meno usate di recente (mtime di meta.json,
+    aggiornato anche da load) vengono cancellate.
+    """
+
+    def __init__(self, path: str, max_entries: int = 64):
+        self.path = path
+        self.max_entries = max_entries
+
+    def load(self, key: str):
+        """(index, simboli, valori) del fattore, None se non è in cache."""
+        folder = os.path.join(self.path, key)
+        if not os.path.exists(os.path.join(folder, "meta.json")):
+            return None
+        with open(os.path.join(folder, "meta.json"), "r") as file:
+            meta = json.load(file)
+        index = np.load(os.path.join(folder, "index.npy"))
+        values = np.load(os.path.join(folder, "values.npy"), mmap_mode='r')
+        os.utime(os.path.join(folder, "meta.json"))
+        return index, meta["symbols"], values
+
+    def save(self, key: str, index: np.ndarray, symbols: list, values: np.ndarray):
+        folder = os.path.join(self.path, key)
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, "index.npy"), index)
+        np.save(os.path.join(folder, "values.npy"), np.ascontiguousarray(values))
+        # meta.json per ultimo: la sua presenza segnala una voce completa
+        with open(os.path.join(folder, "meta.json"), "w") as file:
+            json.dump({"symbols": list(symbols)}, file)
+        self.prune()
+
+    def keys(self) -> list:
+        """Chiavi in cache, dalla meno alla più usata di recente (le voci incomplete sono escluse)."""
+        if not os.path.isdir(self.path):
+            return []
+        entries = []
+        for key in os.listdir(self.path):
+            meta = os.path.join(self.path, key, "meta.json")
+            if os.path.exists(meta):
+                entries.append((os.path.getmtime(meta), key))
+        return [key for _, key in sorted(entries)]
+
+    def prune(self, max_entries: int = None):
+        """Cancella le voci meno usate di recente oltre max_entries (default: quello della cache)."""
+        limit = self.max_entries if max_entries is None else max_entries
+        if limit is None:
+            return
+        keys = self.keys()
+        for key in keys[:max(len(keys) - limit, 0)]:
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+
+    def clear(self):
+        """Cancella tutta la cache dei fattori."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class FactorPanel(Mapping):
+    """
+    Fattori calcolati come array allineati (date x simboli) su un indice di date comune.
+    Come Mapping espone {nome fattore: DataFrame data_iso x simbolo} delle sole righe [start, stop):
+    i DataFrame sono costruiti alla richiesta sopra viste degli array, senza copie.
+    until() restituisce la vista point-in-time di uno step.
+    """
+
+    def __init__(self, dates, symbols: dict, values: dict):
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.symbols = {name: pd.Index(s, name='symbol') for name, s in symbols.items()}
+        self.values = values
+        for array in values.values():
+            if array.flags.writeable:
+                array.flags.writeable = False
+        self._iso = pd.Index(np.datetime_as_string(self.dates, unit='D').tolist(), name='Date')
+        self.start = 0
+        self.stop = len(self.dates)
+
+    @classmethod
+    def from_arrays(cls, entries: dict) -> 'FactorPanel':
+        """
+        Pannello da {nome: (date, simboli, valori)}, allineando i fattori sull'unione delle date
+        (senza copie per i fattori che hanno già l'indice comune).
+        """
+        indexes = {name: np.asarray(entry[0], dtype='datetime64[D]') for name, entry in entries.items()}
+        dates = np.unique(np.concatenate(list(indexes.values()))) if indexes else np.array([], dtype='datetime64[D]')
+        values = {}
+        for name, (_, symbols, array) in entries.items():
+            if len(indexes[name]) != len(dates) or (indexes[name] != dates).any():
+                aligned = np.full((len(dates), len(symbols)), np.nan)
+                aligned[np.searchsorted(dates, indexes[name])] = array
+                array = aligned
+            values[name] = array
+        return cls(dates, {name: entry[1] for name, entry in entries.items()}, values)
+
+    @staticmethod
+    def frame_arrays(df: pd.DataFrame) -> tuple:
+        """(date, simboli, valori) di un DataFrame restituito da Factor.compute()."""
+        return (pd.to_datetime(df.index).values.astype('datetime64[D]'), list(df.columns),
+                df.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def until(self, start: int, stop: int) -> 'FactorPanel':
+        """Vista delle righe [start, stop), condivide gli array con questo pannello."""
+        view = copy.copy(self)
+        view.start, view.stop = start, stop
+        return view
+
+    def array(self, name: str) -> np.ndarray:
+        """Array (righe x simboli) del fattore nella vista, in sola lettura."""
+        return self.values[name][self.start:self.stop]
+
+    def __getitem__(self, name):
+        return pd.DataFrame(self.array(name), index=self._iso[self.start:self.stop],
+                            columns=self.symbols[name], copy=False)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def empty(self) -> bool:
+        return not self.values or self.stop <= self.start
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame a MultiIndex (fattore, simbolo) sulle colonne, come il vecchio factors_df."""
+        if not self.values:
+            return pd.DataFrame()
+        return pd.concat({name: self[name] for name in self.values}, axis=1, names=['factor', 'symbol'])
@@ -0,0 +1,100 @@
+import copy
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from ..market_store import FIELDS
+
+__all__ = ['History']
+
+# snapshot tenuti in memoria (i più recenti): in un backtest si legge quasi solo il giorno corrente
+SNAPSHOT_CACHE = 4
+
+
+class History(Mapping):
+    """
+    Storia point-in-time del backtest sopra lo store EOD.
+    Come Mapping espone {data_iso: snapshot} dei soli giorni già processati (fino allo step t),
+    come array espone i campi (giorni x ticker) in sola lettura: history.close[-1], history.close[:, j], ...
+    Avanzare di uno step costa O(1): nessuna copia; degli snapshot restano in cache solo gli ultimi
+    SNAPSHOT_CACHE letti, le altre date vengono ricostruite (come viste) alla richiesta.
+    """
+
+    def __init__(self, market_data, rows, dates, frequency='EOD'):
+        self.market_data = market_data
+        self.store = market_data.eod
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        # None = giornata completa (come market_data[data]), altrimenti il singolo snapshot
+        self.frequency = frequency
+        self.tickers = list(self.store.tickers)
+        self.t = 0
+        self._iso = np.datetime_as_string(self.dates, unit='D').tolist()
+        self._position = {d: i for i, d in enumerate(self._iso)}
+        self._fields = {}
+        self._snapshots = OrderedDict()
+
+    def advance(self, t: int):
+        """Rende visibili i primi t giorni della griglia."""
+        self.t = t
+
+    def until(self, t: int) -> 'History':
+        """Vista con i primi t giorni, condivide array e cache con questa."""
+        view = copy.copy(self)
+        view.t = t
+        return view
+
+    def field(self, name: str) -> np.ndarray:
+        """
+        Array (t x n_ticker) del campo fino allo step corrente.
+        La matrice sui giorni della griglia è estratta dallo store una volta sola.
+        """
+        if name not in self._fields:
+            if name not in self.store.data:
+                raise KeyError(name)
+            values = self.store.field(name)[self.rows]
+            values.flags.writeable = False
+            self._fields[name] = values
+        return self._fields[name][:self.t]
+
+    def __getattr__(self, name):
+        if name in FIELDS:
+            return self.field(name)
+        raise AttributeError(name)
+
+    @property
+    def index(self) -> np.ndarray:
+        """Date (datetime64[D]) fino allo step corrente."""
+        return self.dates[:self.t]
+
+    def column(self, ticker: str) -> int:
+        return self.store.col(ticker)
+
+    def to_frame(self, field: str = 'close') -> pd.DataFrame:
+        """DataFrame data_iso x ticker del campo; i ticker mai quotati non compaiono."""
+        quoted = ~np.isnan(self.field('close')).all(axis=0)
+        df = pd.DataFrame(self.field(field)[:, quoted],
+                          index=pd.Index(self._iso[:self.t], name="Date"),
+                          columns=[tk for tk, q in zip(self.tickers, quoted) if q])
+        return df
+
+    def __getitem__(self, date_iso):
+        i = self._position.get(date_iso)
+        if i is None or i >= self.t:
+            raise KeyError(date_iso)
+        if i in self._snapshots:
+            self._snapshots.move_to_end(i)
+            return self._snapshots[i]
+        day = self.market_data[date_iso]
+        snapshot = day if self.frequency is None else day[self.frequency]
+        self._snapshots[i] = snapshot
+        while len(self._snapshots) > SNAPSHOT_CACHE:
+            self._snapshots.popitem(last=False)
+        return snapshot
+
+    def __iter__(self):
+        return iter(self._iso[:self.t])
+
+    def __len__(self):
+        return self.t
@@ -0,0 +1,343 @@
+import numpy as np
+import pandas as pd
+from abc import abstractmethod
+from collections import deque
+
+from .engine import Factor
+
+__all__ = ['Indicator', 'SMA', 'EMA', 'RollingStd', 'ZScore', 'RSI', 'ATR', 'VWAP', 'RollingMax', 'RollingMin']
+
+
+def _kahan_add(total: np.ndarray, compensation: np.ndarray, x: np.ndarray, mask: np.ndarray):
+    """total += x con somma compensata (Kahan) sulle sole colonne di mask."""
+    y = np.where(mask, x, 0.0) - compensation
+    t = total + y
+    compensation[mask] = ((t - total) - y)[mask]
+    total[mask] = t[mask]
+
+
+class _RingBuffer:
+    """Ultimi window valori per simbolo; ogni simbolo avanza solo quando riceve un valore."""
+
+    def __init__(self, window: int, n: int):
+        self.window = window
+        self.values = np.full((window, n), np.nan)
+        self.pos = np.zeros(n, dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+
+    def push(self, x: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Inserisce x nelle colonne di mask, ritorna i valori usciti dalla finestra (NaN se nessuno)."""
+        cols = np.flatnonzero(mask)
+        rows = self.pos[cols]
+        evicted = np.full(len(x), np.nan)
+        full = self.count[cols] == self.window
+        evicted[cols[full]] = self.values[rows[full], cols[full]]
+        self.values[rows, cols] = x[cols]
+        self.pos[cols] = (rows + 1) % self.window
+        self.count[cols] = np.minimum(self.count[cols] + 1, self.window)
+        return evicted
+
+
+class Indicator(Factor):
+    """
+    Indicatore tecnico usabile come Factor: compute() lo calcola in blocco su tutta la storia
+    (DataFrame data_iso x simbolo, vettoriale per colonna), update() lo aggiorna in O(1) a ogni nuova barra
+    per le run intraday. Lo stato online è per simbolo: update riceve array allineati (uno per simbolo)
+    o scalari; le barre NaN non aggiornano lo stato del simbolo (nel batch invece la finestra conta le righe).
+    """
+    # campi di mercato usati, nell'ordine degli argomenti di batch/update
+    fields = ('close',)
+    # attributi che identificano l'indicatore (chiave della cache dei fattori)
+    param_names = ('window',)
+
+    def __init__(self, history=None, frequency='EOD', window: int = 14, name: str = None):
+        super().__init__(history, frequency)
+        self.window = window
+        self.lookback = window
+        self.name = name
+        self.value = None
+        self._n = None
+
+    def compute(self) -> pd.DataFrame:
+        frames = self._field_frames()
+        result = self.batch(*(frames[f] for f in self.fields))
+        result.index.name = "Date"
+        return result
+
+    def _field_frames(self) -> dict:
+        """{campo: DataFrame data_iso x simbolo} dalla storia: array dello store EOD se disponibile."""
+        store = getattr(self.history, 'eod', None)
+        if store is not None:
+            index = pd.Index(np.datetime_as_string(store.index, unit='D').tolist(), name="Date")
+            return {f: pd.DataFrame(store.field(f), index=index, columns=store.tickers) for f in self.fields}
+        data = {f: {} for f in self.fields}
+        for date, market_data in self.history.items():
+            for symbol, values in market_data[self.frequency].get('equity', {}).items():
+                for f in self.fields:
+                    data[f].setdefault(symbol, {})[date] = values.get(f, None)
+        return {f: pd.DataFrame(data[f], dtype=float) for f in self.fields}
+
+    @abstractmethod
+    def batch(self, *fields: pd.DataFrame) -> pd.DataFrame:
+        """Valori su tutta la storia a partire dai DataFrame dei campi (date x simboli)."""
+
+    def reset(self, n: int = 1):
+        """Azzera lo stato online per n simboli."""
+        self._n = n
+        self.value = np.full(n, np.nan)
+        self._reset(n)
+
+    @abstractmethod
+    def _reset(self, n: int):
+        """Inizializza lo stato online per n simboli."""
+
+    def update(self, *bar):
+        """
+        Aggiunge una barra (i campi di fields, array per simbolo o scalari) e ritorna il valore corrente,
+        NaN finché la finestra non è piena.
+        """
+        scalar = np.ndim(bar[0]) == 0
+        bar = [np.atleast_1d(np.asarray(x, dtype=np.float64)) for x in bar]
+        if self._n != len(bar[0]):
+            self.reset(len(bar[0]))
+        mask = np.ones(self._n, dtype=bool)
+        for x in bar:
+            mask &= ~np.isnan(x)
+        self.value = self._update(mask, *bar)
+        return float(self.value[0]) if scalar else self.value
+
+    @abstractmethod
+    def _update(self, mask: np.ndarray, *bar) -> np.ndarray:
+        """Aggiorna lo stato con la barra sui simboli di mask e ritorna i valori correnti."""
+
+
+class SMA(Indicator):
+    """Media mobile semplice su window barre, online con somma compensata."""
+
+    def batch(self, close):
+        return close.rolling(self.window).mean()
+
+    def _reset(self, n):
+        self._buffer = _RingBuffer(self.window, n)
+        self._sum = np.zeros(n)
+        self._compensation = np.zeros(n)
+
+    def _update(self, mask, close):
+        evicted = self._buffer.push(close, mask)
+        _kahan_add(self._sum, self._compensation, close, mask)
+        _kahan_add(self._sum, self._compensation, -evicted, mask & ~np.isnan(evicted))
+        return np.where(self._buffer.count == self.window, self._sum / self.window, np.nan)
+
+
+class EMA(Indicator):
+    """Media mobile esponenziale con alpha = 2 / (window + 1), inizializzata con il primo valore."""
+
+    @property
+    def alpha(self) -> float:
+        return 2 / (self.window + 1)
+
+    def batch(self, close):
+        return close.ewm(alpha=self.alpha, adjust=False, ignore_na=True, min_periods=self.window).mean()
+
+    def _reset(self, n):
+        self._ema = np.full(n, np.nan)
+        self._count = np.zeros(n, dtype=np.int64)
+
+    def _update(self, mask, close):
+        first = mask & (self._count == 0)
+        self._ema[first] = close[first]
+        step = mask & ~first
+        self._ema[step] += self.alpha * (close[step] - self._ema[step])
+        self._count[mask] += 1
+        return np.where(self._count >= self.window, self._ema, np.nan)
+
+
+class RollingStd(Indicator):
+    """Deviazione standard campionaria (ddof=1) su window barre, online con Welford a finestra mobile."""
+
+    def batch(self, close):
+        return close.rolling(self.window).std()
+
+    def _reset(self, n):
+        self._buffer = _RingBuffer(self.window, n)
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+
+    def _update(self, mask, close):
+        evicted = self._buffer.push(close, mask)
+        replace = mask & ~np.isnan(evicted)
+        grow = mask & ~replace
+        # finestra non piena: passo di Welford classico
+        count = self._buffer.count
+        delta = np.where(grow, close - self._mean, 0.0)
+        self._mean[grow] += delta[grow] / count[grow]
+        self._m2[grow] += (delta * (close - self._mean))[grow]
+        # finestra piena: il nuovo valore sostituisce il più vecchio
+        old_mean = self._mean.copy()
+        diff = np.where(replace, close - evicted, 0.0)
+        self._mean[replace] += diff[replace] / self.window
+        self._m2[replace] += (diff * (close - self._mean + evicted - old_mean))[replace]
+        # a ogni giro completo della finestra media e M2 sono ricalcolati dal buffer: l'errore non si accumula
+        wrapped = replace & (self._buffer.pos == 0)
+        if wrapped.any():
+            values = self._buffer.values[:, wrapped]
+            self._mean[wrapped] = values.mean(axis=0)
+            self._m2[wrapped] = ((values - self._mean[wrapped]) ** 2).sum(axis=0)
+        np.maximum(self._m2, 0.0, out=self._m2)
+        return np.where(count == self.window, np.sqrt(self._m2 / max(self.window - 1, 1)), np.nan)
+
+
+class ZScore(RollingStd):
+    """(close - media) / deviazione standard sulle ultime window barre, barra corrente compresa."""
+
+    def batch(self, close):
+        rolling = close.rolling(self.window)
+        return (close - rolling.mean()) / rolling.std()
+
+    def _update(self, mask, close):
+        std = super()._update(mask, close)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (close - self._mean) / std
+
+
+class RSI(Indicator):
+    """Relative Strength Index con medie di Wilder (alpha = 1 / window) di rialzi e ribassi."""
+
+    def batch(self, close):
+        diff = close.diff()
+        options = dict(alpha=1 / self.window, adjust=False, ignore_na=True, min_periods=self.window)
+        gain = diff.clip(lower=0).where(diff.notna()).ewm(**options).mean()
+        loss = (-diff).clip(lower=0).where(diff.notna()).ewm(**options).mean()
+        return 100 - 100 / (1 + gain / loss)
+
+    def _reset(self, n):
+        self._previous = np.full(n, np.nan)
+        self._gain = np.zeros(n)
+        self._loss = np.zeros(n)
+        self._count = np.zeros(n, dtype=np.int64)
+
+    def _update(self, mask, close):
+        diff = close - self._previous
+        step = mask & ~np.isnan(self._previous)
+        first = step & (self._count == 0)
+        alpha = 1 / self.window
+        for average, move in ((self._gain, np.maximum(diff, 0)), (self._loss, np.maximum(-diff, 0))):
+            average[first] = move[first]
+            later = step & ~first
+            average[later] += alpha * (move[later] - average[later])
+        self._count[step] += 1
+        self._previous[mask] = close[mask]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + self._gain / self._loss)
+        return np.where(self._count >= self.window, rsi, np.nan)
+
+
+class ATR(Indicator):
+    """Average True Range con media di Wilder (alpha = 1 / window); la prima barra usa high - low."""
+    fields = ('high', 'low', 'close')
+
+    def batch(self, high, low, close):
+        previous = close.shift(1)
+        true_range = np.fmax(high - low, np.fmax((high - previous).abs(), (low - previous).abs()))
+        true_range = true_range.where(high.notna() & low.notna() & close.notna())
+        return true_range.ewm(alpha=1 / self.window, adjust=False, ignore_na=True, min_periods=self.window).mean()
+
+    def _reset(self, n):
+        self._previous = np.full(n, np.nan)
+        self._atr = np.full(n, np.nan)
+        self._count = np.zeros(n, dtype=np.int64)
+
+    def _update(self, mask, high, low, close):
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - self._previous), np.abs(low - self._previous)))
+        first = mask & (self._count == 0)
+        self._atr[first] = true_range[first]
+        later = mask & ~first
+        self._atr[later] += (true_range[later] - self._atr[later]) / self.window
+        self._count[mask] += 1
+        self._previous[mask] = close[mask]
+        return np.where(self._count >= self.window, self._atr, np.nan)
+
+
+class VWAP(Indicator):
+    """
+    Prezzo medio ponderato per i volumi sulle ultime window barre, con il prezzo tipico (high + low + close) / 3.
+    Con window=None è cumulato dall'inizio (o dall'ultimo reset, es. a inizio sessione).
+    """
+    fields = ('high', 'low', 'close', 'volume')
+
+    def __init__(self, history=None, frequency='EOD', window: int = None, name: str = None):
+        super().__init__(history, frequency, window, name)
+        self.lookback = window or 0
+
+    def batch(self, high, low, close, volume):
+        weighted = (high + low + close) / 3 * volume
+        if self.window is None:
+            return weighted.fillna(0).cumsum() / volume.fillna(0).cumsum()
+        return weighted.rolling(self.window).sum() / volume.rolling(self.window).sum()
+
+    def _reset(self, n):
+        if self.window is not None:
+            self._weighted_buffer = _RingBuffer(self.window, n)
+            self._volume_buffer = _RingBuffer(self.window, n)
+        self._weighted = np.zeros(n)
+        self._weighted_compensation = np.zeros(n)
+        self._volume = np.zeros(n)
+        self._volume_compensation = np.zeros(n)
+
+    def _update(self, mask, high, low, close, volume):
+        weighted = (high + low + close) / 3 * volume
+        _kahan_add(self._weighted, self._weighted_compensation, weighted, mask)
+        _kahan_add(self._volume, self._volume_compensation, volume, mask)
+        if self.window is None:
+            ready = self._volume != 0
+        else:
+            old_weighted = self._weighted_buffer.push(weighted, mask)
+            old_volume = self._volume_buffer.push(volume, mask)
+            evicted = mask & ~np.isnan(old_weighted)
+            _kahan_add(self._weighted, self._weighted_compensation, -old_weighted, evicted)
+            _kahan_add(self._volume, self._volume_compensation, -old_volume, evicted)
+            ready = self._weighted_buffer.count == self.window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(ready, self._weighted / self._volume, np.nan)
+
+
+class RollingMax(Indicator):
+    """Massimo sulle ultime window barre, online con una deque monotona per simbolo (O(1) ammortizzato)."""
+
+    @staticmethod
+    def _better(a, b) -> bool:
+        return a >= b
+
+    def batch(self, close):
+        return close.rolling(self.window).max()
+
+    def _reset(self, n):
+        self._queues = [deque() for _ in range(n)]
+        self._seen = np.zeros(n, dtype=np.int64)
+
+    def _update(self, mask, close):
+        result = np.full(self._n, np.nan)
+        for j in range(self._n):
+            queue = self._queues[j]
+            if mask[j]:
+                i, x = self._seen[j], close[j]
+                while queue and self._better(x, queue[-1][1]):
+                    queue.pop()
+                queue.append((i, x))
+                if queue[0][0] <= i - self.window:
+                    queue.popleft()
+                self._seen[j] += 1
+            if self._seen[j] >= self.window:
+                result[j] = queue[0][1]
+        return result
+
+
+class RollingMin(RollingMax):
+    """Minimo sulle ultime window barre, online con una deque monotona per simbolo (O(1) ammortizzato)."""
+
+    @staticmethod
+    def _better(a, b) -> bool:
+        return a <= b
+
+    def batch(self, close):
+        return close.rolling(self.window).min()
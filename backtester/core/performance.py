@@ -2,6 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np 
 from datetime import datetime 
+from functools import cached_property
 
 
 
@@ -94,23 +95,77 @@ class Analytics:
         plt.grid(True)
         plt.show()
 
+    @staticmethod
+    def _first_rows(codes: np.ndarray, rows: np.ndarray, n_trades: int) -> np.ndarray:
+        """Per ogni trade (codice di factorize) la prima riga (tra rows) in cui compare, -1 se non compare."""
+        # duplicated lavora per hash: niente ordinamento delle righe
+        trade = codes[rows]
+        first = ~pd.Series(trade).duplicated().to_numpy()
+        result = np.full(n_trades, -1, dtype=np.int64)
+        result[trade[first]] = rows[first]
+        return result
+
+    @cached_property
+    def _trade_log(self) -> pd.DataFrame:
+        trades = self.trades_df
+        # codici dei trade nell'ordine in cui compaiono
+        codes, order = pd.factorize(trades['trade_id'].to_numpy())
+        alive = (trades['is_alive'] == True).to_numpy()
+        entry = self._first_rows(codes, np.flatnonzero(alive), len(order))
+        exit = self._first_rows(codes, np.flatnonzero(~alive), len(order))
+        # ogni trade ha almeno una riga: quella mancante è ricostruita dall'altra
+        rows = np.column_stack([np.where(entry >= 0, entry, exit), np.where(exit >= 0, exit, entry)]).ravel()
+        log = trades.iloc[rows].reset_index(drop=True)
+
+        # trade aperto e chiuso nello stesso step (solo la riga chiusa): apertura alla trade_date,
+        # quantità iniziale non nota
+        opened = np.zeros(len(log), dtype=bool)
+        opened[0::2] = entry < 0
+        if opened.any():
+            self._fill(log, opened, {'ref_date': log.loc[opened, 'trade_date'], 'is_alive': True, 'quantity': np.nan,
+                                     'current_value': log.loc[opened, 'entry_price'], 'open_pnl': 0.0,
+                                     'closed_pnl': 0.0, 'global_pnl': 0.0, 'exit_value': np.nan})
+        # trade ancora aperto a fine backtest: la chiusura resta a NaN
+        still_open = np.zeros(len(log), dtype=bool)
+        still_open[1::2] = exit < 0
+        if still_open.any():
+            self._fill(log, still_open, {'ref_date': np.nan, 'quantity': np.nan, 'current_value': np.nan,
+                                         'open_pnl': np.nan, 'closed_pnl': np.nan, 'global_pnl': np.nan,
+                                         'exit_value': np.nan})
+        return log
+
+    @staticmethod
+    def _fill(log: pd.DataFrame, mask: np.ndarray, values: dict):
+        """Assegna values alle righe di mask, solo per le colonne presenti nel trade log."""
+        for column, value in values.items():
+            if column in log:
+                if isinstance(value, float) and np.isnan(value) and log[column].dtype.kind in 'biu':
+                    log[column] = log[column].astype(np.float64)
+                log.loc[mask, column] = value
+
+    @cached_property
+    def _signals(self) -> pd.DataFrame:
+        # le chiusure non ancora avvenute non sono segnali
+        df = self._trade_log[self._trade_log['ref_date'].notna()].reset_index(drop=True)
+        # quantity == 0 => close (0), quantity > 0 => apertura: segnale = side (1 per buy, -1 per sell)
+        df['signal'] = np.where(df['quantity'] == 0, 0, df['side'].clip(-1, 1))
+        return df
+
+    @cached_property
+    def _symbol_rows(self) -> dict:
+        """Indice simbolo -> righe dei segnali."""
+        return self._signals.groupby('symbol', sort=False).indices
+
     def trade_log(self):
         """
         Genera un DataFrame con due righe per ogni trade: una per l'apertura e una per la chiusura.
+        Costruito una volta sola (prima riga aperta e prima riga chiusa di ogni trade) e tenuto in cache.
+        Per i trade ancora aperti la riga di chiusura ha ref_date e valori a NaN; per quelli aperti e chiusi
+        nello stesso step l'apertura è ricavata dalla riga di chiusura (ref_date = trade_date, quantity NaN).
 
         :return: DataFrame con trade log dettagliato.
         """
-        closed_trades = self.trades_df
-        closed_trades['trade_id'].unique()
-        trade_log = []
-
-        for trade_id in closed_trades['trade_id'].unique():
-            entry_row = closed_trades[(closed_trades['trade_id'] == trade_id) & (closed_trades['is_alive'] == True)].iloc[0]
-            exit_row = closed_trades[(closed_trades['trade_id'] == trade_id) & (closed_trades['is_alive'] == False)].iloc[0]
-
-            trade_log.append(entry_row.to_dict())
-            trade_log.append(exit_row.to_dict())
-        return pd.DataFrame(trade_log)
+        return self._trade_log.copy()
     
     def signals(self, symbol: str) -> pd.DataFrame:
         """
@@ -119,68 +174,81 @@ class Analytics:
         0  = chiusura di posizione (close)
         -1  = apertura short (sell)
         """
-        # 1) filtro per symbol
-        df = self.trade_log()
-        df_sym = df[df['symbol'] == symbol].copy()
-        
-        # 2) calcolo del segnale:
-        #    quantity == 0 => close (0)
-        #    quantity > 0  => apertura: segnale = side (1 per buy, -1 per sell)
-        df_sym['signal'] = np.where(
-            df_sym['quantity'] == 0,
-            0,
-            df_sym['side'].clip(-1, 1)  # garantisce -1 o +1
-        )
-        
-        # 3) imposto ref_date come indice e ordino
+        rows = self._symbol_rows.get(symbol, np.array([], dtype=np.int64))
+        df_sym = self._signals.iloc[rows]
+        # imposto ref_date come indice e ordino
         df_signals = df_sym.set_index('ref_date').sort_index()[['signal']]
         return df_signals
 
+    @cached_property
+    def returns(self) -> pd.Series:
+        """Rendimenti giornalieri di daily_pnl (gli zeri diventano NaN), calcolati una volta sola."""
+        self.period_pnl[self.period_pnl == 0] = np.nan  
+        return self.period_pnl['daily_pnl'].pct_change().dropna()
+
+    @cached_property
+    def closed_mask(self) -> np.ndarray:
+        """Maschera delle righe di trades_df con trade chiusi."""
+        return (self.trades_df['is_alive'] == False).to_numpy()
+
+    @cached_property
+    def closed_pnl(self) -> np.ndarray:
+        """closed_pnl delle righe dei trade chiusi, estratto una volta sola da trades_df."""
+        return self.trades_df['closed_pnl'].to_numpy(dtype=np.float64)[self.closed_mask]
+
+    @cached_property
+    def wins(self) -> np.ndarray:
+        return self.closed_pnl[self.closed_pnl > 0]
+
+    @cached_property
+    def losses(self) -> np.ndarray:
+        return self.closed_pnl[self.closed_pnl < 0]
+
+    @cached_property
+    def drawdown(self) -> pd.Series:
+        """Drawdown relativo di daily_pnl rispetto al massimo storico."""
+        pnl_series = self.period_pnl['daily_pnl']
+        # Calcola il massimo storico fino a quel punto
+        running_max = pnl_series.cummax()
+        # Evitiamo la divisione per zero sostituendo gli zeri con NaN temporaneamente
+        running_max[running_max == 0] = np.nan  
+        return (pnl_series - running_max) / running_max
+
+    @staticmethod
+    def _mean(values: np.ndarray) -> float:
+        return values.mean() if len(values) else np.nan
+
     def expected_return(self):
-            """ Calcola il rendimento medio giornaliero. """
-            self.period_pnl[self.period_pnl == 0] = np.nan  
-            returns = self.period_pnl['daily_pnl'].pct_change().dropna()
-            return returns.mean()
+        """ Calcola il rendimento medio giornaliero. """
+        return self.returns.mean()
 
     def std_deviation(self):
         """ Calcola la std dev dei rendimento medi giornalieri. """
-        self.period_pnl[self.period_pnl == 0] = np.nan  
-        returns = self.period_pnl['daily_pnl'].pct_change().dropna()
-        return returns.std()
+        return self.returns.std()
     
     def sharpe_ratio(self):
         """ Calcola lo Sharpe Ratio del portafoglio con riskfree=0. """
-        self.period_pnl[self.period_pnl == 0] = np.nan  
-        returns = self.period_pnl['daily_pnl'].pct_change().dropna()
-        if returns.std() == 0:
+        if self.returns.std() == 0:
             return np.nan
-        return (returns.mean()) / returns.std()
+        return (self.returns.mean()) / self.returns.std()
 
     def win_rate(self):
         """ Calcola la percentuale di trade vincenti. """
-        closed_trades = self.trades_df[self.trades_df['is_alive'] == False]
-        wins = (closed_trades['closed_pnl'] > 0).sum()
-        total = len(closed_trades)
+        wins = len(self.wins)
+        total = len(self.closed_pnl)
         return wins / total if total > 0 else 0
 
     def average_pnl(self):
         """ Calcola il profitto medio per trade. """
-        closed_trades = self.trades_df[self.trades_df['is_alive'] == False]
-        return closed_trades['closed_pnl'].mean()
+        return self._mean(self.closed_pnl)
 
     def average_win(self):
         """ Calcola il P&L medio dei trade vincenti. """
-        closed_trades = self.trades_df[self.trades_df['is_alive'] == False]
-        wins = closed_trades[closed_trades['closed_pnl'] > 0]
-        # return (wins['global_pnl']/1e6/wins['initial_spot'] ).mean()
-        return wins['closed_pnl'].mean()
+        return self._mean(self.wins)
 
     def average_loss(self):
         """ Calcola il P&L medio dei trade perdenti. """
-        closed_trades = self.trades_df[self.trades_df['is_alive'] == False]
-        losses = closed_trades[closed_trades['closed_pnl'] < 0]
-        return losses['closed_pnl'].mean()
-        # return (losses['global_pnl']/1e6/losses['initial_spot'] ).mean()
+        return self._mean(self.losses)
 
     def max_profit(self):
         """ Trova il trade più redditizio. """
@@ -192,14 +260,12 @@ class Analytics:
 
     def profit_factor(self):
         """ Calcola il profit factor (profitto totale / perdita totale). """
-        closed_trades = self.trades_df[self.trades_df['is_alive'] == False]
-        total_wins = closed_trades[closed_trades['closed_pnl'] > 0]['closed_pnl'].sum()
-        total_losses = abs(closed_trades[closed_trades['closed_pnl'] < 0]['closed_pnl'].sum())
+        total_wins = self.wins.sum()
+        total_losses = abs(self.losses.sum())
         return total_wins / total_losses if total_losses > 0 else 1
 
     def number_of_trades(self):
-        closed_trades = self.trades_df[self.trades_df['is_alive'] == False]
-        return len(closed_trades['trade_id'].unique())
+        return len(pd.unique(self.trades_df['trade_id'].to_numpy()[self.closed_mask]))
     
     def max_drawdown(self):
         """
@@ -207,14 +273,7 @@ class Analytics:
         
         :return: Valore massimo del drawdown.
         """
-        pnl_series = self.period_pnl['daily_pnl']
-
-        # Calcola il massimo storico fino a quel punto
-        running_max = pnl_series.cummax()
-        # Evitiamo la divisione per zero sostituendo gli zeri con NaN temporaneamente
-        running_max[running_max == 0] = np.nan  
-        drawdown = (pnl_series - running_max) / running_max  
-        return drawdown.min()
+        return self.drawdown.min()
     
     def summary(self):
         """ Restituisce un riassunto delle metriche di performance con 6 decimali formattati come stringhe. """
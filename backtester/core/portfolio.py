@@ -1,86 +1,366 @@
-from .position import Position
+from .position import Position, OptionPosition, TradeId
+from .pricing import price_options, option_greeks, GREEKS
 from .utils import *
+from ..market_store import SnapshotView
 import numpy as np
 
+# stato delle posizioni: un elemento per slot (= ordine di apertura)
+_SLOT_ARRAYS = {
+    '_quantity': np.float64,
+    '_entry_price': np.float64,
+    '_side': np.int64,
+    '_symbol_id': np.int64,
+    '_trade_id': np.int64,
+    '_is_open': bool,
+    '_is_equity': bool,
+    '_closed_pnl': np.float64,
+    '_exit_value': np.float64,
+    '_symbol': object,
+    '_type': object,
+    '_trade_date': object,
+}
+
+
 class Portfolio:
-    def __init__(self):
-        self.positions = []  # Lista delle posizioni attive
+    """
+    Portafoglio con lo stato delle posizioni in array NumPy, uno slot per posizione in ordine di apertura.
+    Le equity aperte sono valutate con un solo gather dalla riga dei close dello store,
+    le opzioni con una valutazione BSM vettoriale per sottostante (pricing.price_options),
+    le altre posizioni dal proprio oggetto Position.
+    Le posizioni si chiudono con close_position/close_positions, che aggiornano gli array.
+    """
+    def __init__(self, trade_ids: TradeId = None):
+        self.positions = []  # tutte le posizioni, in ordine di apertura
+        # allocatore degli id dei trade del portafoglio, da passare alle posizioni create per questo portafoglio
+        self.trade_ids = trade_ids if trade_ids is not None else TradeId()
         self.open_pnl = 0
+        self._size = 0
+        for name, dtype in _SLOT_ARRAYS.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._symbols = []          # id simbolo -> simbolo
+        self._symbol_ids = {}       # simbolo -> id simbolo
+        self._open_equity = {}      # slot -> None, equity aperte in ordine di apertura
+        self._open_other = {}       # slot -> posizione, altri asset aperti
+        self._open_by_key = {}      # (simbolo, asset_type) -> {slot: posizione} delle aperte
+        self._closed_by_key = {}    # (simbolo, asset_type) -> posizioni chiuse
+        self._open_quantity = {}    # (simbolo, asset_type) -> somma delle quantità aperte
+        self._net_quantity = {}     # (simbolo, asset_type) -> somma di quantità * side delle aperte
+        self._open_slots = None     # cache degli slot equity aperti come array
+        self._store_columns = None  # cache (store, colonne dello store per id simbolo)
+        self._closed_pnl_total = 0.0
+        self._initial_ctv_total = 0.0
+        self._turnover_total = 0.0  # controvalore scambiato in apertura e chiusura
+        self._integer_quantity = True
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._quantity))
+        for name in _SLOT_ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _get_symbol_id(self, symbol: str) -> int:
+        if symbol not in self._symbol_ids:
+            self._symbol_ids[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        return self._symbol_ids[symbol]
 
     def add_position(self, position: Position):
         """Aggiunge una posizione al portafoglio."""
+        slot = self._size
+        if slot == len(self._quantity):
+            self._grow()
+        position.portfolio = self
+        position.slot = slot
+        if position.trade_id is None:
+            position.trade_id = self.trade_ids.generate()
         self.positions.append(position)
 
+        self._quantity[slot] = position.quantity
+        self._entry_price[slot] = position.entry_price
+        self._side[slot] = position.position_type.value
+        self._symbol_id[slot] = self._get_symbol_id(position.symbol)
+        self._trade_id[slot] = position.trade_id
+        self._is_open[slot] = position.is_open
+        self._is_equity[slot] = position.asset_type == AssetType.EQUITY
+        self._closed_pnl[slot] = position.closed_pnl
+        self._symbol[slot] = position.symbol
+        self._type[slot] = position.asset_type.value
+        self._trade_date[slot] = position.trade_date
+        self._size += 1
+
+        if not isinstance(position.quantity, (int, np.integer)):
+            self._integer_quantity = False
+        self._initial_ctv_total += position.initial_ctv
+        self._turnover_total += abs(position.initial_ctv)
+        key = (position.symbol, position.asset_type)
+        if not position.is_open:
+            self._closed_by_key.setdefault(key, []).append(position)
+            quantity = position.initial_ctv / position.entry_price if position.entry_price else 0
+            self._exit_value[slot] = self._exit_price(slot, quantity, position.closed_pnl)
+        else:
+            self._open_by_key.setdefault(key, {})[slot] = position
+            self._open_quantity[key] = self._open_quantity.get(key, 0) + position.quantity
+            self._net_quantity[key] = self._net_quantity.get(key, 0) + position.quantity * position.position_type.value
+            if self._is_equity[slot]:
+                self._open_equity[slot] = None
+                self._open_slots = None
+            else:
+                self._open_other[slot] = position
+
+    def _archive(self, position: Position):
+        """Chiamata alla chiusura di una posizione: la toglie dalle aperte e ne registra il closed pnl."""
+        slot = position.slot
+        if not self._is_open[slot]:
+            return
+        if slot in self._open_equity:
+            del self._open_equity[slot]
+            self._open_slots = None
+        self._open_other.pop(slot, None)
+        key = (position.symbol, position.asset_type)
+        open_positions = self._open_by_key[key]
+        del open_positions[slot]
+        if open_positions:
+            quantity = self._quantity[slot].item()
+            if self._integer_quantity:
+                quantity = int(quantity)
+            self._open_quantity[key] -= quantity
+            self._net_quantity[key] -= quantity * self._side[slot].item()
+        else:
+            # nessuna aperta: azzera i totali invece di sottrarre (niente residui di arrotondamento)
+            del self._open_by_key[key], self._open_quantity[key], self._net_quantity[key]
+        self._closed_by_key.setdefault(key, []).append(position)
+        # controvalore di uscita ricavato dal closed pnl: (prezzo uscita - entry) * side * quantità
+        exit_ctv = self._entry_price[slot] * self._quantity[slot] + position.closed_pnl * self._side[slot]
+        self._turnover_total += abs(float(exit_ctv))
+        self._exit_value[slot] = self._exit_price(slot, self._quantity[slot], position.closed_pnl)
+        self._is_open[slot] = False
+        self._quantity[slot] = position.quantity
+        self._closed_pnl[slot] = position.closed_pnl
+        self._closed_pnl_total += position.closed_pnl
+
+    def _exit_price(self, slot: int, quantity: float, closed_pnl: float) -> float:
+        """Valore unitario di uscita di una posizione chiusa, ricavato dal closed pnl."""
+        if not quantity:
+            return self._entry_price[slot]
+        return self._entry_price[slot] + closed_pnl * self._side[slot] / quantity
+
+    def _other_values(self, market_data: dict, slots: np.ndarray) -> np.ndarray:
+        """
+        Valore unitario delle posizioni non equity degli slot: le opzioni scadute vengono chiuse al payoff
+        e valgono 0, le altre opzioni sono valutate in blocco, le posizioni restanti una per una.
+        """
+        values = np.zeros(len(slots))
+        options = []
+        for i, slot in enumerate(slots):
+            position = self.positions[slot]
+            if isinstance(position, OptionPosition):
+                if not position.settle(market_data):
+                    options.append(i)
+            else:
+                values[i] = position.calculate_value(market_data)
+        values[options] = price_options([self.positions[slots[i]] for i in options], market_data)
+        return values
+
+    def _open_equity_slots(self) -> np.ndarray:
+        if self._open_slots is None:
+            self._open_slots = np.fromiter(self._open_equity, dtype=np.int64, count=len(self._open_equity))
+        return self._open_slots
+
+    def _prices(self, market_data: dict, slots: np.ndarray, strict: bool = True) -> np.ndarray:
+        """
+        Close dei simboli degli slot, KeyError se un simbolo non ha prezzo come nel vecchio dizionario;
+        con strict=False i prezzi mancanti sono NaN.
+        """
+        if not isinstance(market_data, SnapshotView):
+            equity = market_data['equity']
+            if not strict:
+                return np.array([equity[s]['close'] if s in equity else np.nan for s in self._symbol[slots]],
+                                dtype=np.float64)
+            return np.array([equity[symbol]['close'] for symbol in self._symbol[slots]], dtype=np.float64)
+        store = market_data.store
+        if (self._store_columns is None or self._store_columns[0] is not store
+                or len(self._store_columns[1]) != len(self._symbols)):
+            columns = np.array([store.ticker_index.get(s, -1) for s in self._symbols], dtype=np.int64)
+            self._store_columns = (store, columns)
+        columns = self._store_columns[1][self._symbol_id[slots]]
+        values = store.field('close')[market_data.row][columns]
+        missing = (columns < 0) | np.isnan(values)
+        if missing.any():
+            if strict:
+                raise KeyError(self._symbol[slots][missing][0])
+            values[missing] = np.nan
+        return values
+
+    def _closed_values(self, market_data: dict, slots: np.ndarray) -> np.ndarray:
+        """
+        Valore unitario di mercato alla data delle posizioni chiuse degli slot (il current_value del vecchio riepilogo):
+        close per le equity, BSM in blocco per le opzioni non scadute, 0 per le scadute.
+        Le posizioni chiuse non hanno bisogno di dati alla data: dove mancano il valore è NaN.
+        """
+        values = np.full(len(slots), np.nan)
+        equity = self._is_equity[slots]
+        values[equity] = self._prices(market_data, slots[equity], strict=False)
+        options = []
+        for i in np.flatnonzero(~equity):
+            position = self.positions[slots[i]]
+            if isinstance(position, OptionPosition):
+                if position.settle(market_data):
+                    values[i] = 0
+                elif self._has_option_data(position.symbol, market_data):
+                    options.append(i)
+            else:
+                try:
+                    values[i] = position.calculate_value(market_data)
+                except KeyError:
+                    pass
+        values[options] = price_options([self.positions[slots[i]] for i in options], market_data)
+        return values
+
+    @staticmethod
+    def _has_option_data(symbol: str, market_data: dict) -> bool:
+        return (symbol in market_data['equity'] and symbol in market_data['volatility']
+                and 'riskfree' in market_data['rate'])
+
     def calculate_total_value(self, market_data: dict) -> float:
         """Calcola il valore totale del portafoglio sommando il valore di tutte le posizioni."""
-        return sum(position.calculate_value(market_data) * position.quantity * position.position_type.value for position in self.positions)
-    
+        slots = self._open_equity_slots()
+        total = np.sum(self._prices(market_data, slots) * self._quantity[slots] * self._side[slots])
+        other = np.fromiter(self._open_other, dtype=np.int64, count=len(self._open_other))
+        total += np.sum(self._other_values(market_data, other) * self._quantity[other] * self._side[other])
+        return float(total)
+
     def get_closed_pnl(self) -> float:
         """Calcola il profit and loss totale del portafoglio."""
-        return sum(position.closed_pnl for position in self.positions)
-    
+        return self._closed_pnl_total
+
     def get_initial_ctv(self) -> float:
-        return sum(position.initial_ctv for position in self.positions)
-    
+        return self._initial_ctv_total
+
+    def get_turnover(self) -> float:
+        """Controvalore totale scambiato (aperture e chiusure) dall'inizio del backtest."""
+        return self._turnover_total
+
     def calculate_open_pnl(self, market_data: dict) -> float:
         """Calcola il profit and loss totale del portafoglio."""
-        return sum(position.calculate_pnl(market_data) for position in self.positions)
-    
+        slots = self._open_equity_slots()
+        values = self._prices(market_data, slots)
+        open_pnl = np.sum((values - self._entry_price[slots]) * self._side[slots] * self._quantity[slots])
+        other = np.fromiter(self._open_other, dtype=np.int64, count=len(self._open_other))
+        values = self._other_values(market_data, other)
+        open_pnl += np.sum((values - self._entry_price[other]) * self._side[other] * self._quantity[other])
+        return float(open_pnl)
+
     def global_pnl(self, market_data: dict):
-        open_pnl = sum(position.calculate_pnl(market_data) for position in self.positions)  
-        closed_pnl = sum(position.closed_pnl for position in self.positions)
-        return open_pnl + closed_pnl      
+        open_pnl = self.calculate_open_pnl(market_data)
+        return open_pnl + self.get_closed_pnl()
+
+    def greeks(self, market_data: dict) -> dict:
+        """
+        Greche del book aggregate per sottostante: {'symbols': lista, 'delta': array, 'gamma', 'vega', 'theta', 'rho'},
+        array allineati a symbols (i sottostanti con posizioni aperte).
+        Le opzioni aperte sono valutate in un solo passaggio vettoriale e pesate per quantità * side,
+        le equity contribuiscono al delta con quantità * side.
+        """
+        equity = self._open_equity_slots()
+        other = np.fromiter(self._open_other, dtype=np.int64, count=len(self._open_other))
+        options = np.array([slot for slot in other
+                            if isinstance(self.positions[slot], OptionPosition)
+                            and not self.positions[slot].settle(market_data)], dtype=np.int64)
+        unit = option_greeks([self.positions[slot] for slot in options], market_data)
+
+        totals = {name: np.zeros(len(self._symbols)) for name in GREEKS}
+        np.add.at(totals['delta'], self._symbol_id[equity], self._quantity[equity] * self._side[equity])
+        weight = self._quantity[options] * self._side[options]
+        for name in GREEKS:
+            np.add.at(totals[name], self._symbol_id[options], unit[name] * weight)
+
+        ids = np.unique(np.concatenate([self._symbol_id[equity], self._symbol_id[options]]))
+        greeks = {'symbols': [self._symbols[i] for i in ids]}
+        greeks.update({name: totals[name][ids] for name in GREEKS})
+        return greeks
+
+    def positions_columns(self, market_data: dict) -> dict:
+        """
+        Riepilogo delle posizioni in forma colonnare {colonna: array}, una riga per posizione
+        (chiuse comprese, in ordine di apertura), con gli stessi campi di get_positions_summary.
+        current_value è il valore di mercato alla data anche per le posizioni chiuse (NaN se manca il dato),
+        exit_value il valore unitario di uscita delle chiuse (NaN per le aperte).
+        """
+        n = self._size
+        open_pnl = np.zeros(n)
+        # prima le altre posizioni aperte: le opzioni scadute vengono chiuse al payoff (settle)
+        other = np.fromiter(self._open_other, dtype=np.int64, count=len(self._open_other))
+        other_values = self._other_values(market_data, other)
+        current_value = np.empty(n)
+        closed = np.flatnonzero(~self._is_open[:n])
+        current_value[closed] = self._closed_values(market_data, closed)
+        still_open = self._is_open[other]
+        current_value[other[still_open]] = other_values[still_open]
+        equity = self._open_equity_slots()
+        current_value[equity] = self._prices(market_data, equity)
+        exit_value = np.where(self._is_open[:n], np.nan, self._exit_value[:n])
+
+        alive = np.flatnonzero(self._is_open[:n])
+        open_pnl[alive] = (current_value[alive] - self._entry_price[alive]) * self._side[alive] * self._quantity[alive]
+        quantity = self._quantity[:n].astype(np.int64) if self._integer_quantity else self._quantity[:n].copy()
+        closed_pnl = self._closed_pnl[:n].copy()
+        return {
+            "ref_date": np.full(n, market_data['ref_date'], dtype=object),
+            "trade_date": self._trade_date[:n].copy(),
+            "trade_id": self._trade_id[:n].copy(),
+            "symbol": self._symbol[:n].copy(),
+            "type": self._type[:n].copy(),
+            "side": self._side[:n].copy(),
+            "quantity": quantity,
+            "entry_price": self._entry_price[:n].copy(),
+            "is_alive": self._is_open[:n].copy(),
+            "current_value": current_value,
+            "open_pnl": open_pnl,
+            "closed_pnl": closed_pnl,
+            "global_pnl": open_pnl + closed_pnl,
+            "exit_value": exit_value
+        }
 
     def get_positions_summary(self, market_data: dict):
         """Restituisce un riepilogo delle posizioni nel portafoglio."""
-        summary = []
-        for position in self.positions:
-            open_pnl = position.calculate_pnl(market_data)
-            summary.append({
-                "ref_date": market_data['ref_date'],
-                "trade_date": position.trade_date,
-                "trade_id": position.trade_id,
-                "symbol": position.symbol,
-                "type": position.asset_type.value,
-                "side": position.position_type.value,
-                "quantity": position.quantity,
-                "entry_price": position.entry_price,
-                "is_alive": position.is_open,
-                "current_value": position.calculate_value(market_data),
-                "open_pnl": open_pnl,
-                "closed_pnl": position.closed_pnl,
-                "global_pnl": open_pnl + position.closed_pnl
-            })
-        return summary
-    
-    def get_positions(self, symbol: str, position_type: AssetType) -> list:
+        columns = self.positions_columns(market_data)
+        return [dict(zip(columns, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+
+    def get_positions(self, symbol: str, position_type: AssetType, include_closed: bool = False) -> list:
         """
-        Restituisce tutte le posizioni associate a un determinato simbolo e tipo di posizione.
+        Restituisce le posizioni aperte associate a un determinato simbolo e tipo di posizione,
+        dall'indice (simbolo, asset_type) senza scorrere lo storico.
 
-        :param positions: Lista di oggetti Position.
         :param symbol: Simbolo dell'asset da cercare.
-        :param position_type: Tipo di posizione (LONG o SHORT).
+        :param position_type: Tipo di asset (AssetType).
+        :param include_closed: se True aggiunge in coda le posizioni già chiuse.
         :return: Lista di posizioni con il simbolo e il tipo specificato.
         """
-        filtered_positions = []
-        for position in self.positions:
-            if position.symbol == symbol and position.asset_type == position_type:
-                filtered_positions.append(position)
-        return filtered_positions
-    
+        key = (symbol, position_type)
+        positions = list(self._open_by_key.get(key, {}).values())
+        if include_closed:
+            positions += self._closed_by_key.get(key, [])
+        return positions
+
     def position_quantity(self, symbol: str, position_type: AssetType):
-        ''' 
+        '''
         restituisce la quantità totale delle posizioni per una tupla symbol-assettype
         '''
-        positions = self.get_positions(symbol=symbol, position_type=position_type)
-        return np.sum([pos.quantity for pos in positions])
-        
+        return self._open_quantity.get((symbol, position_type), 0)
+
+    def net_quantity(self, symbol: str, position_type: AssetType):
+        '''
+        restituisce la quantità netta (long - short) delle posizioni aperte per una tupla symbol-assettype
+        '''
+        return self._net_quantity.get((symbol, position_type), 0)
+
     def close_all_positions(self, market_data: dict):
-        for pos in self.positions:
-            if pos.is_open:
-                pos.close_position(market_data) 
+        for slot in sorted([*self._open_equity, *self._open_other]):
+            self.positions[slot].close_position(market_data)
 
     def close_positions(self, ticker, position_type, market_data: dict):
         positions = self.get_positions(symbol=ticker, position_type=position_type)
         for pos in positions:
-            pos.close_position(market_data) 
+            pos.close_position(market_data)
@@ -2,24 +2,34 @@ from abc import ABC, abstractmethod
 from datetime import date 
 import QuantLib as ql
 from .utils import *
-import random
+from .pricing import price_options
+import itertools
 from scipy.interpolate import RegularGridInterpolator
 
 class TradeId:
-    _existing_ids = set()
-
-    @classmethod
-    def generate(cls) -> int:
-        """Genera un numero intero univoco di 5 cifre per identificare una posizione."""
-        while True:
-            trade_id = random.randint(10000, 99999)  # Genera un numero di 5 cifre
-            if trade_id not in cls._existing_ids:
-                cls._existing_ids.add(trade_id)
-                return trade_id
-            
+    """
+    Allocatore sequenziale degli id dei trade. Ogni Portfolio ha il suo (Portfolio.trade_ids):
+    le posizioni lo ricevono alla creazione, così gli id non dipendono da altri backtest nello stesso processo.
+    """
+
+    def __init__(self, start: int = 1):
+        self._counter = itertools.count(start)
+
+    def generate(self) -> int:
+        """Restituisce il prossimo id intero univoco per identificare una posizione."""
+        return next(self._counter)
+
 class Position(ABC):
-    def __init__(self, symbol: str, asset_type: AssetType, quantity: float, market_data: dict, position_type: PositionType):
-        self.trade_id = TradeId.generate()
+    __slots__ = ('trade_id', 'is_open', 'closed_pnl', 'symbol', 'asset_type', 'quantity', 'trade_date',
+                 'entry_price', 'initial_ctv', 'position_type', 'portfolio', 'slot')
+
+    def __init__(self, symbol: str, asset_type: AssetType, quantity: float, market_data: dict, position_type: PositionType,
+                 trade_ids: TradeId = None):
+        # impostati da Portfolio.add_position
+        self.portfolio = None
+        self.slot = None
+        # senza allocatore l'id è assegnato dal portafoglio in add_position
+        self.trade_id = trade_ids.generate() if trade_ids is not None else None
         self.is_open = True
         self.closed_pnl = 0
         self.symbol = symbol
@@ -46,6 +56,8 @@ class Position(ABC):
             self.closed_pnl = self.calculate_pnl(market_data)
             self.quantity = 0 
             self.is_open = False
+            if self.portfolio is not None:
+                self.portfolio._archive(self)
         return
 
     def calculate_ctv(self, market_data: dict):
@@ -57,8 +69,11 @@ class Position(ABC):
 
 
 class EquityPosition(Position):
-    def __init__(self, symbol: str, quantity: float, market_data: dict, position_type: PositionType):
-        super().__init__(symbol, AssetType.EQUITY, quantity, market_data, position_type)
+    __slots__ = ()
+
+    def __init__(self, symbol: str, quantity: float, market_data: dict, position_type: PositionType,
+                 trade_ids: TradeId = None):
+        super().__init__(symbol, AssetType.EQUITY, quantity, market_data, position_type, trade_ids)
 
     def calculate_value(self, market_data: dict) -> float:
         """Usa il prezzo di  chiusura dell'azione per calcolare il valore della posizione."""
@@ -66,8 +81,10 @@ class EquityPosition(Position):
 
 
 class OptionPosition(Position):
+    __slots__ = ('strike_price', 'expiry_date', 'option_type', 'day_count', 'calendar', 'option')
+
     def __init__(self, symbol: str, quantity: float, market_data: dict, strike_price: float, expiry_date: date, option_type: OptionType, position_type: PositionType,
-                 day_count = ql.Actual365Fixed(), calendar = ql.TARGET()):
+                 day_count = ql.Actual365Fixed(), calendar = ql.TARGET(), trade_ids: TradeId = None):
         self.strike_price = strike_price
         self.expiry_date = expiry_date
         if option_type == OptionType.CALL:
@@ -77,25 +94,35 @@ class OptionPosition(Position):
         self.day_count = day_count
         self.calendar = calendar
         self.option = self._build_option()
-        super().__init__(symbol, AssetType.OPTION, quantity, market_data, position_type)
+        super().__init__(symbol, AssetType.OPTION, quantity, market_data, position_type, trade_ids)
 
 
     def calculate_value(self, market_data: dict):
-        if self.is_expiry_date(market_data['ref_date']):
-            if self.is_open:
-                payoff = self._payoff(market_data)
-                self.closed_pnl = (payoff - self.entry_price) * self.quantity * self.position_type.value
-                self.quantity = 0 
-                self.is_open = False
+        """Valore BSM con la superficie interpolata in cache (vedi pricing.price_options), 0 se scaduta."""
+        if self.settle(market_data):
             return 0
-        
-        if market_data['ref_date'] > self.expiry_date:
-            # se per qualche motivo è stata saltata l'expiry date senza chiudere/esercitare la posizione, approssima il payoff con la data successiva
-            if self.is_open:
-                payoff = self._payoff(market_data)
-                self.closed_pnl = (payoff - self.entry_price) * self.quantity * self.position_type.value
-                self.quantity = 0 
-                self.is_open = False
+        return float(price_options([self], market_data)[0])
+
+    def settle(self, market_data: dict) -> bool:
+        """
+        Alla scadenza chiude la posizione al payoff e ritorna True (anche per le posizioni già chiuse).
+        Se per qualche motivo è stata saltata l'expiry date senza chiudere/esercitare la posizione,
+        approssima il payoff con la data successiva.
+        """
+        if market_data['ref_date'] < self.expiry_date:
+            return False
+        if self.is_open:
+            payoff = self._payoff(market_data)
+            self.closed_pnl = (payoff - self.entry_price) * self.quantity * self.position_type.value
+            self.quantity = 0 
+            self.is_open = False
+            if self.portfolio is not None:
+                self.portfolio._archive(self)
+        return True
+
+    def calculate_value_ql(self, market_data: dict):
+        """Valutazione con QuantLib (AnalyticEuropeanEngine), usata per validare il pricing vettoriale."""
+        if self.settle(market_data):
             return 0
         spot_ref = market_data['equity'][self.symbol]['close']
         
@@ -118,7 +145,7 @@ class OptionPosition(Position):
         ql.FlatForward(valuation_date, market_data['rate']['riskfree'], self.day_count)
         )
         dividend_yield = ql.YieldTermStructureHandle(
-        ql.FlatForward(valuation_date, market_data['equity'][self.symbol]['div_yield'], self.day_count)
+        ql.FlatForward(valuation_date, market_data['equity'][self.symbol].get('div_yield', 0.0), self.day_count)
         )
         flat_vol_ts = ql.BlackVolTermStructureHandle(
         ql.BlackConstantVol(valuation_date, self.calendar, sigma, self.day_count)
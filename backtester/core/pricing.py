@@ -0,0 +1,148 @@
+import numpy as np
+import QuantLib as ql
+from scipy.interpolate import RegularGridInterpolator
+from scipy.special import ndtr
+
+__all__ = ['bsm_price', 'bsm_greeks', 'GREEKS', 'SurfaceCache', 'price_options', 'option_greeks']
+
+
+def bsm_price(spot, strike, t, rate, div_yield, sigma, option_type):
+    """
+    Prezzo Black-Scholes-Merton europeo in forma chiusa, vettoriale su tutti gli argomenti.
+    Tassi continui e varianza sigma^2 * t come AnalyticEuropeanEngine di QuantLib;
+    option_type vale 1 per le call e -1 per le put (ql.Option.Call / ql.Option.Put).
+    """
+    spot, strike, t, sigma = np.broadcast_arrays(*map(np.asarray, (spot, strike, t, sigma)))
+    w = np.asarray(option_type, dtype=np.float64)
+    discount = np.exp(-rate * t)
+    forward = spot * np.exp(-div_yield * t) / discount
+    stdev = sigma * np.sqrt(t)
+    d1 = np.log(forward / strike) / stdev + 0.5 * stdev
+    d2 = d1 - stdev
+    return discount * w * (forward * ndtr(w * d1) - strike * ndtr(w * d2))
+
+
+GREEKS = ('delta', 'gamma', 'vega', 'theta', 'rho')
+
+
+def bsm_greeks(spot, strike, t, rate, div_yield, sigma, option_type) -> dict:
+    """
+    Greche analitiche BSM con le convenzioni di QuantLib: vega e rho per unità (non per punto percentuale),
+    theta annuo. Vettoriali come bsm_price, ritornano {greca: array}.
+    """
+    spot, strike, t, sigma = np.broadcast_arrays(*map(np.asarray, (spot, strike, t, sigma)))
+    w = np.asarray(option_type, dtype=np.float64)
+    discount = np.exp(-rate * t)
+    dividend = np.exp(-div_yield * t)
+    sqrt_t = np.sqrt(t)
+    stdev = sigma * sqrt_t
+    d1 = np.log(spot * dividend / (strike * discount)) / stdev + 0.5 * stdev
+    d2 = d1 - stdev
+    density = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi)
+    n1, n2 = ndtr(w * d1), ndtr(w * d2)
+    return {
+        'delta': w * dividend * n1,
+        'gamma': dividend * density / (spot * stdev),
+        'vega': spot * dividend * density * sqrt_t,
+        'theta': (-spot * dividend * density * sigma / (2 * sqrt_t)
+                  - w * rate * strike * discount * n2 + w * div_yield * spot * dividend * n1),
+        'rho': w * strike * t * discount * n2,
+    }
+
+
+class SurfaceCache:
+    """
+    Interpolatori delle superfici di volatilità (moneyness x tenor in giorni) costruiti una volta
+    per (sottostante, data) e riusati da tutte le opzioni sullo stesso sottostante.
+    Tiene solo la data più recente: in un backtest le date avanzano e le vecchie non servono più.
+    """
+
+    def __init__(self):
+        self._ref_date = None
+        self._surfaces = {}
+
+    def get(self, symbol: str, market_data: dict):
+        ref_date = market_data['ref_date']
+        if ref_date != self._ref_date:
+            self._ref_date = ref_date
+            self._surfaces = {}
+        surface = market_data['volatility'][symbol]
+        if hasattr(surface, 'interpolate'):
+            # superficie del VolSurfaceStore: nessun interpolatore da costruire
+            return surface.interpolate
+        cached = self._surfaces.get(symbol)
+        # la superficie sorgente è tenuta nella cache: se cambia l'oggetto si ricostruisce
+        if cached is None or cached[0] is not surface:
+            interp = RegularGridInterpolator((np.asarray(surface['moneyness'], dtype=np.float64),
+                                              np.asarray(surface['tenor'], dtype=np.float64)),
+                                             np.asarray(surface['volatility'], dtype=np.float64),
+                                             bounds_error=False, fill_value=None)
+            cached = (surface, interp)
+            self._surfaces[symbol] = cached
+        return cached[1]
+
+    def clear(self):
+        self._ref_date = None
+        self._surfaces = {}
+
+
+SURFACES = SurfaceCache()
+
+
+def _year_fractions(options: list, ref_date, days: np.ndarray) -> np.ndarray:
+    """Frazioni d'anno alla scadenza: giorni/365 per Actual365Fixed, altrimenti il day count della posizione."""
+    t = days / 365.0
+    act365 = {}
+    for i, option in enumerate(options):
+        day_count = option.day_count
+        # di solito tutte le posizioni condividono lo stesso oggetto day count di default
+        if id(day_count) not in act365:
+            act365[id(day_count)] = day_count.name() == 'Actual/365 (Fixed)'
+        if not act365[id(day_count)]:
+            t[i] = day_count.yearFraction(ql.Date.from_date(ref_date), ql.Date.from_date(option.expiry_date))
+    return t
+
+
+def _option_inputs(options: list, market_data: dict, surfaces: SurfaceCache) -> dict:
+    """
+    Input BSM per opzione (spot, strike, t, rate, div_yield, sigma, option_type) come array allineati a options:
+    per ogni sottostante una sola interpolazione della superficie.
+    """
+    n = len(options)
+    inputs = {name: np.zeros(n) for name in ('spot', 'strike', 't', 'rate', 'div_yield', 'sigma', 'option_type')}
+    ref_date = market_data['ref_date']
+    by_symbol = {}
+    for i, option in enumerate(options):
+        by_symbol.setdefault(option.symbol, []).append(i)
+
+    for symbol, idx in by_symbol.items():
+        group = [options[i] for i in idx]
+        spot = market_data['equity'][symbol]['close']
+        strike = np.array([o.strike_price for o in group], dtype=np.float64)
+        days = np.array([(o.expiry_date - ref_date).days for o in group], dtype=np.float64)
+        inputs['spot'][idx] = spot
+        inputs['strike'][idx] = strike
+        inputs['t'][idx] = _year_fractions(group, ref_date, days)
+        inputs['rate'][idx] = market_data['rate']['riskfree']
+        # lo store dei prezzi non ha i dividendi: senza div_yield il rendimento è nullo
+        inputs['div_yield'][idx] = market_data['equity'][symbol].get('div_yield', 0.0)
+        inputs['sigma'][idx] = surfaces.get(symbol, market_data)(np.column_stack([strike / spot, days]))
+        inputs['option_type'][idx] = [o.option_type for o in group]
+    return inputs
+
+
+def price_options(options: list, market_data: dict, surfaces: SurfaceCache = SURFACES) -> np.ndarray:
+    """
+    Valore unitario di opzioni europee non scadute (OptionPosition o oggetti con gli stessi attributi):
+    per ogni sottostante una sola interpolazione della superficie, poi una sola valutazione BSM vettoriale.
+    """
+    if not options:
+        return np.zeros(0)
+    return bsm_price(**_option_inputs(options, market_data, surfaces))
+
+
+def option_greeks(options: list, market_data: dict, surfaces: SurfaceCache = SURFACES) -> dict:
+    """Greche unitarie (vedi bsm_greeks) di opzioni europee non scadute, in un solo passaggio vettoriale."""
+    if not options:
+        return {name: np.zeros(0) for name in GREEKS}
+    return bsm_greeks(**_option_inputs(options, market_data, surfaces))
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from itertools import chain
+
+__all__ = ['RecordBuffer']
+
+
+class RecordBuffer:
+    """
+    Buffer colonnare a blocchi per i record prodotti a ogni step del backtest.
+    Ogni append aggiunge un blocco per colonna (nessuna copia di quanto già accumulato),
+    il DataFrame viene costruito una volta sola alla prima lettura e tenuto in cache
+    finché non arrivano nuovi record.
+    """
+
+    def __init__(self):
+        self.columns = []
+        self._chunks = {}
+        self._sizes = []
+        self._frame = None
+
+    def append(self, records: list):
+        """Aggiunge un blocco di record (lista di dict con le stesse chiavi)."""
+        if not records:
+            return
+        self.extend({key: [record[key] for record in records] for key in records[0]})
+
+    def extend(self, columns: dict):
+        """Aggiunge un blocco già in forma colonnare {colonna: valori}, tutte della stessa lunghezza."""
+        size = len(next(iter(columns.values()))) if columns else 0
+        if size == 0:
+            return
+        for key in columns:
+            if key not in self._chunks:
+                # colonna nuova: i blocchi precedenti non la avevano
+                self.columns.append(key)
+                self._chunks[key] = [[None] * n for n in self._sizes]
+        for key in self.columns:
+            self._chunks[key].append(columns[key] if key in columns else [None] * size)
+        self._sizes.append(size)
+        self._frame = None
+
+    def __len__(self):
+        return sum(self._sizes)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame di tutti i record; l'indice riparte da 0 a ogni blocco,
+        come la concatenazione dei DataFrame dei singoli step.
+        """
+        if self._frame is None:
+            if not self._sizes:
+                self._frame = pd.DataFrame()
+            else:
+                index = np.concatenate([np.arange(n) for n in self._sizes])
+                data = {key: self._concat(self._chunks[key]) for key in self.columns}
+                self._frame = pd.DataFrame(data, index=index, columns=self.columns)
+        return self._frame
+
+    @staticmethod
+    def _concat(chunks: list):
+        if all(isinstance(chunk, np.ndarray) for chunk in chunks):
+            return np.concatenate(chunks)
+        return list(chain.from_iterable(chunks))
+
+    def clear(self):
+        self.columns = []
+        self._chunks = {}
+        self._sizes = []
+        self._frame = None
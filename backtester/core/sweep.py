@@ -0,0 +1,84 @@
+import inspect
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ..data_handler import MarketDataHandler
+from .performance import Analytics
+
+__all__ = ['param_grid', 'run_strategy', 'sweep']
+
+
+def param_grid(grid: dict) -> list:
+    """Prodotto cartesiano di {parametro: valori} come lista di dict, nell'ordine delle chiavi."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_strategy(strategy, kwargs: dict, params: dict) -> dict:
+    """
+    Esegue un backtest di strategy e ritorna le metriche di Analytics.summary() come numeri.
+    I parametri accettati da __init__ sono passati al costruttore, gli altri impostati come attributi
+    prima di backtest(). Senza posizioni le metriche sono NaN.
+    """
+    accepted = inspect.signature(strategy.__init__).parameters
+    takes_any = any(p.kind == p.VAR_KEYWORD for p in accepted.values())
+    init = {k: v for k, v in params.items() if takes_any or k in accepted}
+    backtester = strategy(**kwargs, **init)
+    for name, value in params.items():
+        if name not in init:
+            setattr(backtester, name, value)
+    backtester.backtest()
+    if backtester.period_pnl is None:
+        return {}
+    return {name: pd.to_numeric(value) for name, value in Analytics(backtester).summary().items()}
+
+
+def _run(task):
+    strategy, kwargs, params = task
+    return run_strategy(strategy, kwargs, params)
+
+
+def sweep(strategy, kwargs: dict, grid, workers: int = None) -> pd.DataFrame:
+    """
+    Backtest di strategy per ogni combinazione di parametri, in parallelo su un pool di processi.
+
+    :param strategy: sottoclasse di Backtester, definita in un modulo importabile dai processi worker.
+    :param kwargs: argomenti comuni del costruttore (universe, start_date, ...).
+    :param grid: {parametro: valori} (vedi param_grid) oppure lista di dict di parametri.
+    :param workers: numero di processi (None: uno per core, 1: sequenziale nel processo corrente).
+    :return: DataFrame con una riga per combinazione: i parametri e le metriche di Analytics.summary().
+
+    Il mercato è caricato una volta nel processo principale (con l'eventuale rebuild) e la finestra caricata
+    è salvata in una cartella temporanea: ogni worker la apre in memory-map in sola lettura (vedi open_loaded),
+    quindi le pagine sono condivise dal sistema operativo anche con spawn, senza rileggere la cache completa
+    né copiarne la finestra in ogni processo, e sono riusate per tutti i backtest che il worker esegue.
+    """
+    combinations = param_grid(grid) if isinstance(grid, dict) else list(grid)
+    kwargs = dict(kwargs)
+    universe, start_date, end_date = kwargs.get('universe'), kwargs.get('start_date'), kwargs.get('end_date')
+    lookback = kwargs.get('lookback')
+    market = MarketDataHandler()
+    market.load_market(universe, start_date, end_date, rebuild=kwargs.get('rebuild', False), lookback=lookback)
+    if 'rebuild' in kwargs:
+        kwargs['rebuild'] = False
+
+    tasks = [(strategy, kwargs, params) for params in combinations]
+    workers = min(max(1, workers or os.cpu_count() or 1), max(len(tasks), 1))
+    if workers == 1:
+        results = [_run(task) for task in tasks]
+    else:
+        with tempfile.TemporaryDirectory() as shared:
+            key = market.save_loaded(shared, universe, start_date, end_date, lookback)
+            with ProcessPoolExecutor(workers, initializer=MarketDataHandler.open_loaded,
+                                     initargs=(key, shared)) as pool:
+                results = list(pool.map(_run, tasks))
+
+    metrics = list(dict.fromkeys(name for result in results for name in result))
+    rows = [{**params, **{name: result.get(name, np.nan) for name in metrics}}
+            for params, result in zip(combinations, results)]
+    return pd.DataFrame(rows)
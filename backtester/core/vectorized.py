@@ -0,0 +1,86 @@
+import numpy as np
+
+__all__ = ['weights_backtest']
+
+
+def weights_backtest(prices: np.ndarray, weights: np.ndarray, starting_balance: float, cost: float = 0.0) -> dict:
+    """
+    Backtest a pesi target in blocco su matrici (giorni x ticker), senza loop sulle date.
+    Il peso deciso alla chiusura del giorno t (frazione dell'equity, negativo = short) è tenuto fino alla
+    chiusura di t+1; l'ultimo giorno tutto viene chiuso. Tra un giorno e l'altro i pesi derivano con i prezzi,
+    il ribilanciamento ai pesi target costa cost per unità di controvalore scambiato.
+    Ogni tratto consecutivo con lo stesso segno su un ticker è un trade.
+
+    :return: {'equity', 'pnl' (giorni x ticker), 'turnover' (per giorno), 'trade_id' (giorni x ticker, 0 = flat),
+              'side' (giorni x ticker), 'starts' (maschera delle aperture), 'open_pnl' (pnl cumulato del trade aperto),
+              'closed_pnl' (per trade_id), 'close_row' (per trade_id), 'quantity' (giorni x ticker)}
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+    weights[-1] = 0
+    n_days, n_tickers = prices.shape
+
+    returns = np.zeros_like(prices)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = prices[1:] / prices[:-1] - 1
+    # ticker senza prezzo: nessun rendimento (il chiamante verifica che non siano in portafoglio)
+    returns[~np.isfinite(returns)] = 0
+    held = np.zeros_like(weights)
+    held[1:] = weights[:-1]
+    portfolio_return = np.sum(held * returns, axis=1)
+    # pesi prima del ribilanciamento: quelli del giorno prima derivati con i prezzi
+    drifted = held * (1 + returns) / (1 + portfolio_return)[:, None]
+    traded = np.abs(weights - drifted)
+
+    growth = (1 + portfolio_return) * (1 - cost * traded.sum(axis=1))
+    equity = starting_balance * np.cumprod(growth)
+    previous = np.concatenate([[starting_balance], equity[:-1]])
+    pre_trade = previous * (1 + portfolio_return)
+    hold_pnl = held * returns * previous[:, None]
+    cost_pnl = -cost * traded * pre_trade[:, None]
+
+    # trade: tratti con segno costante, id in ordine di apertura (giorno, poi ticker)
+    side = np.sign(weights)
+    previous_side = np.zeros_like(side)
+    previous_side[1:] = side[:-1]
+    starts = (side != 0) & (side != previous_side)
+    start_ids = np.cumsum(starts.ravel()).reshape(starts.shape)
+    rows = np.arange(n_days)[:, None]
+    last_start = np.maximum.accumulate(np.where(starts, rows, -1), axis=0)
+    alive = side != 0
+    trade_id = np.where(alive, start_ids[np.maximum(last_start, 0), np.arange(n_tickers)], 0)
+
+    # il pnl di tenuta va al trade del giorno prima, il costo al trade aperto (o a quello appena chiuso)
+    hold_id = np.zeros_like(trade_id)
+    hold_id[1:] = trade_id[:-1]
+    cost_id = np.where(alive, trade_id, hold_id)
+    n_trades = int(start_ids[-1, -1]) if starts.size else 0
+    closed_pnl = (np.bincount(hold_id.ravel(), hold_pnl.ravel(), n_trades + 1)
+                  + np.bincount(cost_id.ravel(), cost_pnl.ravel(), n_trades + 1))
+
+    # pnl cumulato del trade aperto: cumulata per colonna meno quella al giorno prima dell'apertura
+    contribution = (np.where((hold_id == trade_id) & alive, hold_pnl, 0)
+                    + np.where((cost_id == trade_id) & alive, cost_pnl, 0))
+    cumulative = np.cumsum(contribution, axis=0)
+    before = np.where(last_start > 0, cumulative[np.maximum(last_start - 1, 0), np.arange(n_tickers)], 0)
+    open_pnl = np.where(alive, cumulative - before, 0)
+
+    # giorno di chiusura: primo giorno in cui il trade di ieri non è più aperto
+    closing = (hold_id != 0) & (hold_id != trade_id)
+    close_row = np.zeros(n_trades + 1, dtype=np.int64)
+    close_row[hold_id[closing]] = np.nonzero(closing)[0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quantity = np.where(alive, np.abs(weights) * equity[:, None] / prices, 0)
+    return {
+        'equity': equity,
+        'pnl': hold_pnl + cost_pnl,
+        'turnover': traded.sum(axis=1) * pre_trade,
+        'trade_id': trade_id,
+        'side': side.astype(np.int64),
+        'starts': starts,
+        'open_pnl': open_pnl,
+        'closed_pnl': closed_pnl,
+        'close_row': close_row,
+        'quantity': quantity,
+    }
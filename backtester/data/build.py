@@ -3,6 +3,8 @@ from pathlib import Path
 import datetime
 # import QuantLib as ql 
 import json
+import os
+from ..vol_store import VolSurfaceStore
 
 DATA_PATH = "C:/Users/S542279/Desktop/backtester/backtester/data/"
 # DATA_PATH = "C:/UsersS542282/Documents/GitHub/backtester/backtester/data/"
@@ -19,8 +21,10 @@ class MarketData:
         self.prices_path = DATA_PATH + "prices"
         self.vols_path = DATA_PATH + "volatilities"
         self.data_path = DATA_PATH
+        self.vol_store_path = DATA_PATH + "cache/vols"
         
         self.market_data = {}
+        self.vol_store = VolSurfaceStore(self.vol_store_path)
 
     def _fill_prices(self):
         """
@@ -58,12 +62,19 @@ class MarketData:
                 }
 
     def _fill_vols(self):
+        """
+        Carica le superfici di volatilità nel VolSurfaceStore (array densi per sottostante, salvati in vol_store_path).
+        Nel market_data ogni data ha la vista 'volatility' sullo store al posto delle liste annidate.
+        """
         all_file_vols = get_file_names(self.vols_path)
+        self.vol_store = VolSurfaceStore(self.vol_store_path)
         for file in all_file_vols:
             symbol = file.replace(".xlsx","")
             symbol = symbol.replace("_ivol","")
             vols_df = pd.read_excel(f"{self.vols_path}/{file}", index_col=0)
             vols_df.index = pd.to_datetime(vols_df.index, format='%d/%m/%y').date
+            vols_df["tenor"] = vols_df["tenor"].str.replace("D", "").astype(int)
+            self.vol_store.add_frame(symbol, vols_df)
 
             available_dates = vols_df.index.unique().values
             for current_date in available_dates:
@@ -74,29 +85,21 @@ class MarketData:
                         "rate": {"riskfree": None},  # Default risk-free rate
                         "volatility": {}
                     }
+        self.vol_store.save(self.vol_store_path)
 
-                vols_df_tmp = vols_df.loc[current_date].copy()
-                vols_df_tmp["tenor"] = vols_df_tmp["tenor"].str.replace("D", "").astype(int)
-
-                moneyness = vols_df_tmp['moneyness'].tolist()
-                tenors = vols_df_tmp['tenor'].tolist()
-                vol_pivot = vols_df_tmp.pivot(index="moneyness", columns="tenor", values="implied_vol")
-                moneyness = vol_pivot.index.tolist()
-                tenors = vol_pivot.columns.tolist()
-                vols = vol_pivot.values.tolist()
+    def _attach_vols(self):
+        """Sostituisce i dizionari 'volatility' con le viste sul VolSurfaceStore, se presente."""
+        if not os.path.isdir(self.vol_store_path):
+            return
+        self.vol_store = VolSurfaceStore(self.vol_store_path)
+        for date_key, data in self.market_data.items():
+            data["volatility"] = self.vol_store.day(date_key)
 
-                self.market_data[current_date.isoformat()]['volatility'][symbol] = {
-                        "ref_date": current_date.isoformat(),
-                        "moneyness": moneyness,
-                        "tenor": tenors,
-                        "volatility": vols,
-                        "is_valid": True
-                    }
-                                                                        
     def build(self):
         self._fill_prices()
         self._fill_vols()
 
+        # le superfici sono nello store: nel JSON restano solo i prezzi
         with open(f"{self.data_path}MarketData.json", "w") as json_file:
             json.dump(self.market_data, json_file, indent=4)
 
@@ -118,6 +121,7 @@ class MarketData:
         for date_key, data in self.market_data.items():
             if "ref_date" in data:
                 data["ref_date"] = datetime.datetime.strptime(data["ref_date"], "%Y-%m-%d").date()
+        self._attach_vols()
 
         
     
\ No newline at end of file
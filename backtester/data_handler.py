@@ -1,53 +1,73 @@
 import pandas as pd 
 import numpy as np 
 from datetime import datetime
-from xbbg import blp
 import os 
 import matplotlib.pyplot as plt
 import mplfinance as mpf
 import matplotlib.dates as mdates
 from matplotlib.patches import Rectangle
 import json
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .market_store import FIELDS, MarketStore, MarketStoreBuilder, MarketDataView
+from .fetch import FetchScheduler
+try:
+    from xbbg import blp
+except ImportError:
+    # senza terminale Bloomberg si può usare una source offline (es. fetch.ReplayBlp)
+    blp = None
+
+# oltre a MarketDataHandler restano esportati i nomi che il package esponeva già da questo modulo
+# (bt.blp, bt.pd, ...): i moduli aggiunti dopo (shutil, pyarrow, executor, ...) non finiscono nel package
+__all__ = ['MarketDataHandler', 'blp', 'pd', 'np', 'datetime', 'os', 'plt', 'mpf', 'mdates', 'Rectangle', 'json']
+
+# valore della colonna 'type' nei file prices/{ticker}/{YYYY}.parquet per ciascuna frequenza
+PRICE_TYPES = {'1d': 'eod', '1m': 'intraday'}
+# righe per row group: circa un mese di barre a 1 minuto
+ROW_GROUP_SIZE = 10_000
+# primo giorno scaricato per lo storico intraday
+INTRADAY_START = '2024-09-01'
+# store già aperti in questo processo, riusati da load_market senza rileggere la cache:
+# {(cache EOD, mtime, universe, start_date, end_date, lookback): (eod_store, intraday_store)},
+# al più LOADED_SIZE finestre, le meno usate di recente escono per prime
+LOADED_SIZE = 4
+_LOADED = OrderedDict()
+# parametri della richiesta bdh per i prezzi daily
+DAILY_REQUEST = dict(flds=['open', 'high', 'low', 'px_last', 'volume'],
+                     CshAdjNormal=True, CshAdjAbnormal=True, CapChg=True)
 
 class MarketDataHandler:
     
-    def __init__(self):
+    def __init__(self, source=None, fetch_workers: int = 4):
         DATA_PATH = "C:/Users/S542279/Desktop/backtester/data/"
         self.prices_path = DATA_PATH + "prices"
         self.vols_path = DATA_PATH + "volatilities"
         self.data_path = DATA_PATH
+        self.eod_store = None
+        self.intraday_store = None
         self.market_data = {}
+        # source: xbbg.blp di default, oppure un oggetto con la stessa interfaccia (bdh, bdib)
+        self.fetcher = FetchScheduler(source if source is not None else blp, max_workers=fetch_workers)
 
-    @staticmethod
-    def _bbg_intraday_dump(ticker: str,
+    def _bbg_intraday_dump(self,
+                        ticker: str,
                         start_date: str,
                         end_date: str) -> pd.DataFrame:
         """
-        Scarica i dati intraday bdib per un range di date.
+        Scarica i dati intraday bdib per un range di date (solo giorni di trading, in parallelo).
         """      
         start_dt = pd.to_datetime(start_date)
         end_dt   = pd.to_datetime(end_date)
         if end_dt < start_dt:
             raise ValueError(f"end_date ({end_date}) deve essere maggiore o uguale a start_date ({start_date})")
  
-        date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-        
-        df_list = []
-        for dt in date_range:
-            try:
-                df_day = blp.bdib(ticker=ticker, dt=dt, ref='EquityAllDay', session='allday')
-                df_list.append(df_day)
-            except Exception as e:
-                print(f"Errore per {dt.date()}: {e}")
-        
-        if df_list:
-            df_all = pd.concat(df_list)
-        else:
-            df_all = pd.DataFrame()
-        return df_all.get(ticker, df_all)
+        return self.fetcher.intraday(ticker, start_date, end_date)
     
-    @staticmethod
-    def _bbg_daily_dump(ticker: str,
+    def _bbg_daily_dump(self,
+                        ticker: str,
                         start_date: str,
                         end_date: str) -> pd.DataFrame:
         """
@@ -58,13 +78,7 @@ class MarketDataHandler:
         if end_dt < start_dt:
             raise ValueError(f"end_date ({end_date}) deve essere maggiore o uguale a start_date ({start_date})")
  
-        df_all= blp.bdh(ticker,
-                flds=['open', 'high', 'low', 'px_last', 'volume'], 
-                CshAdjNormal=True, CshAdjAbnormal=True, CapChg=True,
-                start_date=start_date,
-                end_date=end_date)
-        
-        df = df_all.get(ticker, df_all)
+        df = self.fetcher.daily([ticker], start_date, end_date, **DAILY_REQUEST)[ticker]
         df = df.rename(columns={'px_last': 'close'})
         return df.dropna()
 
@@ -98,32 +112,147 @@ class MarketDataHandler:
                 'insertion_time']] 
         return df
 
-    def load_price(self, ticker: str, freq: str) -> pd.DataFrame:
-        # 1. Costruisci il path in base alla frequenza
+    def load_price(self, ticker: str, freq: str, start_date=None, end_date=None, columns=None) -> pd.DataFrame:
+        """
+        Carica i prezzi di un ticker per la frequenza richiesta.
+        Se esiste prices/{ticker}/ legge i Parquet annuali leggendo solo gli anni,
+        i row group (filtro su date) e le colonne necessari, altrimenti il vecchio CSV.
+        """
+        if freq not in PRICE_TYPES:
+            raise ValueError("freq deve essere '1m' o '1d'")
+
+        if os.path.isdir(self._ticker_dir(ticker)):
+            if columns is None:
+                columns = [c for c in self._price_columns(ticker) if c != 'type' and not (freq == '1d' and c == 'time')]
+            return self._read_partitions(ticker, freq, start_date, end_date, columns).to_pandas()
+
+        # 1. Layout CSV storico
+        file_path = self._price_file(ticker, freq)
         if freq == '1m':
-            file_path = os.path.join(self.prices_path, f"{ticker}.csv")
             converters = {
                 'date': lambda x: datetime.strptime(x, "%Y-%m-%d").date(),
                 'time': lambda x: datetime.strptime(x, "%H:%M:%S").time(),
                 'insertion_time': lambda x: datetime.fromisoformat(x)
             }
-        elif freq == '1d':
-            file_path = os.path.join(self.data_path, "daily", f"{ticker}.csv")
+        else:
             converters = {
                 'date': lambda x: datetime.strptime(x, "%Y-%m-%d").date(),
                 'insertion_time': lambda x: datetime.fromisoformat(x)
             }
-        else:
-            raise ValueError("freq deve essere '1m' o '1d'")
 
-        # 2. Controllo esistenza file
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Il file '{file_path}' non esiste. "
+        # 2. Carica, filtra e ritorna
+        df = pd.read_csv(file_path, converters=converters)
+        if start_date is not None:
+            df = df[df['date'] >= pd.Timestamp(start_date).date()]
+        if end_date is not None:
+            df = df[df['date'] <= pd.Timestamp(end_date).date()]
+        if columns is not None:
+            df = df[columns]
+        return df.reset_index(drop=True)
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.prices_path, ticker)
+
+    def _partitions(self, ticker: str, start_date=None, end_date=None) -> list:
+        """File prices/{ticker}/{YYYY}.parquet degli anni compresi tra start_date ed end_date."""
+        ticker_dir = self._ticker_dir(ticker)
+        if not os.path.isdir(ticker_dir):
+            return []
+        first = pd.Timestamp(start_date).year if start_date is not None else None
+        last = pd.Timestamp(end_date).year if end_date is not None else None
+        files = []
+        for name in sorted(os.listdir(ticker_dir)):
+            year = os.path.splitext(name)[0]
+            if not name.endswith(".parquet") or not year.isdigit():
+                continue
+            if (first is not None and int(year) < first) or (last is not None and int(year) > last):
+                continue
+            files.append(os.path.join(ticker_dir, name))
+        return files
+
+    def _price_columns(self, ticker: str) -> list:
+        files = self._partitions(ticker)
+        return pq.read_schema(files[-1]).names if files else []
+
+    def _read_partitions(self, ticker: str, freq: str, start_date=None, end_date=None, columns=None) -> pa.Table:
+        """
+        Legge i Parquet del ticker con pruning sugli anni, filtro su type/date
+        (applicato ai row group tramite le statistiche) e proiezione sulle colonne.
+        """
+        files = self._partitions(ticker, start_date, end_date)
+        filters = [('type', '=', PRICE_TYPES[freq])]
+        if start_date is not None:
+            filters.append(('date', '>=', pd.Timestamp(start_date).date()))
+        if end_date is not None:
+            filters.append(('date', '<=', pd.Timestamp(end_date).date()))
+        if not files:
+            raise FileNotFoundError(f"Nessun file prezzi per '{ticker}' in '{self._ticker_dir(ticker)}'. "
                                     "Esegui prima download_history o update_series.")
+        return pq.ParquetDataset(files, filters=filters).read(columns=columns)
 
-        # 3. Carica e ritorna
-        df = pd.read_csv(file_path, converters=converters)
-        return df         
+    def _has_prices(self, ticker: str, freq: str) -> bool:
+        return self._last_saved_date(ticker, freq) is not None
+
+    def _last_saved_date(self, ticker: str, freq: str):
+        """
+        Ultima data salvata per ticker+freq, letta dalle statistiche dei row group
+        dell'ultimo anno che contiene quel type (nessuna lettura dei dati).
+        """
+        data_type = PRICE_TYPES[freq]
+        for path in reversed(self._partitions(ticker)):
+            parquet_file = pq.ParquetFile(path)
+            meta = parquet_file.metadata
+            i_type, i_date = meta.schema.names.index('type'), meta.schema.names.index('date')
+            last = None
+            for rg in range(meta.num_row_groups):
+                type_stats = meta.row_group(rg).column(i_type).statistics
+                date_stats = meta.row_group(rg).column(i_date).statistics
+                if type_stats is None or date_stats is None or not date_stats.has_min_max:
+                    candidate = None
+                elif type_stats.min == type_stats.max == data_type:
+                    candidate = date_stats.max
+                elif type_stats.min <= data_type <= type_stats.max:
+                    candidate = None
+                else:
+                    continue
+                if candidate is None:
+                    # row group misto o senza statistiche: leggo solo date e type di quel row group
+                    table = parquet_file.read_row_group(rg, columns=['date', 'type']).to_pandas()
+                    dates = table.loc[table['type'] == data_type, 'date']
+                    if dates.empty:
+                        continue
+                    candidate = dates.max()
+                last = candidate if last is None else max(last, candidate)
+            if last is not None:
+                return last
+        return None
+
+    def _write_prices(self, ticker: str, df: pd.DataFrame, replace_from=None):
+        """
+        Salva i record in prices/{ticker}/{YYYY}.parquet (ZSTD).
+        Solo gli anni presenti in df vengono toccati: se il file esiste viene unito ai nuovi
+        record, deduplicato su ['date','time','type'] (vince l'ultima occorrenza) e riscritto,
+        altrimenti viene creato direttamente. Con replace_from i record dello stesso type
+        con data >= replace_from vengono prima rimossi (overwrite dell'ultima giornata).
+        Ordina per type/date/time, così i record EOD finiscono in row group separati da quelli intraday.
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        years = pd.to_datetime(df['date']).dt.year
+        for year, df_year in df.groupby(years):
+            path = os.path.join(ticker_dir, f"{int(year)}.parquet")
+            if os.path.exists(path):
+                df_old = pd.read_parquet(path)
+                if replace_from is not None:
+                    stale = df_old['type'].isin(df_year['type'].unique()) & (df_old['date'] >= replace_from)
+                    df_old = df_old.loc[~stale]
+                df_year = pd.concat([df_old, df_year], ignore_index=True)
+            df_year = (df_year.drop_duplicates(subset=['date', 'time', 'type'], keep='last')
+                              .sort_values(['type', 'date', 'time'], kind='stable'))
+            # scrittura su file temporaneo e rename: un errore non lascia la partizione a metà
+            tmp_path = path + ".tmp"
+            df_year.to_parquet(tmp_path, index=False, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+            os.replace(tmp_path, path)
 
     def download_history(self,
                 ticker: str,
@@ -131,8 +260,9 @@ class MarketDataHandler:
                 end_date: str,
                 intraday: bool = True):
         ''' 
-        # scarica i dati da bbg chiamando _bbg_daily_dump (in self.prices_path +"/daily") e _bbg_intraday_dump (in self.prices_path)
-        # se ticker già presente deve dare errore perché non si vuole sovrascrivere
+        # scarica i dati da bbg chiamando _bbg_daily_dump (type 'eod') e _bbg_intraday_dump (type 'intraday')
+        # e li salva in prices/{ticker}/{YYYY}.parquet
+        # se il ticker ha già dati per quella frequenza deve dare errore perché non si vuole sovrascrivere
         '''
         if intraday:
             timeframes = ['1d', '1m']
@@ -142,70 +272,54 @@ class MarketDataHandler:
         for freq in timeframes:
             try:
                 if freq == '1d':
-                    out_dir = os.path.join(self.data_path, "daily")
                     fetch   = self._bbg_daily_dump
                 elif freq == '1m':
-                    out_dir = self.prices_path
-                    start_date = '2024-09-01'
+                    start_date = INTRADAY_START
                     fetch   = self._bbg_intraday_dump
-                file_path = os.path.join(out_dir, f"{ticker}.csv")
-                if os.path.exists(file_path):
-                    raise FileExistsError(f"Il file '{file_path}' esiste già, non sovrascrivo.")
+                if self._has_prices(ticker, freq):
+                    raise FileExistsError(f"I dati {freq} di '{ticker}' esistono già, non sovrascrivo.")
                 df = fetch(ticker, start_date, end_date)
                 df = self.create_table(df, ticker)
-                if freq == '1d':
-                    df.drop('time', axis=1, inplace=True)
-                df.to_csv(file_path, index=False)
-                print(f"Scaricato {ticker} ({freq}) in '{file_path}'")
+                df['type'] = PRICE_TYPES[freq]
+                self._write_prices(ticker, df)
+                print(f"Scaricato {ticker} ({freq}) in '{self._ticker_dir(ticker)}'")
             except Exception as e:
                 print(e)
                 continue
 
     def update_series(self, ticker: str, freq: str):
         """
-        Se esiste già il CSV per il ticker+freq, scarica solo i dati
-        più recenti (da ultimo presente fino a oggi), unisce e salva.
+        Se esistono già i dati per il ticker+freq, scarica solo i dati
+        più recenti (dall'ultima data presente fino a oggi) e li salva in modo incrementale:
+        l'ultima giornata salvata viene riscritta, gli anni nuovi sono aggiunti come nuove
+        partizioni e quelli precedenti non vengono letti né modificati.
         freq: '1d' o '1m'
         """
-        # 1. Percorso e funzione di fetch
+        # 1. Funzione di fetch
         if freq == '1d':
-            folder = os.path.join(self.data_path, "daily")
             fetch = self._bbg_daily_dump
         elif freq == '1m':
-            folder = self.prices_path
             fetch = self._bbg_intraday_dump
         else:
             raise ValueError("freq deve essere '1d' o '1m'")
 
-        file_path = os.path.join(folder, f"{ticker}.csv")
-
-        # 2. Se il file non esiste, fermati
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Il file '{file_path}' non esiste. Usa prima download_history.")
-
-        df_old = self.load_price(ticker, freq)
-        last_dt = df_old['date'].max()
+        # 2. Ultima data salvata (dalle statistiche Parquet); se non ci sono dati, fermati
+        last_dt = self._last_saved_date(ticker, freq)
+        if last_dt is None:
+            raise FileNotFoundError(f"Nessun dato {freq} per '{ticker}'. Usa prima download_history.")
         start_date = last_dt.isoformat()
         end_date = datetime.now().date().isoformat()
 
-        # 5. Fetch nuovi dati
+        # 3. Fetch nuovi dati
         df_new_raw = fetch(ticker, start_date, end_date)
         if df_new_raw.empty:
             print(f"Nessun dato scaricato da {start_date} a {end_date} per {ticker} ({freq})")
-            # return
+            return
         df_new = self.create_table(df_new_raw, ticker)
-        if freq == '1d':
-            df_new = df_new.drop('time', axis=1)
-        # 7. Unisci e rimuovi duplicati
-        if freq == '1d':
-            df_merged = pd.concat([df_old, df_new]).drop_duplicates(subset=['date'], keep='last')
-            df_merged = df_merged.sort_values('date').reset_index(drop=True)
-        else:
-            df_merged = pd.concat([df_old, df_new]).drop_duplicates(subset=['date', 'time'], keep='last')
-            df_merged = df_merged.sort_values(['date', 'time']).reset_index(drop=True)
-        # 8. Salva CSV sovrascrivendo
-        df_merged.to_csv(file_path, index=False)
-        print(f"Aggiornato {ticker} ({freq}): da {start_date} a {end_date} in '{file_path}'")
+        df_new['type'] = PRICE_TYPES[freq]
+        # 4. Overwrite dell'ultima giornata e append delle nuove
+        self._write_prices(ticker, df_new, replace_from=last_dt)
+        print(f"Aggiornato {ticker} ({freq}): da {start_date} a {end_date} in '{self._ticker_dir(ticker)}'")
    
     def build(self, ticker, start_date, end_date, intraday: bool = True):
         """ 
@@ -215,6 +329,35 @@ class MarketDataHandler:
         self.update_series(ticker, '1d')
         if intraday:
             self.update_series(ticker, '1m') 
+
+    def build_universe(self, universe, start_date, end_date, intraday: bool = True):
+        """
+        Come build ma per tutto l'universo, fino a oggi: le richieste daily sono raggruppate
+        in batch di ticker con la stessa data di partenza (start_date per i ticker nuovi,
+        ultima data salvata per gli altri) e le intraday sono eseguite in parallelo per giorno.
+        """
+        today = datetime.now().date().isoformat()
+        timeframes = ['1d', '1m'] if intraday else ['1d']
+        for freq in timeframes:
+            starts = {}
+            for tk in universe:
+                starts.setdefault(self._last_saved_date(tk, freq), []).append(tk)
+            for last_dt, tickers in starts.items():
+                first = start_date if freq == '1d' else INTRADAY_START
+                sd = last_dt.isoformat() if last_dt is not None else first
+                if freq == '1d':
+                    frames = self.fetcher.daily(tickers, sd, today, **DAILY_REQUEST)
+                    frames = {tk: df.rename(columns={'px_last': 'close'}).dropna() for tk, df in frames.items()}
+                else:
+                    frames = {tk: self._bbg_intraday_dump(tk, sd, today) for tk in tickers}
+                for tk, df in frames.items():
+                    if df.empty:
+                        print(f"Nessun dato scaricato da {sd} a {today} per {tk} ({freq})")
+                        continue
+                    df = self.create_table(df, tk)
+                    df['type'] = PRICE_TYPES[freq]
+                    self._write_prices(tk, df, replace_from=last_dt)
+                    print(f"Aggiornato {tk} ({freq}): da {sd} a {today} in '{self._ticker_dir(tk)}'")
      
     def _prepare_df(self, ticker: str, start_date: str, end_date: str, freq: str) -> pd.DataFrame:
         """Carica, indicizza e filtra il DataFrame."""
@@ -375,83 +518,213 @@ class MarketDataHandler:
         else:
             raise ValueError("kind deve essere 'line', 'ohlc' o 'vol'")
         
-    def load_universe(self, universe, start_date, end_date, frequency, rebuild):
-        df_all = {}
-
-        for ticker in universe:
-            if rebuild:
-                self.build(ticker, start_date, end_date)
-            
-            df_all[ticker] = self.load_price(ticker, frequency)
-        return df_all
+    def load_universe(self, universe, start_date, end_date, frequency, rebuild, workers=None):
+        """
+        Carica i prezzi di tutti i ticker; la lettura dei file avviene in parallelo
+        su un pool di thread (workers=None: un thread per core, workers=1: sequenziale).
+        """
+        if rebuild:
+            self.build_universe(universe, start_date, end_date)
+
+        def load(ticker):
+            return self.load_price(ticker, frequency, start_date, end_date)
+
+        with ThreadPoolExecutor(self._workers(workers)) as pool:
+            return dict(zip(universe, pool.map(load, universe)))
+
+    @staticmethod
+    def _workers(workers=None) -> int:
+        return max(1, workers or os.cpu_count() or 1)
     
-    def _fill_prices(self, universe, start_date, end_date, frequency, rebuild):
+    def _price_file(self, ticker: str, freq: str) -> str:
+        if freq == '1m':
+            file_path = os.path.join(self.prices_path, f"{ticker}.csv")
+        elif freq == '1d':
+            file_path = os.path.join(self.data_path, "daily", f"{ticker}.csv")
+        else:
+            raise ValueError("freq deve essere '1m' o '1d'")
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Il file '{file_path}' non esiste. "
+                                    "Esegui prima download_history o update_series.")
+        return file_path
+
+    @staticmethod
+    def _to_bars(df: pd.DataFrame, freq: str):
+        """
+        Converte in blocco un DataFrame di prezzi (date/time come stringhe ISO)
+        in (keys datetime64, values float n x len(FIELDS)), senza loop per riga.
+        """
+        if freq == '1m':
+            ts = df['date'].astype(str) + 'T' + df['time'].astype(str)
+            keys = pd.to_datetime(ts, format='%Y-%m-%dT%H:%M:%S').to_numpy().astype('datetime64[s]')
+        else:
+            keys = pd.to_datetime(df['date'].astype(str), format='%Y-%m-%d').to_numpy().astype('datetime64[D]')
+        values = df[list(FIELDS)].to_numpy(dtype=float)
+        return keys, values
+
+    def _read_bars(self, ticker: str, freq: str, start_date=None, end_date=None):
+        """Legge i prezzi senza converters per cella e li converte in array (keys, values)."""
+        if os.path.isdir(self._ticker_dir(ticker)):
+            columns = ['date', 'time', *FIELDS] if freq == '1m' else ['date', *FIELDS]
+            table = self._read_partitions(ticker, freq, start_date, end_date, columns)
+            keys = table['date'].to_numpy().astype('datetime64[D]')
+            if freq == '1m':
+                micros = table['time'].cast(pa.int64()).to_numpy()
+                keys = keys.astype('datetime64[s]') + (micros // 1_000_000).astype('timedelta64[s]')
+            values = np.column_stack([table[f].to_numpy().astype(float) for f in FIELDS])
+            return keys, values
+
+        return _read_csv_bars(self._price_file(ticker, freq), freq)
+
+    def _load_bars(self, universe, freqs, workers=None) -> dict:
+        """
+        Legge le barre {(ticker, freq): (keys, values)} di tutto l'universo.
+        I Parquet sono letti su un pool di thread (I/O e decodifica pyarrow rilasciano il GIL),
+        i CSV sono letti e convertiti su un pool di processi.
+        """
+        workers = self._workers(workers)
+        tasks = [(tk, freq) for tk in universe for freq in freqs]
+        if workers == 1:
+            return {task: self._read_bars(*task) for task in tasks}
+
+        parquet_tasks = [task for task in tasks if os.path.isdir(self._ticker_dir(task[0]))]
+        csv_tasks = [task for task in tasks if task not in parquet_tasks]
+        bars = {}
+        with ThreadPoolExecutor(workers) as pool:
+            bars.update(zip(parquet_tasks, pool.map(lambda task: self._read_bars(*task), parquet_tasks)))
+        if csv_tasks:
+            paths = [self._price_file(*task) for task in csv_tasks]
+            freqs = [freq for _, freq in csv_tasks]
+            with ProcessPoolExecutor(min(workers, len(csv_tasks))) as pool:
+                bars.update(zip(csv_tasks, pool.map(_read_csv_bars, paths, freqs)))
+        return bars
+
+    def _fill_prices(self, universe, start_date, end_date, frequency, rebuild, workers=None):
+        if rebuild:
+            self.build_universe(universe, start_date, end_date)
+
+        # se specificato intraday carica anche le barre a 1 minuto
+        freqs = ['1d', '1m'] if frequency == '1m' else ['1d']
+        bars = self._load_bars(universe, freqs, workers)
+
+        # unione nell'ordine dell'universo: il risultato non dipende dall'ordine di completamento
+        eod = MarketStoreBuilder('D')
+        intraday = MarketStoreBuilder('s')
         for tk in universe:
-            if rebuild:
-                self.build(tk, start_date, end_date)
-
-            # prima loop sul giornaliero
-            df_prices_daily = self.load_price(tk, '1d')
-            for ix, row in df_prices_daily.iterrows():
-                current_date = row['date'].isoformat()
-
-                if current_date not in self.market_data:
-                    self.market_data[current_date] = {"ref_date": current_date,
-                                                        "EOD": {
-                                                                "ref_date": current_date,
-                                                                "equity": {},
-                                                                "rate": {},  
-                                                                "volatility": {}
-                                                            }}
-                self.market_data[current_date]['EOD']["equity"][tk] = {
-                                                                        "open": float(row["open"]),
-                                                                        "high": float(row["high"]),
-                                                                        "low": float(row["low"]),
-                                                                        "close": float(row["close"]),
-                                                                        "volume": float(row["volume"]),
-                                                                        "is_valid": True
-                                                                    }
-            # se specificato intraday allora lo crea
+            eod.add_frame(tk, *bars.pop((tk, '1d')))
             if frequency == '1m':
-                df_prices = self.load_price(tk, '1m')
-                for ix, row in df_prices.iterrows():
-                    current_date = row['date'].isoformat()
-                    time = row['time'].isoformat()
-                    if time not in self.market_data[current_date]:
-                        self.market_data[current_date][time] = {
-                                                                    "ref_date": current_date,
-                                                                    "equity": {},
-                                                                    "rate": {},  
-                                                                    "volatility": {}
-                                                                }
-                    self.market_data[current_date][time]["equity"][tk] = {
-                                                                            "open": float(row["open"]),
-                                                                            "high": float(row["high"]),
-                                                                            "low": float(row["low"]),
-                                                                            "close": float(row["close"]),
-                                                                            "volume": float(row["volume"]),
-                                                                            "is_valid": True
-                                                                        }
-                    
-    def _build_market(self, universe, start_date, end_date, frequency, rebuild):
-        self._fill_prices(universe, start_date, end_date, frequency, rebuild)
-
-        with open(f"{self.data_path}MarketData.json", "w") as json_file:
-            json.dump(self.market_data, json_file, indent=4)
+                intraday.add_frame(tk, *bars.pop((tk, '1m')))
 
-    def load_market(self, universe, start_date, end_date, frequency='1d', rebuild=False):
+        self.eod_store = eod.build()
+        intraday_store = intraday.build()
+        self.intraday_store = intraday_store if len(intraday_store) else None
+        self.market_data = MarketDataView(self.eod_store, self.intraday_store)
+                    
+    def _cache_path(self, store: str) -> str:
+        return os.path.join(self.data_path, "cache", store)
+
+    def _build_market(self, universe, start_date, end_date, frequency, rebuild, workers=None):
+        self._fill_prices(universe, start_date, end_date, frequency, rebuild, workers)
+
+        self.eod_store.save(self._cache_path("EOD"), workers)
+        if self.intraday_store is not None:
+            self.intraday_store.save(self._cache_path("1m"), workers)
+        elif os.path.exists(self._cache_path("1m")):
+            # la cache intraday precedente non è più allineata al nuovo EOD
+            shutil.rmtree(self._cache_path("1m"))
+
+    def _migrate_json_cache(self):
+        """Converte una vecchia cache MarketData.json nel formato binario."""
+        with open(f"{self.data_path}MarketData.json", "r", encoding="utf-8") as file:
+            market_data = MarketDataView.from_dict(json.load(file))
+        market_data.eod.save(self._cache_path("EOD"))
+        if market_data.intraday is not None:
+            market_data.intraday.save(self._cache_path("1m"))
+
+    def load_market(self, universe, start_date, end_date, frequency='1d', rebuild=False, lookback=0, workers=None):
+        """
+        Carica il mercato dalla cache binaria limitandosi ai ticker di universe
+        e alle date tra start_date ed end_date (più lookback giorni di warm-up).
+        universe, start_date o end_date a None non pongono limiti,
+        lookback=None carica tutta la storia precedente a start_date.
+        workers: numero di worker usati per il rebuild (None: uno per core).
+        """
+        key = None
         if rebuild:
             print("*****")
             print("Building MarketData...")
-            self._build_market(universe, start_date, end_date, frequency, rebuild)
+            self._build_market(universe, start_date, end_date, frequency, rebuild, workers)
             print("Done!")
             print("*****")
-        
+            _LOADED.clear()
+            eod_store, intraday_store = self.eod_store, self.intraday_store
         else:
-            with open(f"{self.data_path}MarketData.json", "r", encoding="utf-8") as file:
-                self.market_data = json.load(file)
+            eod_path = self._cache_path("EOD")
+            if not os.path.exists(eod_path) and os.path.exists(f"{self.data_path}MarketData.json"):
+                self._migrate_json_cache()
+            key = self._loaded_key(universe, start_date, end_date, lookback)
+            if key in _LOADED:
+                # stessi store (sola lettura) delle istanze precedenti: nessuna rilettura né copia
+                _LOADED.move_to_end(key)
+                self.eod_store, self.intraday_store = _LOADED[key]
+                self.market_data = MarketDataView(self.eod_store, self.intraday_store)
+                return
+            eod_store = MarketStore.load(eod_path)
+            intraday_path = self._cache_path("1m")
+            intraday_store = MarketStore.load(intraday_path) if os.path.exists(intraday_path) else None
+
+        self.eod_store = eod_store.subset(universe, start_date, end_date, lookback)
+        if intraday_store is not None:
+            # la finestra intraday parte dal primo giorno EOD caricato (warm-up incluso)
+            intraday_start = self.eod_store.index[0] if len(self.eod_store) else start_date
+            intraday_store = intraday_store.subset(universe, intraday_start, end_date)
+        self.intraday_store = intraday_store
+        self.market_data = MarketDataView(self.eod_store, self.intraday_store)
+        if key is not None:
+            _LOADED[key] = (self.eod_store, self.intraday_store)
+            while len(_LOADED) > LOADED_SIZE:
+                _LOADED.popitem(last=False)
+
+    def _loaded_key(self, universe, start_date, end_date, lookback):
+        """Chiave di _LOADED, None se la cache EOD non esiste; l'mtime invalida gli store di una cache riscritta."""
+        meta = os.path.join(self._cache_path("EOD"), "meta.json")
+        if not os.path.exists(meta):
+            return None
+        universe = tuple(universe) if universe is not None else None
+        return (os.path.abspath(meta), os.path.getmtime(meta), universe, start_date, end_date, lookback)
+
+    @staticmethod
+    def clear_loaded():
+        """Dimentica gli store tenuti in memoria da load_market in questo processo."""
+        _LOADED.clear()
 
-        # Convertire 'ref_date' in datetime.date
-        for date_key, data in self.market_data.items():
-            if "ref_date" in data:
-                data["ref_date"] = datetime.strptime(data["ref_date"], "%Y-%m-%d").date()
\ No newline at end of file
+    def save_loaded(self, path: str, universe, start_date, end_date, lookback=0):
+        """
+        Salva in path (EOD e 1m) gli store caricati da load_market(universe, start_date, end_date, lookback=lookback)
+        e ritorna la chiave di _LOADED con cui quella chiamata li ritrova: vedi open_loaded.
+        """
+        self.eod_store.save(os.path.join(path, "EOD"))
+        if self.intraday_store is not None:
+            self.intraday_store.save(os.path.join(path, "1m"))
+        return self._loaded_key(universe, start_date, end_date, lookback)
+
+    @staticmethod
+    def open_loaded(key, path: str):
+        """
+        Registra in _LOADED sotto key gli store salvati da save_loaded, aperti in memory-map in sola lettura:
+        i processi che li aprono condividono le pagine del file invece di tenerne ognuno una copia.
+        """
+        if key is None:
+            return
+        intraday_path = os.path.join(path, "1m")
+        intraday_store = MarketStore.load(intraday_path) if os.path.exists(intraday_path) else None
+        _LOADED[key] = (MarketStore.load(os.path.join(path, "EOD")), intraday_store)
+        while len(_LOADED) > LOADED_SIZE:
+            _LOADED.popitem(last=False)
+
+
+def _read_csv_bars(file_path: str, freq: str):
+    """Legge un CSV prezzi e lo converte in (keys, values); funzione di modulo per il pool di processi."""
+    usecols = ['date', 'time', *FIELDS] if freq == '1m' else ['date', *FIELDS]
+    df = pd.read_csv(file_path, usecols=usecols, dtype={'date': str, 'time': str})
+    return MarketDataHandler._to_bars(df, freq)
\ No newline at end of file
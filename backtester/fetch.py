@@ -0,0 +1,163 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import QuantLib as ql
+
+from .trading_calendar import trading_days
+
+__all__ = ['FetchScheduler', 'RecordingBlp', 'ReplayBlp']
+
+
+class FetchScheduler:
+    """
+    Schedula le richieste verso Bloomberg (o un oggetto con la stessa interfaccia di xbbg.blp):
+    salta i giorni non di trading, raggruppa i ticker delle richieste daily in batch,
+    esegue le richieste in parallelo su un pool limitato e ritenta con backoff esponenziale.
+    """
+
+    def __init__(self, source, max_workers: int = 4, retries: int = 3, backoff: float = 1.0,
+                 calendar=None, batch_size: int = 50):
+        self.source = source
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        # di default salta solo i weekend: i festivi dipendono dalla borsa del ticker
+        self.calendar = calendar if calendar is not None else ql.WeekendsOnly()
+        self.batch_size = batch_size
+
+    def _call(self, method: str, *args, **kwargs):
+        """Chiama source.method ritentando fino a retries volte (attese backoff, 2*backoff, ...)."""
+        if self.source is None:
+            raise RuntimeError("xbbg non disponibile: passare una source (es. ReplayBlp) a MarketDataHandler.")
+        for attempt in range(self.retries + 1):
+            try:
+                return getattr(self.source, method)(*args, **kwargs)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def intraday(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Scarica i dati intraday bdib giorno per giorno, solo per i giorni di trading,
+        con al più max_workers richieste contemporanee. I giorni in errore vengono saltati.
+        """
+        days = [pd.Timestamp(d) for d in trading_days(start_date, end_date, self.calendar)]
+
+        def fetch_day(dt):
+            try:
+                return self._call('bdib', ticker=ticker, dt=dt, ref='EquityAllDay', session='allday')
+            except Exception as e:
+                print(f"Errore per {dt.date()}: {e}")
+                return None
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            df_list = [df for df in pool.map(fetch_day, days) if df is not None and not df.empty]
+
+        df_all = pd.concat(df_list) if df_list else pd.DataFrame()
+        return df_all.get(ticker, df_all)
+
+    def daily(self, tickers: list, start_date: str, end_date: str, **kwargs) -> dict:
+        """
+        Scarica i dati daily bdh per più ticker, batch_size ticker per richiesta
+        e batch in parallelo. Ritorna {ticker: DataFrame}.
+        """
+        batches = [list(tickers[i:i + self.batch_size]) for i in range(0, len(tickers), self.batch_size)]
+
+        def fetch_batch(batch):
+            return self._call('bdh', batch, start_date=start_date, end_date=end_date, **kwargs)
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = list(pool.map(fetch_batch, batches))
+
+        out = {}
+        for batch, df_all in zip(batches, results):
+            out.update(self._split_batch(batch, df_all))
+        return out
+
+    @staticmethod
+    def _split_batch(batch: list, df_all: pd.DataFrame) -> dict:
+        """
+        {ticker: DataFrame} dalla risposta bdh di un batch: colonne MultiIndex (ticker, campo),
+        oppure colonne piatte con una colonna 'ticker'. Colonne piatte senza 'ticker' sono accettate
+        solo per un batch di un ticker: con più ticker non si saprebbe a chi attribuire le righe.
+        """
+        if isinstance(df_all.columns, pd.MultiIndex):
+            tickers = df_all.columns.get_level_values(0)
+            return {ticker: df_all[ticker] if ticker in tickers else pd.DataFrame() for ticker in batch}
+        if df_all.empty:
+            return {ticker: pd.DataFrame() for ticker in batch}
+        if 'ticker' in df_all.columns:
+            return {ticker: df_all[df_all['ticker'] == ticker].drop(columns='ticker') for ticker in batch}
+        if len(batch) == 1:
+            return {batch[0]: df_all}
+        raise ValueError(f"Risposta bdh senza ticker nelle colonne per un batch di {len(batch)} ticker: {batch}")
+
+
+def _call_key(method: str, args: tuple, kwargs: dict) -> str:
+    """Chiave stabile di una chiamata (metodo + argomenti) usata come nome file."""
+    normalized = []
+    for value in list(args) + sorted(kwargs.items()):
+        normalized.append(repr(value.isoformat() if hasattr(value, 'isoformat') else value))
+    digest = hashlib.md5("|".join(normalized).encode()).hexdigest()
+    return f"{method}-{digest}"
+
+
+class RecordingBlp:
+    """
+    Avvolge xbbg.blp e salva ogni risposta di bdh/bdib in path,
+    per poterla poi riprodurre offline con ReplayBlp.
+    """
+
+    def __init__(self, source, path: str):
+        self.source = source
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _record(self, method, args, kwargs):
+        response = getattr(self.source, method)(*args, **kwargs)
+        with open(os.path.join(self.path, _call_key(method, args, kwargs) + ".pkl"), "wb") as file:
+            pickle.dump(response, file)
+        return response
+
+    def bdh(self, *args, **kwargs):
+        return self._record('bdh', args, kwargs)
+
+    def bdib(self, *args, **kwargs):
+        return self._record('bdib', args, kwargs)
+
+
+class ReplayBlp:
+    """
+    Sostituto offline di xbbg.blp: riproduce le risposte registrate da RecordingBlp.
+    latency simula il tempo di risposta del terminale (secondi per richiesta),
+    le chiamate non registrate ritornano un DataFrame vuoto come farebbe Bloomberg.
+    """
+
+    def __init__(self, path: str, latency: float = 0.0):
+        self.path = path
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _replay(self, method, args, kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        file_path = os.path.join(self.path, _call_key(method, args, kwargs) + ".pkl")
+        if not os.path.exists(file_path):
+            return pd.DataFrame()
+        with open(file_path, "rb") as file:
+            return pickle.load(file)
+
+    def bdh(self, *args, **kwargs):
+        return self._replay('bdh', args, kwargs)
+
+    def bdib(self, *args, **kwargs):
+        return self._replay('bdib', args, kwargs)
@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Mapping
+from datetime import date
+
+__all__ = [
+    'FIELDS', 'MarketStore', 'MarketStoreBuilder', 'BarView', 'EquityView', 'SnapshotView',
+    'DayView', 'MarketDataView'
+]
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class MarketStore:
+    """
+    Store colonnare dei prezzi: per ogni campo un array float64 (n_index x n_tickers).
+    L'asse temporale è un array datetime64 ordinato (giorni per l'EOD, secondi per l'intraday),
+    le barre mancanti sono NaN.
+    """
+
+    def __init__(self, index, tickers, data: dict, fields=FIELDS):
+        self.index = np.asarray(index)
+        self.tickers = list(tickers)
+        self.ticker_index = {tk: i for i, tk in enumerate(self.tickers)}
+        self.fields = tuple(fields)
+        self.data = data
+
+    @classmethod
+    def empty(cls, unit: str = 'D', fields=FIELDS):
+        index = np.array([], dtype=f'datetime64[{unit}]')
+        return cls(index, [], {f: np.empty((0, 0)) for f in fields}, fields)
+
+    def save(self, path: str, workers=None):
+        """
+        Salva lo store in formato binario: index.npy, un {campo}.npy per campo
+        e meta.json con ticker e campi. I campi sono scritti in parallelo su workers thread.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "index.npy"), self.index)
+
+        def save_field(f):
+            np.save(os.path.join(path, f"{f}.npy"), np.ascontiguousarray(self.data[f]))
+
+        with ThreadPoolExecutor(workers or len(self.fields)) as pool:
+            list(pool.map(save_field, self.fields))
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump({"tickers": self.tickers, "fields": list(self.fields)}, file)
+
+    @classmethod
+    def load(cls, path: str, tickers=None, start=None, end=None, lookback: int = 0, mmap_mode: str = 'r'):
+        """
+        Apre uno store salvato con save(). Con mmap_mode i campi sono memory-mapped:
+        vengono letti da disco solo le pagine effettivamente usate.
+        Se sono indicati tickers/start/end viene letta solo quella porzione (vedi subset).
+        """
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            raise FileNotFoundError(f"Nessuna cache di mercato in '{path}'.")
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            meta = json.load(file)
+        index = np.load(os.path.join(path, "index.npy"), mmap_mode=mmap_mode)
+        data = {f: np.load(os.path.join(path, f"{f}.npy"), mmap_mode=mmap_mode) for f in meta["fields"]}
+        store = cls(index, meta["tickers"], data, meta["fields"])
+        return store.subset(tickers, start, end, lookback)
+
+    def rows_between(self, start=None, end=None, lookback: int = 0):
+        """
+        Intervallo di righe [r0, r1) che copre le date da start a end (incluse),
+        esteso all'indietro di lookback righe (lookback=None: tutta la storia precedente).
+        """
+        r0, r1 = 0, len(self.index)
+        if start is not None and lookback is not None:
+            key = np.datetime64(pd.Timestamp(start).date()).astype(self.index.dtype)
+            r0 = max(int(np.searchsorted(self.index, key, 'left')) - lookback, 0)
+        if end is not None:
+            key = (np.datetime64(pd.Timestamp(end).date()) + 1).astype(self.index.dtype)
+            r1 = int(np.searchsorted(self.index, key, 'left'))
+        return r0, max(r0, r1)
+
+    def subset(self, tickers=None, start=None, end=None, lookback: int = 0):
+        """
+        Store ristretto ai tickers (nell'ordine dato, quelli assenti sono ignorati)
+        e alle date tra start ed end più lookback righe di warm-up
+        (lookback=None: tutta la storia precedente a start).
+        Legge dal disco solo la finestra richiesta. Se i tickers sono colonne contigue dello store
+        (nello stesso ordine) i campi sono viste senza copie, su un memory-map restano pagine del file;
+        altrimenti sono copiati in memoria.
+        """
+        r0, r1 = self.rows_between(start, end, lookback)
+        if tickers is None:
+            names = self.tickers
+        else:
+            names = [tk for tk in dict.fromkeys(tickers) if tk in self.ticker_index]
+        if (r0, r1) == (0, len(self.index)) and names == self.tickers:
+            return self
+        cols = [self.ticker_index[tk] for tk in names]
+        if cols and cols == list(range(cols[0], cols[0] + len(cols))):
+            cols = slice(cols[0], cols[0] + len(cols))
+        data = {f: np.asarray(self.data[f][r0:r1, cols]) for f in self.fields}
+        return MarketStore(np.array(self.index[r0:r1]), names, data, self.fields)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def shape(self):
+        return (len(self.index), len(self.tickers))
+
+    def field(self, name: str) -> np.ndarray:
+        """Array (n_index x n_tickers) del campo, senza copie."""
+        return self.data[name]
+
+    def row(self, key) -> int:
+        """Posizione di key sull'asse temporale, KeyError se non presente."""
+        key = np.datetime64(key).astype(self.index.dtype)
+        i = int(np.searchsorted(self.index, key))
+        if i == len(self.index) or self.index[i] != key:
+            raise KeyError(key)
+        return i
+
+    def col(self, ticker: str) -> int:
+        return self.ticker_index[ticker]
+
+    def has_bar(self, row: int, col: int) -> bool:
+        return not np.isnan(self.data['close'][row, col])
+
+    def value(self, field: str, row: int, col: int) -> float:
+        return float(self.data[field][row, col])
+
+
+class MarketStoreBuilder:
+    """
+    Accumula le barre per ticker e costruisce un MarketStore allineato
+    sull'unione degli indici temporali.
+    """
+
+    def __init__(self, unit: str = 'D', fields=FIELDS):
+        self.unit = unit
+        self.fields = tuple(fields)
+        self._chunks = {}
+        self._keys = {}
+        self._values = {}
+
+    def add_bar(self, ticker: str, key, bar: dict):
+        """Aggiunge una singola barra (percorso lento, per piccoli volumi)."""
+        self._chunks.setdefault(ticker, [])
+        self._keys.setdefault(ticker, []).append(key)
+        self._values.setdefault(ticker, []).append([bar[f] for f in self.fields])
+
+    def add_frame(self, ticker: str, keys: np.ndarray, values: np.ndarray):
+        """
+        Aggiunge in blocco le barre di un ticker.
+        keys: array datetime64 (n,), values: array float (n x len(fields)).
+        """
+        keys = np.asarray(keys).astype(f'datetime64[{self.unit}]')
+        values = np.asarray(values, dtype=float).reshape(len(keys), len(self.fields))
+        self._chunks.setdefault(ticker, []).append((keys, values))
+
+    def _flush(self, ticker: str):
+        if self._keys.get(ticker):
+            keys = np.array(self._keys.pop(ticker), dtype=f'datetime64[{self.unit}]')
+            values = np.asarray(self._values.pop(ticker), dtype=float)
+            self._chunks[ticker].append((keys, values))
+        chunks = self._chunks[ticker]
+        if len(chunks) == 1:
+            return chunks[0]
+        return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
+    def build(self) -> MarketStore:
+        tickers = list(self._chunks)
+        if not tickers:
+            return MarketStore.empty(self.unit, self.fields)
+
+        series = [self._flush(tk) for tk in tickers]
+        index = np.unique(np.concatenate([keys for keys, _ in series]))
+        data = {f: np.full((len(index), len(tickers)), np.nan) for f in self.fields}
+        for j, (keys, values) in enumerate(series):
+            pos = np.searchsorted(index, keys)
+            for k, f in enumerate(self.fields):
+                data[f][pos, j] = values[:, k]
+        return MarketStore(index, tickers, data, self.fields)
+
+
+class BarView(Mapping):
+    """Vista di una singola barra {'open', 'high', ..., 'is_valid'}."""
+    __slots__ = ('_store', '_row', '_col')
+
+    def __init__(self, store: MarketStore, row: int, col: int):
+        self._store = store
+        self._row = row
+        self._col = col
+
+    def __getitem__(self, field):
+        if field == 'is_valid':
+            return True
+        if field not in self._store.data:
+            raise KeyError(field)
+        return self._store.value(field, self._row, self._col)
+
+    def __iter__(self):
+        yield from self._store.fields
+        yield 'is_valid'
+
+    def __len__(self):
+        return len(self._store.fields) + 1
+
+
+class EquityView(Mapping):
+    """Vista {ticker: barra} su una riga dello store; i ticker senza dati non compaiono."""
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: MarketStore, row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, ticker):
+        col = self._store.ticker_index[ticker]
+        if not self._store.has_bar(self._row, col):
+            raise KeyError(ticker)
+        return BarView(self._store, self._row, col)
+
+    def _available(self):
+        return np.flatnonzero(~np.isnan(self._store.data['close'][self._row]))
+
+    def __iter__(self):
+        return (self._store.tickers[i] for i in self._available())
+
+    def __len__(self):
+        return len(self._available())
+
+
+class SnapshotView(Mapping):
+    """
+    Vista compatibile con il vecchio dizionario
+    {'ref_date', 'equity', 'rate', 'volatility'} per un istante di mercato.
+    """
+    __slots__ = ('store', 'row', '_ref_date', '_extra')
+    _KEYS = ('ref_date', 'equity', 'rate', 'volatility')
+
+    def __init__(self, store: MarketStore, row: int, ref_date: str, extra: dict):
+        self.store = store
+        self.row = row
+        self._ref_date = ref_date
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if key == 'ref_date':
+            return self._ref_date
+        if key == 'equity':
+            return EquityView(self.store, self.row)
+        if key in ('rate', 'volatility'):
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+
+class DayView(Mapping):
+    """Vista di una giornata: {'ref_date', 'EOD', 'HH:MM:SS', ...}."""
+    __slots__ = ('_market', '_day', '_iso', '_eod_row')
+
+    def __init__(self, market, day: np.datetime64, eod_row: int):
+        self._market = market
+        self._day = day
+        self._iso = str(day)
+        self._eod_row = eod_row
+
+    def _intraday_rows(self):
+        intraday = self._market.intraday
+        if intraday is None or len(intraday) == 0:
+            return 0, 0
+        start = self._day.astype(intraday.index.dtype)
+        end = (self._day + 1).astype(intraday.index.dtype)
+        return np.searchsorted(intraday.index, start), np.searchsorted(intraday.index, end)
+
+    def __getitem__(self, key):
+        if key == 'ref_date':
+            return self._day.astype(date)
+        extra = self._market.extra(self._iso)
+        if key == 'EOD':
+            return SnapshotView(self._market.eod, self._eod_row, self._iso, extra)
+        intraday = self._market.intraday
+        if intraday is None:
+            raise KeyError(key)
+        try:
+            row = intraday.row(f"{self._iso}T{key}")
+        except ValueError:
+            raise KeyError(key)
+        return SnapshotView(intraday, row, self._iso, extra)
+
+    def __iter__(self):
+        yield 'ref_date'
+        yield 'EOD'
+        start, end = self._intraday_rows()
+        if end > start:
+            times = np.datetime_as_string(self._market.intraday.index[start:end], unit='s')
+            for t in times:
+                yield t[11:]
+
+    def __len__(self):
+        start, end = self._intraday_rows()
+        return 2 + (end - start)
+
+
+class MarketDataView(Mapping):
+    """
+    Vista {data_iso: giornata} sopra gli store EOD e intraday.
+    Espone le stesse chiavi del vecchio dizionario annidato market_data.
+    """
+
+    def __init__(self, eod: MarketStore, intraday: MarketStore = None):
+        self.eod = eod
+        self.intraday = intraday
+        self._extra = {}
+
+    def extra(self, date_iso: str) -> dict:
+        """Dati non di prezzo ('rate', 'volatility') associati alla data."""
+        if date_iso not in self._extra:
+            self._extra[date_iso] = {"rate": {}, "volatility": {}}
+        return self._extra[date_iso]
+
+    def __getitem__(self, date_iso):
+        try:
+            row = self.eod.row(date_iso)
+        except ValueError:
+            raise KeyError(date_iso)
+        return DayView(self, self.eod.index[row].astype('datetime64[D]'), row)
+
+    def __iter__(self):
+        return iter(np.datetime_as_string(self.eod.index, unit='D').tolist())
+
+    def __len__(self):
+        return len(self.eod)
+
+    def to_dict(self) -> dict:
+        """Converte la vista nel vecchio formato annidato (serializzabile in JSON)."""
+        return _to_builtin(self)
+
+    @classmethod
+    def from_dict(cls, market_data: dict):
+        """Costruisce gli store a partire dal vecchio formato annidato."""
+        eod = MarketStoreBuilder('D')
+        intraday = MarketStoreBuilder('s')
+        for date_iso, day in market_data.items():
+            for key, snapshot in day.items():
+                if key == 'ref_date':
+                    continue
+                builder, ts = (eod, date_iso) if key == 'EOD' else (intraday, f"{date_iso}T{key}")
+                for tk, bar in snapshot.get('equity', {}).items():
+                    builder.add_bar(tk, ts, bar)
+        intraday_store = intraday.build()
+        return cls(eod.build(), intraday_store if len(intraday_store) else None)
+
+
+def _to_builtin(obj):
+    if isinstance(obj, Mapping):
+        return {k: _to_builtin(v) for k, v in obj.items()}
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return obj
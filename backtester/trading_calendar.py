@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import QuantLib as ql
+
+__all__ = ['trading_days', 'is_trading_day']
+
+# festività per (nome calendario, anno), calcolate una sola volta per processo
+_HOLIDAY_CACHE = {}
+
+
+def _to_day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def holidays(start, end, calendar=None) -> np.ndarray:
+    """
+    Festività infrasettimanali del calendario QuantLib (default TARGET) tra start ed end,
+    come array datetime64[D]. Le liste sono in cache per anno.
+    """
+    calendar = calendar if calendar is not None else ql.TARGET()
+    start, end = _to_day(start), _to_day(end)
+    first, last = start.astype(object).year, end.astype(object).year
+    years = []
+    for year in range(first, last + 1):
+        key = (calendar.name(), year)
+        if key not in _HOLIDAY_CACHE:
+            days = calendar.holidayList(ql.Date(1, 1, year), ql.Date(31, 12, year), False)
+            _HOLIDAY_CACHE[key] = np.array([d.to_date() for d in days], dtype='datetime64[D]')
+        years.append(_HOLIDAY_CACHE[key])
+    all_days = np.concatenate(years) if years else np.array([], dtype='datetime64[D]')
+    return all_days[(all_days >= start) & (all_days <= end)]
+
+
+def is_trading_day(days, calendar=None) -> np.ndarray:
+    """Maschera vettoriale: True per i giorni lavorativi (lun-ven non festivi)."""
+    days = np.asarray(days, dtype='datetime64[D]')
+    if len(days) == 0:
+        return np.zeros(0, dtype=bool)
+    return np.is_busday(days, holidays=holidays(days.min(), days.max(), calendar))
+
+
+def trading_days(start, end, calendar=None) -> np.ndarray:
+    """Giorni di trading tra start ed end (inclusi) come array datetime64[D]."""
+    days = np.arange(_to_day(start), _to_day(end) + 1)
+    return days[is_trading_day(days, calendar)]
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import os
+from collections.abc import Mapping
+
+__all__ = ['VolSurfaceStore', 'VolSurface', 'VolatilityView']
+
+_ARRAYS = ('dates', 'moneyness', 'tenor', 'vols')
+
+
+class VolSurfaceStore:
+    """
+    Superfici di volatilità implicita come array densi per sottostante:
+    date (datetime64[D]), assi moneyness e tenor (giorni) condivisi da tutte le date
+    e volatilità (n_date x n_moneyness x n_tenor), NaN dove il punto manca.
+    Su disco ogni sottostante ha la sua cartella {path}/{symbol}/ con un .npy per array,
+    letta (memory-mapped) solo alla prima richiesta del sottostante.
+    Con precompute=True calcola per ogni cella i coefficienti dell'interpolazione bilineare.
+    """
+
+    def __init__(self, path: str = None, precompute: bool = False):
+        self.path = path
+        self.precompute = precompute
+        self._surfaces = {}
+        self._coefficients = {}
+
+    @property
+    def symbols(self) -> list:
+        on_disk = []
+        if self.path is not None and os.path.isdir(self.path):
+            on_disk = [s for s in sorted(os.listdir(self.path)) if os.path.isdir(os.path.join(self.path, s))]
+        return list(dict.fromkeys([*self._surfaces, *on_disk]))
+
+    def add(self, symbol: str, dates, moneyness, tenor, vols):
+        """Aggiunge (o sostituisce) le superfici di un sottostante; dates ordinate e senza duplicati."""
+        surface = {
+            'dates': np.asarray(dates, dtype='datetime64[D]'),
+            'moneyness': np.asarray(moneyness, dtype=np.float64),
+            'tenor': np.asarray(tenor, dtype=np.float64),
+            'vols': np.asarray(vols, dtype=np.float64),
+        }
+        expected = (len(surface['dates']), len(surface['moneyness']), len(surface['tenor']))
+        if surface['vols'].shape != expected:
+            raise ValueError(f"Superfici di '{symbol}' con forma {surface['vols'].shape}, attesa {expected}.")
+        self._surfaces[symbol] = surface
+        self._coefficients.pop(symbol, None)
+
+    def add_frame(self, symbol: str, df: pd.DataFrame):
+        """
+        Aggiunge le superfici dal formato lungo dei file di volatilità:
+        indice = data, colonne 'moneyness', 'tenor' (giorni) e 'implied_vol'.
+        Il pivot è fatto una volta sola per tutte le date.
+        """
+        dates = pd.to_datetime(pd.Index(df.index)).values.astype('datetime64[D]')
+        day_axis, day_pos = np.unique(dates, return_inverse=True)
+        moneyness, m_pos = np.unique(df['moneyness'].to_numpy(dtype=np.float64), return_inverse=True)
+        tenor, t_pos = np.unique(df['tenor'].to_numpy(dtype=np.float64), return_inverse=True)
+        vols = np.full((len(day_axis), len(moneyness), len(tenor)), np.nan)
+        vols[day_pos, m_pos, t_pos] = df['implied_vol'].to_numpy(dtype=np.float64)
+        self.add(symbol, day_axis, moneyness, tenor, vols)
+
+    def save(self, path: str = None):
+        path = path or self.path
+        for symbol in list(self._surfaces):
+            folder = os.path.join(path, symbol)
+            os.makedirs(folder, exist_ok=True)
+            for name in _ARRAYS:
+                np.save(os.path.join(folder, f"{name}.npy"), self._surfaces[symbol][name])
+        self.path = path
+
+    def _get(self, symbol: str) -> dict:
+        if symbol not in self._surfaces:
+            folder = os.path.join(self.path, symbol) if self.path is not None else None
+            if folder is None or not os.path.isdir(folder):
+                raise KeyError(symbol)
+            self._surfaces[symbol] = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r')
+                                      for name in _ARRAYS}
+        return self._surfaces[symbol]
+
+    def coefficients(self, symbol: str) -> np.ndarray:
+        """
+        Coefficienti (n_date x n_moneyness-1 x n_tenor-1 x 4) del bilineare per cella:
+        v = c0 + c1 * tx + c2 * ty + c3 * tx * ty, con tx, ty posizioni relative nella cella.
+        """
+        if symbol not in self._coefficients:
+            v = np.asarray(self._get(symbol)['vols'])
+            v00, v10, v01, v11 = v[:, :-1, :-1], v[:, 1:, :-1], v[:, :-1, 1:], v[:, 1:, 1:]
+            self._coefficients[symbol] = np.stack([v00, v10 - v00, v01 - v00, v11 - v10 - v01 + v00], axis=-1)
+        return self._coefficients[symbol]
+
+    def dates(self, symbol: str) -> np.ndarray:
+        return self._get(symbol)['dates']
+
+    def surface(self, symbol: str, ref_date) -> 'VolSurface':
+        """Superficie del sottostante alla data, KeyError se la data non è presente."""
+        dates = self.dates(symbol)
+        key = np.datetime64(pd.Timestamp(ref_date).date(), 'D')
+        i = int(np.searchsorted(dates, key))
+        if i == len(dates) or dates[i] != key:
+            raise KeyError((symbol, str(key)))
+        return VolSurface(self, symbol, i)
+
+    def day(self, ref_date) -> 'VolatilityView':
+        return VolatilityView(self, ref_date)
+
+
+def _cell(grid: np.ndarray, x: np.ndarray):
+    """Cella e posizione relativa di x sulla griglia, le celle di bordo estrapolano come RegularGridInterpolator."""
+    i = np.clip(np.searchsorted(grid, x) - 1, 0, len(grid) - 2)
+    return i, (x - grid[i]) / (grid[i + 1] - grid[i])
+
+
+class VolSurface(Mapping):
+    """
+    Vista di una superficie dello store, compatibile con il vecchio dizionario
+    {'ref_date', 'moneyness', 'tenor', 'volatility', 'is_valid'}.
+    Gli assi escludono le righe/colonne senza alcun punto alla data.
+    """
+    __slots__ = ('_store', '_symbol', '_i', '_rows', '_cols')
+    _KEYS = ('ref_date', 'moneyness', 'tenor', 'volatility', 'is_valid')
+
+    def __init__(self, store: VolSurfaceStore, symbol: str, i: int):
+        self._store = store
+        self._symbol = symbol
+        self._i = i
+        vols = store._get(symbol)['vols'][i]
+        self._rows = ~np.isnan(vols).all(axis=1)
+        self._cols = ~np.isnan(vols).all(axis=0)
+
+    @property
+    def is_dense(self) -> bool:
+        return bool(self._rows.all() and self._cols.all())
+
+    def __getitem__(self, key):
+        surface = self._store._get(self._symbol)
+        if key == 'ref_date':
+            return str(surface['dates'][self._i])
+        if key == 'moneyness':
+            return surface['moneyness'][self._rows]
+        if key == 'tenor':
+            return surface['tenor'][self._cols]
+        if key == 'volatility':
+            vols = surface['vols'][self._i]
+            return vols if self.is_dense else vols[np.ix_(self._rows, self._cols)]
+        if key == 'is_valid':
+            return True
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def interpolate(self, points) -> np.ndarray:
+        """
+        Volatilità nei punti (k x 2: moneyness, tenor in giorni), bilineare con estrapolazione lineare
+        fuori griglia come RegularGridInterpolator(bounds_error=False, fill_value=None).
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        moneyness, tenor = self['moneyness'], self['tenor']
+        i, tx = _cell(moneyness, points[:, 0])
+        j, ty = _cell(tenor, points[:, 1])
+        if self._store.precompute and self.is_dense:
+            c = self._store.coefficients(self._symbol)[self._i, i, j]
+            return c[:, 0] + c[:, 1] * tx + c[:, 2] * ty + c[:, 3] * tx * ty
+        v = self['volatility']
+        return ((1 - tx) * (1 - ty) * v[i, j] + tx * (1 - ty) * v[i + 1, j]
+                + (1 - tx) * ty * v[i, j + 1] + tx * ty * v[i + 1, j + 1])
+
+
+class VolatilityView(Mapping):
+    """Vista {sottostante: VolSurface} di una data; i sottostanti sono letti dallo store solo se richiesti."""
+
+    def __init__(self, store: VolSurfaceStore, ref_date):
+        self._store = store
+        self._ref_date = ref_date
+
+    def __getitem__(self, symbol):
+        return self._store.surface(symbol, self._ref_date)
+
+    def __iter__(self):
+        return (s for s in self._store.symbols if s in self)
+
+    def __contains__(self, symbol):
+        try:
+            self[symbol]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,128 @@
+"""
+Benchmark del trade log di Analytics:
+vecchio trade_log con un filtro per trade_id sull'intero positions_summary vs _trade_log
+(prima riga aperta e prima riga chiusa di ogni trade in blocco), più signals e summary sulle stesse righe.
+
+Uso:
+    python benchmarks/bench_analytics.py --rows 10000000 --legacy-rows 200000
+
+Il positions_summary sintetico ha la forma di quello del backtest: a ogni step una riga per ogni posizione
+aperta fino a quel giorno (chiuse comprese). Il vecchio trade_log cresce con trade x righe, quindi è misurato
+solo fino a --legacy-rows e su trade tutti completi (falliva sui trade senza riga aperta o chiusa).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backtester import Analytics
+
+STEPS = 2520  # 10 anni di giorni lavorativi
+
+
+def synthetic_summary(rows: int, rng, complete: bool = False) -> pd.DataFrame:
+    """positions_summary di circa rows righe; con complete=False anche trade aperti a fine run e chiusi nello stesso step."""
+    n_trades = max(1, int(rows / (STEPS / 2)))
+    start = np.sort(rng.integers(0, STEPS - 1, n_trades))
+    length = rng.integers(1, 60, n_trades)
+    if not complete:
+        length[rng.random(n_trades) < 0.05] = 0          # aperti e chiusi nello stesso step
+        length[rng.random(n_trades) < 0.05] = STEPS      # ancora aperti a fine backtest
+    close = np.minimum(start + length, STEPS if not complete else STEPS - 1)
+
+    counts = STEPS - start
+    trade = np.repeat(np.arange(n_trades), counts)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    step = start[trade] + (np.arange(len(trade)) - offsets[trade])
+    order = np.lexsort((trade, step))
+    trade, step = trade[order], step[order]
+    alive = step < close[trade]
+
+    dates = np.array(np.datetime_as_string(np.datetime64('2015-01-01') + np.arange(STEPS), unit='D').tolist(), dtype=object)
+    symbols = np.array([f"TK{i:04d}" for i in range(500)], dtype=object)
+    symbol = symbols[rng.integers(0, len(symbols), n_trades)]
+    side = np.where(rng.random(n_trades) < 0.5, 1, -1)
+    entry_price = 100 + rng.normal(0, 5, n_trades)
+    pnl = rng.normal(0, 10, n_trades)
+    current_value = entry_price[trade] + rng.normal(0, 1, len(trade))
+    open_pnl = np.where(alive, (current_value - entry_price[trade]) * side[trade] * 10, 0.0)
+    closed_pnl = np.where(alive, 0.0, pnl[trade])
+    return pd.DataFrame({
+        "ref_date": dates[step],
+        "trade_date": dates[start[trade]],
+        "trade_id": trade + 1,
+        "symbol": symbol[trade],
+        "type": "equity",
+        "side": side[trade],
+        "quantity": np.where(alive, 10, 0),
+        "entry_price": entry_price[trade],
+        "is_alive": alive,
+        "current_value": current_value,
+        "open_pnl": open_pnl,
+        "closed_pnl": closed_pnl,
+        "global_pnl": open_pnl + closed_pnl,
+        "exit_value": np.where(alive, np.nan, entry_price[trade] + pnl[trade] * side[trade] / 10),
+    })
+
+
+def source(summary: pd.DataFrame):
+    """Oggetto con positions_summary e period_pnl come il Backtester, per costruire Analytics."""
+    equity = 100000 + summary.groupby('ref_date', sort=False)['global_pnl'].sum()
+    period_pnl = pd.DataFrame({'ref_date': equity.index, 'daily_pnl': equity.to_numpy()})
+    return type('Source', (), {'positions_summary': summary, 'period_pnl': period_pnl})()
+
+
+def legacy_trade_log(trades: pd.DataFrame) -> pd.DataFrame:
+    """trade_log prima della modifica: due filtri booleani su tutte le righe per ogni trade."""
+    trade_log = []
+    for trade_id in trades['trade_id'].unique():
+        entry_row = trades[(trades['trade_id'] == trade_id) & (trades['is_alive'] == True)].iloc[0]
+        exit_row = trades[(trades['trade_id'] == trade_id) & (trades['is_alive'] == False)].iloc[0]
+        trade_log.append(entry_row.to_dict())
+        trade_log.append(exit_row.to_dict())
+    return pd.DataFrame(trade_log)
+
+
+def timed(function):
+    t0 = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=200_000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    small = synthetic_summary(args.legacy_rows, rng, complete=True)
+    legacy, legacy_elapsed = timed(lambda: legacy_trade_log(small))
+    analytics = Analytics(source(small))
+    log, elapsed = timed(analytics.trade_log)
+    pd.testing.assert_frame_equal(log, legacy, check_dtype=False)
+    trades = small['trade_id'].nunique()
+    print(f"{'metodo':<12}{'righe':>12}{'trade':>10}{'tempo':>12}")
+    print(f"{'loop':<12}{len(small):>12,}{trades:>10,}{legacy_elapsed:>11.3f}s")
+    print(f"{'blocco':<12}{len(small):>12,}{trades:>10,}{elapsed:>11.3f}s   speedup {legacy_elapsed / elapsed:.0f}x")
+
+    summary = synthetic_summary(args.rows, rng)
+    analytics = Analytics(source(summary))
+    log, elapsed = timed(analytics.trade_log)
+    trades = summary['trade_id'].nunique()
+    print(f"{'blocco':<12}{len(summary):>12,}{trades:>10,}{elapsed:>11.3f}s")
+    open_trades = int(log['ref_date'].isna().sum())
+    same_step = int((log['quantity'].isna() & log['ref_date'].notna()).sum())
+    print(f"  {len(log) // 2:,} trade nel log ({open_trades:,} aperti a fine run, {same_step:,} aperti e chiusi nello stesso step)")
+    _, elapsed = timed(lambda: [analytics.signals(s) for s in summary['symbol'].unique()[:50]])
+    print(f"  signals di 50 simboli: {elapsed:.3f}s")
+    _, elapsed = timed(analytics.summary)
+    print(f"  summary: {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark offline del fetch Bloomberg: vecchio loop seriale su tutti i giorni di calendario
+vs FetchScheduler (solo giorni di trading, richieste concorrenti, bdh in batch).
+
+Le risposte sono generate da una source sintetica, registrate con RecordingBlp e poi
+riprodotte con ReplayBlp, che simula la latenza del terminale.
+
+Uso:
+    python benchmarks/bench_fetch.py --tickers 10 --start 2025-01-01 --end 2025-03-31 --latency 0.05 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backtester import FetchScheduler, RecordingBlp, ReplayBlp
+
+
+class SyntheticBlp:
+    """Source sintetica con l'interfaccia di xbbg.blp (bdh, bdib)."""
+
+    def bdh(self, tickers, flds, start_date, end_date, **kwargs):
+        idx = pd.bdate_range(start_date, end_date)
+        frames = {tk: pd.DataFrame({f: np.linspace(100, 110, len(idx)) for f in flds}, index=idx) for tk in tickers}
+        return pd.concat(frames, axis=1)
+
+    def bdib(self, ticker, dt, **kwargs):
+        if pd.Timestamp(dt).weekday() >= 5:
+            return pd.DataFrame()
+        idx = pd.date_range(pd.Timestamp(dt) + pd.Timedelta(hours=8), periods=510, freq='min', tz='UTC')
+        df = pd.DataFrame({f: 100.0 for f in ['open', 'high', 'low', 'close', 'volume']}, index=idx)
+        return pd.concat({ticker: df}, axis=1)
+
+
+def legacy_intraday(source, ticker, start_date, end_date):
+    """Vecchio _bbg_intraday_dump: una richiesta per ogni giorno di calendario, in serie."""
+    df_list = []
+    for dt in pd.date_range(start=start_date, end=end_date, freq='D'):
+        df_list.append(source.bdib(ticker=ticker, dt=dt, ref='EquityAllDay', session='allday'))
+    return pd.concat(df_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=10)
+    parser.add_argument('--start', default='2025-01-01')
+    parser.add_argument('--end', default='2025-03-31')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    tickers = [f"TK{i:03d} Equity" for i in range(args.tickers)]
+    flds = ['open', 'high', 'low', 'px_last', 'volume']
+
+    with tempfile.TemporaryDirectory() as path:
+        # registra le risposte usando lo stesso schema di richieste del FetchScheduler
+        recorder = FetchScheduler(RecordingBlp(SyntheticBlp(), path), max_workers=args.workers)
+        for tk in tickers:
+            recorder.intraday(tk, args.start, args.end)
+            recorder.daily([tk], args.start, args.end, flds=flds)
+        recorder.daily(tickers, args.start, args.end, flds=flds)
+
+        replay = ReplayBlp(path, latency=args.latency)
+        t0 = time.perf_counter()
+        for tk in tickers:
+            legacy_intraday(replay, tk, args.start, args.end)
+            replay.bdh([tk], flds=flds, start_date=args.start, end_date=args.end)
+        legacy_elapsed, legacy_calls = time.perf_counter() - t0, replay.calls
+
+        replay = ReplayBlp(path, latency=args.latency)
+        scheduler = FetchScheduler(replay, max_workers=args.workers)
+        t0 = time.perf_counter()
+        for tk in tickers:
+            scheduler.intraday(tk, args.start, args.end)
+        scheduler.daily(tickers, args.start, args.end, flds=flds)
+        new_elapsed, new_calls = time.perf_counter() - t0, replay.calls
+
+    print(f"{args.tickers} ticker, {args.start} -> {args.end}, latenza {args.latency * 1000:.0f} ms/richiesta")
+    print(f"seriale   : {legacy_calls:>6} richieste in {legacy_elapsed:7.2f}s")
+    print(f"scheduler : {new_calls:>6} richieste in {new_elapsed:7.2f}s ({args.workers} worker)")
+    print(f"speedup   : {legacy_elapsed / new_elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark dell'ingestione dei prezzi a 1 minuto nel market store:
+vecchio _fill_prices (converters per cella + iterrows) vs bulk loader vettoriale.
+
+Uso:
+    python benchmarks/bench_ingest.py --tickers 500 --days 252 --minutes 510
+
+Il percorso iterrows viene misurato solo su --legacy-tickers ticker
+(il risultato è espresso in righe/secondo, quindi resta confrontabile).
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backtester import MarketDataHandler, MarketStoreBuilder
+
+
+def synthetic_frame(ticker: str, days: int, minutes: int, rng) -> pd.DataFrame:
+    """DataFrame a 1 minuto con date/time come stringhe, come letto da CSV."""
+    sessions = pd.bdate_range('2024-01-02', periods=days)
+    offsets = pd.to_timedelta(np.arange(minutes), unit='min') + pd.Timedelta(hours=9)
+    ts = (sessions.values[:, None] + offsets.values[None, :]).ravel()
+    n = len(ts)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1e-4, n)))
+    stamps = pd.DatetimeIndex(ts)
+    return pd.DataFrame({
+        'date': stamps.strftime('%Y-%m-%d'),
+        'time': stamps.strftime('%H:%M:%S'),
+        'ticker': ticker,
+        'open': close, 'high': close * 1.0005, 'low': close * 0.9995, 'close': close,
+        'volume': rng.integers(100, 10_000, n).astype(float),
+    })
+
+
+def legacy_fill(frames: dict) -> dict:
+    """Riproduce il vecchio _fill_prices intraday: strptime per cella + iterrows + dict per barra."""
+    market_data = {}
+    for tk, raw in frames.items():
+        df = raw.copy()
+        df['date'] = df['date'].map(lambda x: datetime.strptime(x, "%Y-%m-%d").date())
+        df['time'] = df['time'].map(lambda x: datetime.strptime(x, "%H:%M:%S").time())
+        for ix, row in df.iterrows():
+            current_date = row['date'].isoformat()
+            t = row['time'].isoformat()
+            day = market_data.setdefault(current_date, {"ref_date": current_date})
+            if t not in day:
+                day[t] = {"ref_date": current_date, "equity": {}, "rate": {}, "volatility": {}}
+            day[t]["equity"][tk] = {
+                "open": float(row["open"]),
+                "high": float(row["high"]),
+                "low": float(row["low"]),
+                "close": float(row["close"]),
+                "volume": float(row["volume"]),
+                "is_valid": True
+            }
+    return market_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--days', type=int, default=252)
+    parser.add_argument('--minutes', type=int, default=510)
+    parser.add_argument('--legacy-tickers', type=int, default=2)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    rows_per_ticker = args.days * args.minutes
+
+    legacy_frames = {f"TK{i:04d}": synthetic_frame(f"TK{i:04d}", args.days, args.minutes, rng)
+                     for i in range(min(args.legacy_tickers, args.tickers))}
+    t0 = time.perf_counter()
+    legacy_fill(legacy_frames)
+    legacy_elapsed = time.perf_counter() - t0
+    legacy_rows = rows_per_ticker * len(legacy_frames)
+
+    builder = MarketStoreBuilder('s')
+    bulk_elapsed = 0.0
+    for i in range(args.tickers):
+        tk = f"TK{i:04d}"
+        df = legacy_frames.pop(tk, None)
+        if df is None:
+            df = synthetic_frame(tk, args.days, args.minutes, rng)
+        t0 = time.perf_counter()
+        builder.add_frame(tk, *MarketDataHandler._to_bars(df, '1m'))
+        bulk_elapsed += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    store = builder.build()
+    bulk_elapsed += time.perf_counter() - t0
+    bulk_rows = rows_per_ticker * args.tickers
+
+    print(f"dataset: {args.tickers} ticker x {args.days} giorni x {args.minutes} minuti = {bulk_rows:,} righe")
+    print(f"iterrows : {legacy_rows:>12,} righe in {legacy_elapsed:8.2f}s -> {legacy_rows / legacy_elapsed:>14,.0f} righe/s")
+    print(f"bulk     : {bulk_rows:>12,} righe in {bulk_elapsed:8.2f}s -> {bulk_rows / bulk_elapsed:>14,.0f} righe/s")
+    print(f"speedup  : {(bulk_rows / bulk_elapsed) / (legacy_rows / legacy_elapsed):.1f}x, store {store.shape}")
+
+
+if __name__ == '__main__':
+    main()
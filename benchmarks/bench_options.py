@@ -0,0 +1,70 @@
+"""
+Benchmark della valutazione di un book di opzioni:
+QuantLib per singola opzione (vecchio calculate_value, ora calculate_value_ql)
+vs price_options (superficie in cache per sottostante + BSM vettoriale).
+
+Uso:
+    python benchmarks/bench_options.py --options 1000 --underlyings 5 --days 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backtester import OptionPosition, OptionType, PositionType, price_options
+
+MONEYNESS = [0.6, 0.7, 0.8, 0.9, 0.95, 1.0, 1.05, 1.1, 1.2, 1.3, 1.5]
+TENORS = [7, 14, 30, 60, 90, 180, 270, 365, 730]
+
+
+def synthetic_market(ref_date: date, symbols: list, rng) -> dict:
+    """Snapshot nel formato di MarketData: spot, dividend yield, risk free e superfici per sottostante."""
+    return {
+        'ref_date': ref_date,
+        'equity': {s: {'close': float(100 * np.exp(rng.normal(0, 0.01))), 'div_yield': 0.01} for s in symbols},
+        'rate': {'riskfree': 0.03},
+        'volatility': {s: {'moneyness': MONEYNESS, 'tenor': TENORS,
+                           'volatility': (0.15 + 0.1 * rng.random((len(MONEYNESS), len(TENORS)))).tolist()}
+                       for s in symbols},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--options', type=int, default=1000)
+    parser.add_argument('--underlyings', type=int, default=5)
+    parser.add_argument('--days', type=int, default=20)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    symbols = [f"UND{i}" for i in range(args.underlyings)]
+    start = date(2024, 1, 2)
+    markets = [synthetic_market(start + timedelta(days=d), symbols, rng) for d in range(args.days)]
+    book = [OptionPosition(symbol=str(rng.choice(symbols)), quantity=1, market_data=markets[0],
+                           strike_price=float(rng.uniform(70, 130)),
+                           expiry_date=start + timedelta(days=int(rng.integers(args.days + 30, 720))),
+                           option_type=OptionType.CALL if rng.random() < 0.5 else OptionType.PUT,
+                           position_type=PositionType.LONG)
+            for _ in range(args.options)]
+
+    t0 = time.perf_counter()
+    legacy = [np.array([option.calculate_value_ql(m) for option in book]) for m in markets]
+    legacy_elapsed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = [price_options(book, m) for m in markets]
+    batch_elapsed = time.perf_counter() - t0
+
+    error = max(np.max(np.abs(a - b)) for a, b in zip(legacy, batch))
+    print(f"book: {args.options} opzioni su {args.underlyings} sottostanti, {args.days} giorni")
+    print(f"QuantLib : {legacy_elapsed / args.days * 1e3:10.2f} ms/giorno")
+    print(f"batch    : {batch_elapsed / args.days * 1e3:10.2f} ms/giorno")
+    print(f"speedup  : {legacy_elapsed / batch_elapsed:.1f}x, errore massimo {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark dell'accumulo di positions_summary nel backtest:
+vecchio pd.concat a ogni step vs RecordBuffer colonnare materializzato una volta.
+
+Uso:
+    python benchmarks/bench_summary.py --positions 500 --years 10
+
+Il RecordBuffer viene misurato su orizzonti crescenti fino a --years (il tempo per step
+deve restare costante), il pd.concat solo fino a --legacy-years perché cresce in modo quadratico.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backtester import RecordBuffer
+
+STEPS_PER_YEAR = 252
+
+
+def step_records(step: int, positions: int, rng) -> list:
+    """Record di una giornata nel formato di Portfolio.get_positions_summary."""
+    ref_date = (np.datetime64('2015-01-01') + step).astype(str)
+    pnl = rng.normal(0, 10, positions)
+    return [{
+        "ref_date": ref_date,
+        "trade_date": ref_date,
+        "trade_id": 10000 + i,
+        "symbol": f"TK{i:04d}",
+        "type": "equity",
+        "side": 1,
+        "quantity": 10,
+        "entry_price": 100.0,
+        "is_alive": True,
+        "current_value": 100.0 + pnl[i],
+        "open_pnl": pnl[i],
+        "closed_pnl": 0.0,
+        "global_pnl": pnl[i],
+    } for i in range(positions)]
+
+
+def run_concat(days: list) -> float:
+    t0 = time.perf_counter()
+    positions_summary = pd.DataFrame()
+    for records in days:
+        positions_summary = pd.concat([positions_summary, pd.DataFrame(records)], axis=0)
+    return time.perf_counter() - t0
+
+
+def run_buffer(days: list) -> float:
+    t0 = time.perf_counter()
+    buffer = RecordBuffer()
+    for records in days:
+        buffer.append(records)
+    buffer.to_frame()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--positions', type=int, default=500)
+    parser.add_argument('--years', type=float, default=10)
+    parser.add_argument('--legacy-years', type=float, default=1)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    steps = int(args.years * STEPS_PER_YEAR)
+    days = [step_records(i, args.positions, rng) for i in range(steps)]
+
+    print(f"{args.positions} posizioni per step, {STEPS_PER_YEAR} step/anno")
+    print(f"{'metodo':<10}{'anni':>6}{'righe':>14}{'tempo':>10}{'us/step':>10}")
+    for method, run, years in (('concat', run_concat, args.legacy_years), ('buffer', run_buffer, args.years)):
+        for fraction in (0.25, 0.5, 1.0):
+            n = min(int(years * fraction * STEPS_PER_YEAR), steps)
+            if n == 0:
+                continue
+            elapsed = run(days[:n])
+            print(f"{method:<10}{n / STEPS_PER_YEAR:>6.1f}{n * args.positions:>14,}{elapsed:>9.2f}s{elapsed / n * 1e6:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
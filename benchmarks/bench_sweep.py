@@ -0,0 +1,106 @@
+"""
+Benchmark del caricamento del mercato nei worker di sweep:
+ogni worker apre la cache completa e copia la finestra (subset su un universo non contiguo, come prima)
+vs la finestra salvata una volta dal processo principale e aperta in memory-map da tutti i worker (save_loaded/open_loaded).
+
+Uso:
+    python benchmarks/bench_sweep.py --days 2520 --tickers 4000 --universe 2000 --workers 4
+
+I worker sono avviati con spawn (come su Windows) e restano vivi insieme finché tutti hanno misurato:
+per ciascuno il tempo per avere il mercato pronto e percorrerne una volta i campi (come fa un backtest)
+e la memoria privata / PSS letta da /proc/self/smaps_rollup (solo Linux).
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backtester import FIELDS, MarketStore
+
+
+def memory_mb() -> tuple:
+    """(privata, PSS) del processo in MB."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0]) / 1024
+    return values.get('Private_Clean', 0) + values.get('Private_Dirty', 0), values.get('Pss', 0)
+
+
+def worker(mode, cache, shared, universe, start, end, results, done):
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    base = memory_mb()
+    t0 = time.perf_counter()
+    if mode == 'copia':
+        store = MarketStore.load(cache).subset(universe, start, end)
+    else:
+        store = MarketStore.load(shared)
+    checksum = sum(float(np.nansum(store.field(f))) for f in FIELDS)
+    elapsed = time.perf_counter() - t0
+    private, pss = memory_mb()
+    results.put((elapsed, private - base[0], pss - base[1], checksum))
+    done.wait()
+
+
+def run(mode, workers, cache, shared, universe, start, end):
+    context = mp.get_context('spawn')
+    results, done = context.Queue(), context.Event()
+    processes = [context.Process(target=worker, args=(mode, cache, shared, universe, start, end, results, done))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measures = [results.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    return np.array(measures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=2520)
+    parser.add_argument('--tickers', type=int, default=4000)
+    parser.add_argument('--universe', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = np.datetime64('2015-01-01') + np.arange(args.days)
+    tickers = [f"TK{i:05d} US Equity" for i in range(args.tickers)]
+    universe = sorted(rng.choice(tickers, args.universe, replace=False).tolist(), key=lambda tk: rng.random())
+    start, end = str(index[args.days // 10]), str(index[-1])
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache, shared = os.path.join(folder, 'cache'), os.path.join(folder, 'shared')
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (args.days, args.tickers)), axis=0))
+        MarketStore(index, tickers, {f: close for f in FIELDS}).save(cache)
+        del close
+
+        # una volta nel processo principale, come sweep
+        t0 = time.perf_counter()
+        MarketStore.load(cache).subset(universe, start, end).save(shared)
+        saved = time.perf_counter() - t0
+        window = sum(os.path.getsize(os.path.join(shared, f"{f}.npy")) for f in FIELDS) / 2 ** 20
+        print(f"finestra {args.days - args.days // 10} giorni x {args.universe} ticker: {window:.0f} MB, "
+              f"salvata dal processo principale in {saved:.3f}s")
+
+        print(f"{'metodo':<12}{'worker':>8}{'pronto (s)':>14}{'privata (MB)':>16}{'PSS (MB)':>12}")
+        timings = {}
+        for mode in ('copia', 'memory-map'):
+            measures = run(mode, args.workers, cache, shared, universe, start, end)
+            assert len(set(measures[:, 3])) == 1
+            timings[mode] = measures[:, 0].mean()
+            print(f"{mode:<12}{args.workers:>8}{measures[:, 0].mean():>14.3f}"
+                  f"{measures[:, 1].mean():>16.0f}{measures[:, 2].mean():>12.0f}")
+        print(f"speedup per worker: {timings['copia'] / timings['memory-map']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
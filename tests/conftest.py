@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+
+TICKERS = ['AAA US Equity', 'BBB US Equity', 'CCC US Equity']
+
+
+def make_store(tickers=TICKERS, start='2023-01-02', end='2023-12-29', seed=0) -> bt.MarketStore:
+    """Store EOD sintetico: random walk sui giorni lavorativi."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(start, end).values.astype('datetime64[D]')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(index), len(tickers))), axis=0))
+    data = {
+        'open': close * (1 + rng.normal(0, 0.002, close.shape)),
+        'high': close * (1 + rng.random(close.shape) * 0.01),
+        'low': close * (1 - rng.random(close.shape) * 0.01),
+        'close': close,
+        'volume': rng.integers(1000, 10000, close.shape).astype(float),
+    }
+    return bt.MarketStore(index, tickers, data)
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    """Cartella dati con la cache EOD sintetica, usata da ogni MarketDataHandler creato nel test."""
+    path = str(tmp_path) + '/'
+    make_store().save(path + 'cache/EOD')
+    init = bt.MarketDataHandler.__init__
+
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self.data_path = path
+        self.prices_path = path + 'prices'
+        self.vols_path = path + 'volatilities'
+
+    monkeypatch.setattr(bt.MarketDataHandler, '__init__', __init__)
+    yield path
+    bt.MarketDataHandler.clear_loaded()
+
+
+class Crossover(bt.Backtester):
+    """Long sopra la media mobile di window giorni, flat sotto."""
+
+    def __init__(self, universe, start_date, end_date, starting_balance=100000, max_leverage=4,
+                 frequency='EOD', rebuild=False, window=5, lookback=None):
+        super().__init__(universe, start_date, end_date, starting_balance, max_leverage, frequency, rebuild, lookback)
+        self.window = window
+        self.quantity = 10
+
+    def on_data(self):
+        market = self.history[self.ref_date]
+        for ticker in self.universe:
+            close = self.history.close[:, self.history.column(ticker)]
+            if len(close) <= self.window:
+                continue
+            above = close[-1] > close[-self.window:].mean()
+            held = any(p.symbol == ticker and p.is_open for p in self.portfolio.positions)
+            if above and not held:
+                self.trade(ticker, quantity=self.quantity, market=market, assettype=bt.AssetType.EQUITY, side=bt.PositionType.LONG)
+            elif not above and held:
+                self.portfolio.close_positions(ticker, bt.AssetType.EQUITY, market)
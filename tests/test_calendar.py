@@ -0,0 +1,67 @@
+from datetime import date
+
+import numpy as np
+import QuantLib as ql
+
+import backtester as bt
+from backtester import trading_calendar
+from conftest import TICKERS, make_store
+
+
+class Idle(bt.Backtester):
+    def on_data(self):
+        pass
+
+
+def _reference_days(start, end):
+    """Giorni di trading del calendario TARGET giorno per giorno, con QuantLib."""
+    calendar = ql.TARGET()
+    days, day = [], start
+    while day <= end:
+        if calendar.isBusinessDay(ql.Date(day.day, day.month, day.year)):
+            days.append(day)
+        day = date.fromordinal(day.toordinal() + 1)
+    return days
+
+
+def test_trading_days_match_quantlib():
+    days = bt.trading_days('2022-12-15', '2024-01-10')
+    assert days.dtype == np.dtype('datetime64[D]')
+    assert days.astype(object).tolist() == _reference_days(date(2022, 12, 15), date(2024, 1, 10))
+    assert np.datetime64('2023-04-07') not in days
+    assert np.datetime64('2023-12-25') not in days
+
+
+def test_is_trading_day_mask_and_holiday_cache():
+    days = np.array(['2023-04-06', '2023-04-07', '2023-04-08', '2023-04-10', '2023-04-11'], dtype='datetime64[D]')
+    assert bt.is_trading_day(days).tolist() == [True, False, False, False, True]
+    assert bt.is_trading_day([]).shape == (0,)
+    assert (ql.TARGET().name(), 2023) in trading_calendar._HOLIDAY_CACHE
+    holidays = trading_calendar.holidays('2023-01-01', '2023-12-31')
+    assert holidays.astype(object).tolist() == [date(2023, 4, 7), date(2023, 4, 10), date(2023, 5, 1),
+                                                date(2023, 12, 25), date(2023, 12, 26)]
+
+
+def test_date_grid_skips_holidays(data_path):
+    backtester = Idle(TICKERS, '2023-03-01', '2023-06-30', 100000, 4, 'EOD', False)
+    backtester._on_start()
+    # lo store sintetico è su tutti i giorni lavorativi: i festivi TARGET restano fuori dalla griglia
+    assert backtester.valid_dates == _reference_days(date(2023, 3, 1), date(2023, 6, 30))
+    assert backtester.unprocessed_dates == []
+    index = backtester.market.eod_store.index.astype('datetime64[D]')
+    assert (index[backtester.grid_rows] == np.array(backtester.valid_dates, dtype='datetime64[D]')).all()
+    assert backtester.availability.shape == (len(backtester.grid_dates), len(TICKERS))
+
+
+def test_date_grid_skips_days_without_prices(data_path):
+    store = make_store()
+    missing = np.datetime64('2023-03-15')
+    store.field('close')[np.searchsorted(store.index.astype('datetime64[D]'), missing), 1] = np.nan
+    store.save(data_path + 'cache/EOD')
+
+    backtester = Idle(TICKERS, '2023-03-01', '2023-03-31', 100000, 4, 'EOD', False)
+    backtester._on_start()
+    assert backtester.unprocessed_dates == [date(2023, 3, 15)]
+    assert date(2023, 3, 15) not in backtester.valid_dates
+    row = list(backtester.grid_dates.astype(object)).index(date(2023, 3, 15))
+    assert backtester.availability[row].tolist() == [True, False, True]
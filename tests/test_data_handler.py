@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from conftest import make_store
+
+
+@pytest.fixture
+def handler(tmp_path):
+    """MarketDataHandler con le cartelle dati in tmp_path."""
+    market = bt.MarketDataHandler(source=object())
+    market.data_path = str(tmp_path) + '/'
+    market.prices_path = market.data_path + 'prices'
+    market.vols_path = market.data_path + 'volatilities'
+    return market
+
+
+def _daily(ticker_seed, start='2023-01-02', end='2023-03-31'):
+    rng = np.random.default_rng(ticker_seed)
+    dates = pd.bdate_range(start, end)
+    close = 100 + np.cumsum(rng.normal(0, 1, len(dates)))
+    return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': close - 0.5, 'high': close + 1,
+                         'low': close - 1, 'close': close, 'volume': rng.integers(100, 1000, len(dates)).astype(float),
+                         'insertion_time': '2024-01-01T00:00:00'})
+
+
+def _intraday(ticker_seed, day='2023-03-31', minutes=5):
+    rng = np.random.default_rng(ticker_seed)
+    times = pd.date_range(f'{day} 09:00', periods=minutes, freq='min')
+    close = 100 + rng.normal(0, 1, minutes)
+    return pd.DataFrame({'date': times.strftime('%Y-%m-%d'), 'time': times.strftime('%H:%M:%S'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+                         'volume': np.arange(minutes, dtype=float), 'insertion_time': '2024-01-01T00:00:00'})
+
+
+def _write_csv(handler, tickers):
+    os.makedirs(handler.data_path + 'daily', exist_ok=True)
+    os.makedirs(handler.prices_path, exist_ok=True)
+    for seed, ticker in enumerate(tickers):
+        _daily(seed).to_csv(os.path.join(handler.data_path, 'daily', f'{ticker}.csv'), index=False)
+        _intraday(seed).to_csv(os.path.join(handler.prices_path, f'{ticker}.csv'), index=False)
+
+
+def test_fill_prices_builds_stores_from_csv(handler):
+    _write_csv(handler, ['A', 'B'])
+    handler._fill_prices(['B', 'A'], None, None, '1m', rebuild=False, workers=1)
+    store = handler.eod_store
+    assert store.tickers == ['B', 'A']
+    expected = _daily(0)
+    np.testing.assert_array_equal(store.index, pd.to_datetime(expected['date']).values.astype('datetime64[D]'))
+    np.testing.assert_allclose(store.field('close')[:, 1], expected['close'])
+    intraday = handler.intraday_store
+    assert str(intraday.index[0]) == '2023-03-31T09:00:00'
+    np.testing.assert_array_equal(intraday.field('volume')[:, 0], np.arange(5.0))
+    bar = handler.market_data['2023-03-31']['09:02:00']['equity']['A']
+    assert bar['close'] == pytest.approx(_intraday(0)['close'][2])
+
+
+def test_load_market_migrates_json_to_binary_cache(handler):
+    store = make_store(end='2023-02-28')
+    with open(handler.data_path + 'MarketData.json', 'w') as file:
+        json.dump(bt.MarketDataView(store).to_dict(), file)
+    handler.load_market(None, None, None)
+    assert os.path.exists(os.path.join(handler._cache_path('EOD'), 'meta.json'))
+    assert isinstance(handler.eod_store.field('close'), np.memmap)
+    np.testing.assert_array_equal(handler.eod_store.field('close'), store.field('close'))
+    assert handler.market_data['2023-02-01']['EOD']['equity'][store.tickers[0]]['close'] == store.field('close')[22, 0]
+
+
+def test_load_market_reads_only_universe_and_window(handler):
+    store = make_store()
+    store.save(handler._cache_path('EOD'))
+    handler.load_market([store.tickers[1]], '2023-06-01', '2023-06-30', lookback=2)
+    loaded = handler.eod_store
+    assert loaded.tickers == [store.tickers[1]]
+    assert loaded.index[0] == store.index[store.row('2023-06-01') - 2]
+    assert str(loaded.index[-1]) == '2023-06-30'
+    assert list(handler.market_data['2023-06-01']['EOD']['equity']) == [store.tickers[1]]
+
+
+def _bbg_daily(start, end, close=1.0):
+    index = pd.bdate_range(start, end)
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close, 'volume': 10.0}, index=index)
+
+
+def _bbg_intraday(day, close=1.0):
+    index = pd.date_range(f'{day} 09:00', periods=3, freq='min', tz='Europe/Rome')
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1.0}, index=index)
+
+
+def _table(handler, frame, ticker, freq):
+    table = handler.create_table(frame, ticker)
+    table['type'] = 'eod' if freq == '1d' else 'intraday'
+    return table
+
+
+def test_prices_are_partitioned_by_year(handler):
+    handler._write_prices('A', _table(handler, _bbg_daily('2022-12-26', '2023-01-06'), 'A', '1d'))
+    handler._write_prices('A', _table(handler, _bbg_intraday('2023-01-05'), 'A', '1m'))
+    folder = handler._ticker_dir('A')
+    assert sorted(os.listdir(folder)) == ['2022.parquet', '2023.parquet']
+    assert handler._partitions('A', '2023-01-01') == [os.path.join(folder, '2023.parquet')]
+
+    daily = handler.load_price('A', '1d', '2023-01-03', '2023-01-05')
+    assert [d.isoformat() for d in daily['date']] == ['2023-01-03', '2023-01-04', '2023-01-05']
+    assert 'time' not in daily and 'type' not in daily
+    intraday = handler.load_price('A', '1m')
+    assert len(intraday) == 3 and str(intraday['time'].iloc[0]) == '09:00:00'
+    assert handler._last_saved_date('A', '1d').isoformat() == '2023-01-06'
+    assert handler._last_saved_date('A', '1m').isoformat() == '2023-01-05'
+    assert handler._last_saved_date('B', '1d') is None
+
+
+def test_rewrites_deduplicate_keeping_the_last_record(handler):
+    handler._write_prices('A', _table(handler, _bbg_daily('2023-01-02', '2023-01-06'), 'A', '1d'))
+    handler._write_prices('A', _table(handler, _bbg_daily('2023-01-06', '2023-01-10', close=2.0), 'A', '1d'))
+    daily = handler.load_price('A', '1d')
+    assert len(daily) == 7
+    assert daily.set_index('date')['close'].loc[pd.Timestamp('2023-01-06').date()] == 2.0
+
+
+def test_partition_write_is_atomic(handler, monkeypatch):
+    handler._write_prices('A', _table(handler, _bbg_daily('2023-01-02', '2023-01-06'), 'A', '1d'))
+    path = os.path.join(handler._ticker_dir('A'), '2023.parquet')
+    before = pd.read_parquet(path)
+
+    def broken_to_parquet(self, target, *args, **kwargs):
+        with open(target, 'wb') as file:
+            file.write(b'PAR1 partial')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', broken_to_parquet)
+    with pytest.raises(OSError):
+        handler._write_prices('A', _table(handler, _bbg_daily('2023-01-09', '2023-01-10'), 'A', '1d'))
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(pd.read_parquet(path), before)
+
+
+class DailySource:
+    """bdh con colonne (ticker, campo): tre giorni lavorativi da start_date con close 5."""
+
+    def __init__(self):
+        self.starts = []
+
+    def bdh(self, tickers, start_date, end_date, **kwargs):
+        self.starts.append((tuple(tickers), start_date))
+        index = pd.bdate_range(start_date, periods=3)
+        columns = pd.MultiIndex.from_product([tickers, ['open', 'high', 'low', 'px_last', 'volume']])
+        return pd.DataFrame(5.0, index=index, columns=columns)
+
+
+def test_update_series_rewrites_last_day_and_appends(handler):
+    handler._write_prices('A', _table(handler, _bbg_daily('2022-12-26', '2023-01-06'), 'A', '1d'))
+    old_year = os.path.join(handler._ticker_dir('A'), '2022.parquet')
+    os.utime(old_year, (0, 0))
+    source = DailySource()
+    handler.fetcher = bt.FetchScheduler(source, backoff=0)
+
+    handler.update_series('A', '1d')
+    assert source.starts == [(('A',), '2023-01-06')]
+    daily = handler.load_price('A', '1d').set_index('date')['close']
+    assert [d.isoformat() for d in daily.index[-4:]] == ['2023-01-05', '2023-01-06', '2023-01-09', '2023-01-10']
+    assert list(daily.iloc[-4:]) == [1.0, 5.0, 5.0, 5.0]
+    # gli anni precedenti non vengono riscritti
+    assert os.path.getmtime(old_year) == 0
+    with pytest.raises(FileNotFoundError):
+        handler.update_series('B', '1d')
+
+
+def test_parallel_load_matches_sequential(handler):
+    _write_csv(handler, ['A', 'B', 'C'])
+    handler._write_prices('D', _table(handler, _bbg_daily('2023-01-02', '2023-03-31'), 'D', '1d'))
+    tasks = [(tk, '1d') for tk in 'ABCD']
+    sequential = handler._load_bars('ABCD', ['1d'], workers=1)
+    parallel = handler._load_bars('ABCD', ['1d'], workers=3)
+    assert set(parallel) == set(tasks)
+    for task in tasks:
+        np.testing.assert_array_equal(parallel[task][0], sequential[task][0])
+        np.testing.assert_array_equal(parallel[task][1], sequential[task][1])
+
+
+def test_build_universe_batches_tickers_by_last_saved_date(handler):
+    for ticker in ('A', 'B'):
+        handler._write_prices(ticker, _table(handler, _bbg_daily('2023-01-02', '2023-01-06'), ticker, '1d'))
+    source = DailySource()
+    handler.fetcher = bt.FetchScheduler(source, backoff=0)
+    handler.build_universe(['A', 'B', 'C'], '2023-01-02', None, intraday=False)
+    assert sorted(source.starts) == [(('A', 'B'), '2023-01-06'), (('C',), '2023-01-02')]
+    assert handler._last_saved_date('C', '1d').isoformat() == '2023-01-04'
+    assert handler._last_saved_date('B', '1d').isoformat() == '2023-01-10'
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from conftest import TICKERS, Crossover
+
+PNL = [0.0, 50.0, 120.0, -30.0, 10.0, 200.0, 150.0]
+REALIZED = [0.0, 0.0, 20.0, 20.0, -5.0, -5.0, 100.0]
+TURNOVER = [1000.0, 1000.0, 2500.0, 2500.0, 4000.0, 4000.0, 6000.0]
+POSITIONS = [1, 1, 2, 2, 3, 3, 3]
+DATES = [f"2023-01-{d:02d}" for d in range(2, 9)]
+
+
+def test_update_tracks_drawdown():
+    tracker = bt.EquityTracker(1000.0)
+    tracker.start(3)  # meno step di quelli registrati: le serie crescono
+    for row in zip(DATES, PNL, REALIZED, TURNOVER, POSITIONS):
+        tracker.update(*row)
+
+    equity = 1000.0 + np.array(PNL)
+    high_water_mark = np.maximum.accumulate(np.maximum(equity, 1000.0))
+    frame = tracker.to_frame()
+    assert len(tracker) == len(PNL)
+    assert frame['ref_date'].tolist() == DATES
+    np.testing.assert_allclose(frame['equity'], equity)
+    np.testing.assert_allclose(frame['high_water_mark'], high_water_mark)
+    np.testing.assert_allclose(frame['drawdown'], equity / high_water_mark - 1)
+    np.testing.assert_allclose(frame['unrealized_pnl'], np.array(PNL) - np.array(REALIZED))
+    assert frame['positions'].tolist() == POSITIONS
+    assert tracker.max_drawdown == pytest.approx(frame['drawdown'].min())
+    assert tracker.equity == equity[-1] and tracker.turnover == TURNOVER[-1]
+
+
+def test_extend_matches_update():
+    stepwise, block = bt.EquityTracker(1000.0), bt.EquityTracker(1000.0)
+    stepwise.start(len(PNL))
+    block.start(0)
+    for row in zip(DATES, PNL, REALIZED, TURNOVER, POSITIONS):
+        stepwise.update(*row)
+    # due blocchi: il secondo riparte dal massimo storico del primo
+    block.extend(DATES[:3], PNL[:3], REALIZED[:3], TURNOVER[:3], POSITIONS[:3])
+    block.extend(DATES[3:], PNL[3:], REALIZED[3:], TURNOVER[3:], POSITIONS[3:])
+    pd.testing.assert_frame_equal(block.to_frame(), stepwise.to_frame())
+    for name in ('equity', 'high_water_mark', 'drawdown', 'max_drawdown', 'realized_pnl', 'unrealized_pnl', 'turnover'):
+        assert getattr(block, name) == pytest.approx(getattr(stepwise, name))
+
+
+def test_equity_curve_matches_balance(data_path):
+    backtester = Crossover(TICKERS, '2023-02-01', '2023-06-30')
+    backtester.backtest()
+    curve = backtester.equity_curve
+    assert curve['ref_date'].tolist() == list(backtester.balance)
+    np.testing.assert_allclose(curve['equity'], list(backtester.balance.values()))
+    assert curve['turnover'].is_monotonic_increasing
+    assert (curve['drawdown'] <= 0).all()
+    assert backtester.equity.max_drawdown == pytest.approx(curve['drawdown'].min())
+    # all'ultimo step tutto è chiuso: il pnl è tutto realizzato
+    assert curve['unrealized_pnl'].iloc[-1] == pytest.approx(0, abs=1e-8)
+
+    light = Crossover(TICKERS, '2023-02-01', '2023-06-30')
+    light.record_positions = False
+    light.backtest()
+    assert light.positions_summary.empty
+    pd.testing.assert_frame_equal(light.equity_curve, curve)
+    np.testing.assert_allclose(light.period_pnl['daily_pnl'], backtester.period_pnl['daily_pnl'])
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import backtester as bt
+from conftest import TICKERS, Crossover
+from backtester.core.factors import FactorCache, FactorPanel, data_version, factor_key
+
+
+class Close(bt.Factor):
+    param_names = ('window', 'field')
+
+    def __init__(self, history=None, frequency='EOD', window=5, field='close'):
+        super().__init__(history, frequency)
+        self.window = window
+        self.field = field
+        self.scratch = object()
+
+    def compute(self):
+        return pd.DataFrame()
+
+
+def _entry(n=4, symbols=('A', 'B')):
+    index = np.datetime64('2024-01-01') + np.arange(n)
+    return index, list(symbols), np.arange(n * len(symbols), dtype=float).reshape(n, len(symbols))
+
+
+def test_factor_key_uses_declared_params():
+    a, b = Close(window=5), Close(window=5)
+    assert a.params() == {'window': 5, 'field': 'close'}
+    # attributi non dichiarati non entrano nella chiave
+    assert factor_key(a, ['A'], 'v1') == factor_key(b, ['A'], 'v1')
+    assert factor_key(a, ['A'], 'v1') != factor_key(Close(window=6), ['A'], 'v1')
+    assert factor_key(a, ['A'], 'v1') != factor_key(Close(field='open'), ['A'], 'v1')
+    assert factor_key(a, ['A'], 'v1') != factor_key(a, ['A', 'B'], 'v1')
+    assert factor_key(a, ['A'], 'v1') != factor_key(a, ['A'], 'v2')
+
+
+def test_data_version_follows_cache_meta_and_window(tmp_path):
+    index, symbols, values = _entry(6)
+    store = bt.MarketStore(index, symbols, {f: values for f in bt.FIELDS})
+    meta = os.path.join(tmp_path, 'meta.json')
+    assert data_version(meta, store) is None
+    store.save(str(tmp_path))
+    version = data_version(meta, store)
+    assert version == data_version(meta, store)
+    assert version != data_version(meta, store.subset(start='2024-01-02'))
+    os.utime(meta, (0, 0))
+    assert version != data_version(meta, store)
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = FactorCache(str(tmp_path))
+    assert cache.load('missing') is None
+    index, symbols, values = _entry()
+    cache.save('key', index, symbols, values)
+    loaded_index, loaded_symbols, loaded_values = cache.load('key')
+    np.testing.assert_array_equal(loaded_index, index)
+    assert loaded_symbols == symbols
+    np.testing.assert_array_equal(loaded_values, values)
+    assert isinstance(loaded_values, np.memmap)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = FactorCache(str(tmp_path), max_entries=2)
+    for i, key in enumerate(['a', 'b']):
+        cache.save(key, *_entry())
+        os.utime(os.path.join(tmp_path, key, 'meta.json'), (i, i))
+    cache.load('a')
+    cache.save('c', *_entry())
+    assert sorted(cache.keys()) == ['a', 'c']
+    cache.prune(0)
+    assert cache.keys() == []
+    cache.save('d', *_entry())
+    cache.clear()
+    assert not os.path.exists(tmp_path)
+
+
+def test_panel_aligns_and_views():
+    index, symbols, values = _entry(4)
+    panel = FactorPanel.from_arrays({'x': (index, symbols, values), 'y': (index[1:], ['C'], np.ones((3, 1)))})
+    assert len(panel.dates) == 4
+    assert np.isnan(panel.array('y')[0, 0])
+    view = panel.until(1, 3)
+    frame = view['x']
+    assert list(frame.index) == ['2024-01-02', '2024-01-03']
+    np.testing.assert_array_equal(frame.to_numpy(), values[1:3])
+    assert not panel.array('x').flags.writeable
+    assert list(panel.to_frame().columns.get_level_values('factor').unique()) == ['x', 'y']
+
+
+class WithSMA(Crossover):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.factors = [bt.SMA(self.market.market_data, self.frequency, window=3)]
+        self.seen = []
+
+    def on_data(self):
+        self.seen.append((self.ref_date, self.factors_history.index[-1],
+                          self.factor_view['sma'].index[-1], len(self.factor_view.array('sma'))))
+
+
+def test_factors_history_is_point_in_time_frame(data_path):
+    backtester = WithSMA(TICKERS, '2023-03-01', '2023-04-28', lookback=5)
+    backtester.backtest()
+    assert all(ref == frame_last == view_last for ref, frame_last, view_last, _ in backtester.seen)
+    # ogni step vede le righe fino alla sua data, nessuna successiva
+    assert np.all(np.diff([n for *_, n in backtester.seen]) > 0)
+    history = backtester.factors_history
+    assert isinstance(history, pd.DataFrame)
+    assert list(history.columns.names) == ['factor', 'symbol']
+    expected = backtester.market.eod_store.field('close')[:, 0]
+    np.testing.assert_allclose(history['sma'][TICKERS[0]].to_numpy(),
+                               pd.Series(expected).rolling(3).mean().to_numpy()[5:5 + len(history)])
+    assert history.index[0] == '2023-03-01'
+    # secondo run: fattore riletto dalla cache su disco
+    again = WithSMA(TICKERS, '2023-03-01', '2023-04-28', lookback=5)
+    again.backtest()
+    assert isinstance(again.factor_panel.values['sma'], np.memmap)
+    pd.testing.assert_frame_equal(again.factors_df, backtester.factors_df)
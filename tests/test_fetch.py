@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+import backtester as bt
+
+
+def _bdh_frame(tickers, start='2024-01-02', end='2024-01-05'):
+    index = pd.date_range(start, end, freq='B')
+    columns = pd.MultiIndex.from_product([tickers, ['open', 'px_last']])
+    return pd.DataFrame(1.0, index=index, columns=columns)
+
+
+class FakeBlp:
+    """Source con l'interfaccia di xbbg.blp che fallisce le prime failures chiamate."""
+
+    def __init__(self, failures=0, flat=False):
+        self.failures = failures
+        self.flat = flat
+        self.bdh_calls = []
+        self.bdib_days = []
+
+    def bdh(self, tickers, start_date, end_date, **kwargs):
+        self.bdh_calls.append(list(tickers))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("timeout")
+        frame = _bdh_frame(tickers, start_date, end_date)
+        return frame[tickers[0]] if self.flat else frame
+
+    def bdib(self, ticker, dt, **kwargs):
+        self.bdib_days.append(dt)
+        index = pd.date_range(dt, periods=2, freq='min')
+        return pd.DataFrame({(ticker, 'close'): [1.0, 2.0]}, index=index)
+
+
+def test_daily_retries_with_backoff():
+    source = FakeBlp(failures=2)
+    scheduler = bt.FetchScheduler(source, retries=2, backoff=0)
+    frames = scheduler.daily(['A', 'B'], '2024-01-02', '2024-01-05')
+    assert len(source.bdh_calls) == 3
+    assert list(frames['A'].columns) == ['open', 'px_last']
+
+
+def test_daily_gives_up_after_retries():
+    scheduler = bt.FetchScheduler(FakeBlp(failures=5), retries=1, backoff=0)
+    with pytest.raises(ConnectionError):
+        scheduler.daily(['A'], '2024-01-02', '2024-01-05')
+
+
+def test_daily_batches_tickers():
+    source = FakeBlp()
+    frames = bt.FetchScheduler(source, batch_size=2).daily(['A', 'B', 'C'], '2024-01-02', '2024-01-05')
+    assert sorted(map(sorted, source.bdh_calls)) == [['A', 'B'], ['C']]
+    assert set(frames) == {'A', 'B', 'C'}
+
+
+def test_flat_columns_are_split_or_rejected():
+    split = bt.FetchScheduler._split_batch
+    flat = _bdh_frame(['A'])['A']
+    assert split(['A'], flat)['A'] is flat
+    with pytest.raises(ValueError):
+        split(['A', 'B'], flat)
+    long = pd.concat([flat.assign(ticker='A'), (flat * 2).assign(ticker='B')])
+    frames = split(['A', 'B'], long)
+    assert (frames['B']['open'] == 2).all() and 'ticker' not in frames['B']
+    assert split(['A', 'B'], pd.DataFrame())['B'].empty
+    with pytest.raises(ValueError):
+        bt.FetchScheduler(FakeBlp(flat=True)).daily(['A', 'B'], '2024-01-02', '2024-01-05')
+
+
+def test_intraday_skips_weekends():
+    source = FakeBlp()
+    frame = bt.FetchScheduler(source).intraday('A', '2024-01-05', '2024-01-08')
+    assert sorted(pd.Timestamp(d).date().isoformat() for d in source.bdib_days) == ['2024-01-05', '2024-01-08']
+    assert list(frame.columns) == ['close'] and len(frame) == 4
+
+
+def test_record_and_replay(tmp_path):
+    recorder = bt.RecordingBlp(FakeBlp(), str(tmp_path))
+    recorded = bt.FetchScheduler(recorder).daily(['A', 'B'], '2024-01-02', '2024-01-05')
+    replay = bt.ReplayBlp(str(tmp_path))
+    replayed = bt.FetchScheduler(replay).daily(['A', 'B'], '2024-01-02', '2024-01-05')
+    pd.testing.assert_frame_equal(replayed['B'], recorded['B'])
+    assert replay.calls == 1
+    # chiamate non registrate: DataFrame vuoto come Bloomberg
+    assert replay.bdh(['C'], start_date='2024-01-02', end_date='2024-01-05').empty
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+import backtester as bt
+from conftest import TICKERS
+
+
+class Idle(bt.Backtester):
+    def on_data(self):
+        pass
+
+
+def _surface():
+    return {'moneyness': [0.8, 1.0, 1.2], 'tenor': [30, 90, 180],
+            'volatility': [[0.30, 0.28, 0.27], [0.25, 0.24, 0.23], [0.27, 0.26, 0.25]]}
+
+
+def test_backtester_greeks_with_open_option(data_path):
+    backtester = Idle(TICKERS, '2023-03-01', '2023-06-30', 100000, 4, 'EOD', False)
+    backtester._on_start()
+    backtester.history.advance(10)
+    backtester.ref_date = backtester.valid_dates[9].isoformat()
+    extra = backtester.market.market_data.extra(backtester.ref_date)
+    extra['rate']['riskfree'] = 0.03
+    extra['volatility'][TICKERS[0]] = _surface()
+
+    market = backtester.pricing_data(backtester.ref_date)
+    assert market['ref_date'] == backtester.valid_dates[9]
+    spot = market['equity'][TICKERS[0]]['close']
+    option = bt.OptionPosition(TICKERS[0], 5, market, strike_price=round(spot), option_type=bt.OptionType.CALL,
+                               expiry_date=market['ref_date'] + timedelta(days=60), position_type=bt.PositionType.LONG)
+    backtester.portfolio.add_position(option)
+    backtester.trade(TICKERS[0], 3, backtester.history[backtester.ref_date], bt.AssetType.EQUITY, bt.PositionType.SHORT)
+
+    greeks = backtester.greeks
+    assert greeks['symbols'] == [TICKERS[0]]
+    option.calculate_value_ql(market)
+    assert greeks['delta'][0] == pytest.approx(5 * option.option.delta() - 3, rel=1e-6)
+    assert greeks['gamma'][0] == pytest.approx(5 * option.option.gamma(), rel=1e-6)
+    assert greeks['vega'][0] == pytest.approx(5 * option.option.vega(), rel=1e-6)
+    assert greeks['rho'][0] == pytest.approx(5 * option.option.rho(), rel=1e-6)
+
+
+def test_expired_option_is_settled_and_excluded(data_path):
+    backtester = Idle(TICKERS, '2023-03-01', '2023-06-30', 100000, 4, 'EOD', False)
+    backtester._on_start()
+    backtester.history.advance(30)
+    entry = backtester.valid_dates[0].isoformat()
+    extra = backtester.market.market_data.extra(entry)
+    extra['rate']['riskfree'] = 0.03
+    extra['volatility'][TICKERS[1]] = _surface()
+    market = backtester.pricing_data(entry)
+    option = bt.OptionPosition(TICKERS[1], 2, market, strike_price=100, option_type=bt.OptionType.PUT,
+                               expiry_date=backtester.valid_dates[5], position_type=bt.PositionType.LONG)
+    backtester.portfolio.add_position(option)
+
+    backtester.ref_date = backtester.valid_dates[29].isoformat()
+    greeks = backtester.greeks
+    assert greeks['symbols'] == []
+    assert not option.is_open
+    assert np.isfinite(option.closed_pnl)
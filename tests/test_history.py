@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from backtester.core import history as history_module
+from conftest import TICKERS
+
+
+class Recorder(bt.Backtester):
+    """Registra a ogni step quello che on_data vede della storia."""
+
+    def on_data(self):
+        self.seen.append((self.ref_date, len(self.history), str(self.history.index[-1]),
+                          self.history.close[-1].copy()))
+
+
+def _start(start='2023-03-01', end='2023-04-28'):
+    backtester = Recorder(TICKERS, start, end, 100000, 4, 'EOD', False)
+    backtester.seen = []
+    return backtester
+
+
+def test_on_data_sees_only_the_past(data_path):
+    backtester = _start()
+    backtester.backtest()
+    store = backtester.market.eod_store
+    # l'ultimo giorno chiude le posizioni senza chiamare on_data
+    assert [seen[0] for seen in backtester.seen] == [d.isoformat() for d in backtester.valid_dates[:-1]]
+    for t, (ref_date, size, last, close) in enumerate(backtester.seen, 1):
+        assert size == t
+        assert last == ref_date
+        np.testing.assert_array_equal(close, store.field('close')[backtester.grid_rows[t - 1]])
+
+
+def test_advance_until_and_field_views(data_path):
+    backtester = _start()
+    backtester._on_start()
+    history = backtester.history
+    history.advance(5)
+    assert history.close.shape == (5, len(TICKERS))
+    assert not history.close.flags.writeable
+    with pytest.raises(ValueError):
+        history.close[0, 0] = 0
+
+    view = history.until(2)
+    assert len(view) == 2 and len(history) == 5
+    assert np.shares_memory(view.close, history.close)
+    assert list(view) == [d.isoformat() for d in backtester.valid_dates[:2]]
+    with pytest.raises(KeyError):
+        history.field('missing')
+
+
+def test_mapping_hides_future_dates(data_path):
+    backtester = _start()
+    backtester._on_start()
+    history = backtester.history
+    history.advance(3)
+    today, tomorrow = backtester.valid_dates[2].isoformat(), backtester.valid_dates[3].isoformat()
+    snapshot = history[today]
+    assert snapshot['equity'][TICKERS[0]]['close'] == history.close[-1, history.column(TICKERS[0])]
+    assert history[today] is snapshot
+    assert tomorrow not in history
+    with pytest.raises(KeyError):
+        history[tomorrow]
+    history.advance(4)
+    assert tomorrow in history
+
+
+def test_to_frame_and_get_history(data_path):
+    backtester = _start()
+    backtester._on_start()
+    backtester.history.advance(10)
+    frame = backtester.prices_to_df('close')
+    assert list(frame.columns) == TICKERS
+    assert list(frame.index) == [d.isoformat() for d in backtester.valid_dates[:10]]
+    np.testing.assert_array_equal(frame.to_numpy(), backtester.history.close)
+
+    # get_history: giornate complete fino alla data inclusa, anche per date fuori griglia
+    ref_date = backtester.valid_dates[6].isoformat()
+    past = backtester.get_history(ref_date)
+    assert len(past) == 7
+    assert 'EOD' in past[ref_date]
+    holiday = pd.Timestamp('2023-04-07').date().isoformat()
+    assert len(backtester.get_history(holiday)) == len([d for d in backtester.valid_dates if d.isoformat() <= holiday])
+
+
+def test_snapshot_cache_is_bounded(data_path):
+    backtester = _start()
+    backtester.backtest()
+    history = backtester.history
+    assert len(history._snapshots) <= history_module.SNAPSHOT_CACHE
+    # le date uscite dalla cache vengono ricostruite alla richiesta
+    first = backtester.valid_dates[0].isoformat()
+    assert history[first]['equity'][TICKERS[1]]['close'] == history.close[0, history.column(TICKERS[1])]
+    assert len(history._snapshots) <= history_module.SNAPSHOT_CACHE
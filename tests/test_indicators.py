@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+
+
+@pytest.fixture(scope="module")
+def bars():
+    rng = np.random.default_rng(0)
+    close = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (300, 4)), axis=0)))
+    return {
+        'close': close,
+        'high': close * (1 + rng.random(close.shape) * 0.01),
+        'low': close * (1 - rng.random(close.shape) * 0.01),
+        'volume': pd.DataFrame(rng.integers(100, 1000, close.shape).astype(float)),
+    }
+
+
+@pytest.mark.parametrize("cls", [bt.SMA, bt.EMA, bt.RSI, bt.ATR, bt.VWAP])
+def test_online_matches_batch(cls, bars):
+    indicator = cls(window=20)
+    batch = indicator.batch(*(bars[f] for f in indicator.fields)).to_numpy()
+    online = np.array([indicator.update(*(bars[f].to_numpy()[t] for f in indicator.fields))
+                       for t in range(len(bars['close']))])
+    np.testing.assert_array_equal(np.isnan(batch), np.isnan(online))
+    np.testing.assert_allclose(online, batch, rtol=1e-9, atol=1e-9)
+
+
+def test_scalar_update():
+    sma = bt.SMA(window=3)
+    assert [sma.update(x) for x in [1, 2, 3, 4]][2:] == [2.0, 3.0]
+
+
+def test_indicator_hooks_are_abstract():
+    class Incomplete(bt.Indicator):
+        def batch(self, close):
+            return close
+
+    with pytest.raises(TypeError):
+        Incomplete()
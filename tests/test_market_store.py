@@ -0,0 +1,87 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import backtester as bt
+from conftest import TICKERS, make_store
+
+
+def _bar(close):
+    return {'open': close - 1, 'high': close + 1, 'low': close - 2, 'close': close, 'volume': 100.0}
+
+
+def test_builder_aligns_tickers_on_union_index():
+    builder = bt.MarketStoreBuilder('D')
+    builder.add_bar('A', '2024-01-02', _bar(10.0))
+    builder.add_bar('A', '2024-01-04', _bar(11.0))
+    builder.add_frame('B', np.array(['2024-01-03', '2024-01-04'], dtype='datetime64[D]'),
+                      np.array([[1, 2, 0, 1.5, 10], [2, 3, 1, 2.5, 20]], dtype=float))
+    store = builder.build()
+    assert store.tickers == ['A', 'B']
+    assert np.datetime_as_string(store.index).tolist() == ['2024-01-02', '2024-01-03', '2024-01-04']
+    close = store.field('close')
+    np.testing.assert_array_equal(close[:, 0], [10.0, np.nan, 11.0])
+    np.testing.assert_array_equal(close[:, 1], [np.nan, 1.5, 2.5])
+    assert store.row('2024-01-03') == 1
+    with pytest.raises(KeyError):
+        store.row('2024-01-06')
+
+
+def test_views_match_the_nested_dict_layout():
+    store = make_store()
+    store.data['close'][2, 1] = np.nan
+    market = bt.MarketDataView(store)
+    day = market['2023-01-04']
+    assert day['ref_date'] == date(2023, 1, 4)
+    snapshot = day['EOD']
+    assert snapshot['ref_date'] == '2023-01-04'
+    assert snapshot['equity'][TICKERS[0]]['close'] == store.field('close')[2, 0]
+    # barra mancante: il ticker non compare, come nel vecchio dizionario
+    assert TICKERS[1] not in snapshot['equity']
+    assert list(snapshot['equity']) == [TICKERS[0], TICKERS[2]]
+    assert snapshot['rate'] == {} and snapshot['volatility'] == {}
+    with pytest.raises(KeyError):
+        market['2023-01-07']
+    nested = bt.MarketDataView.from_dict(market.to_dict())
+    np.testing.assert_array_equal(nested.eod.field('close'), store.field('close'))
+
+
+def test_save_and_load_memory_mapped(tmp_path):
+    store = make_store()
+    store.save(str(tmp_path))
+    loaded = bt.MarketStore.load(str(tmp_path))
+    assert isinstance(loaded.field('close'), np.memmap)
+    assert loaded.tickers == store.tickers
+    np.testing.assert_array_equal(loaded.index, store.index)
+    for field in bt.FIELDS:
+        np.testing.assert_array_equal(loaded.field(field), store.field(field))
+    with pytest.raises(FileNotFoundError):
+        bt.MarketStore.load(str(tmp_path / 'missing'))
+
+
+def test_subset_reads_window_with_lookback(tmp_path):
+    store = make_store()
+    store.save(str(tmp_path))
+    subset = bt.MarketStore.load(str(tmp_path), tickers=[TICKERS[2], 'ZZZ', TICKERS[0]],
+                                 start='2023-03-01', end='2023-03-31', lookback=3)
+    assert subset.tickers == [TICKERS[2], TICKERS[0]]
+    first = store.row('2023-03-01')
+    assert subset.index[0] == store.index[first - 3]
+    assert str(subset.index[-1]) == '2023-03-31'
+    np.testing.assert_array_equal(subset.field('close'),
+                                  store.field('close')[first - 3:store.row('2023-03-31') + 1][:, [2, 0]])
+    assert store.subset(lookback=None, start='2023-03-01').index[0] == store.index[0]
+    assert store.subset() is store
+
+
+def test_subset_of_contiguous_tickers_is_a_view(tmp_path):
+    make_store().save(str(tmp_path))
+    store = bt.MarketStore.load(str(tmp_path))
+    contiguous = store.subset(TICKERS[1:], '2023-03-01', '2023-03-31')
+    for field in bt.FIELDS:
+        # nessuna copia: i campi restano pagine del file in memory-map
+        assert np.shares_memory(contiguous.field(field), store.field(field))
+    reordered = store.subset(TICKERS[::-1], '2023-03-01', '2023-03-31')
+    assert not np.shares_memory(reordered.field('close'), store.field('close'))
+    np.testing.assert_array_equal(contiguous.field('close'), reordered.field('close')[:, 1::-1])
@@ -0,0 +1,16 @@
+import backtester as bt
+
+
+def test_package_keeps_the_baseline_names():
+    # nomi che il package esportava già (anche i moduli importati da data_handler e dal core)
+    for name in ('ql', 'np', 'pd', 'date', 'datetime', 'timedelta', 'os', 'json', 'plt', 'blp',
+                 'Backtester', 'Factor', 'Portfolio', 'EquityPosition', 'OptionPosition', 'TradeId',
+                 'Analytics', 'AssetType', 'PositionType', 'MarketData', 'MarketDataHandler', 'get_file_names'):
+        assert hasattr(bt, name), name
+
+
+def test_fetch_and_data_handler_export_only_their_public_names():
+    for name in ('time', 'pickle', 'threading', 'pa', 'pq', 'OrderedDict'):
+        assert not hasattr(bt, name), name
+    for name in ('FetchScheduler', 'RecordingBlp', 'ReplayBlp'):
+        assert hasattr(bt, name), name
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from conftest import TICKERS, Crossover
+
+
+@pytest.fixture
+def backtester(data_path):
+    backtester = Crossover(TICKERS, '2023-02-01', '2023-08-31')
+    backtester.backtest()
+    return backtester
+
+
+def test_metrics_match_pandas(backtester):
+    analytics = bt.Analytics(backtester)
+    trades = backtester.positions_summary
+    closed = trades[trades['is_alive'] == False]['closed_pnl']
+    pnl = backtester.period_pnl['daily_pnl'].replace(0, np.nan)
+    returns = pnl.pct_change().dropna()
+    running_max = backtester.period_pnl['daily_pnl'].cummax()
+
+    assert analytics.expected_return() == pytest.approx(returns.mean())
+    assert analytics.std_deviation() == pytest.approx(returns.std())
+    assert analytics.sharpe_ratio() == pytest.approx(returns.mean() / returns.std())
+    assert analytics.win_rate() == pytest.approx((closed > 0).sum() / len(closed))
+    assert analytics.average_pnl() == pytest.approx(closed.mean())
+    assert analytics.average_win() == pytest.approx(closed[closed > 0].mean())
+    assert analytics.average_loss() == pytest.approx(closed[closed < 0].mean())
+    assert analytics.max_profit() == trades['closed_pnl'].max()
+    assert analytics.max_loss() == trades['closed_pnl'].min()
+    assert analytics.profit_factor() == pytest.approx(closed[closed > 0].sum() / abs(closed[closed < 0].sum()))
+    assert analytics.number_of_trades() == trades[trades['is_alive'] == False]['trade_id'].nunique()
+    assert analytics.max_drawdown() == pytest.approx(((backtester.period_pnl['daily_pnl'] - running_max) / running_max).min())
+    assert set(analytics.summary()) >= {'Sharpe Ratio', 'N. Trade', 'Max Drawdown'}
+
+
+def test_intermediates_are_computed_once(backtester):
+    analytics = bt.Analytics(backtester)
+    assert analytics.returns is analytics.returns
+    assert analytics.closed_pnl is analytics.closed_pnl
+    # Analytics lavora su copie: il backtester non viene modificato
+    analytics.summary()
+    assert not (backtester.period_pnl['daily_pnl'].isna()).any()
+
+
+def test_metrics_without_trades(backtester):
+    analytics = bt.Analytics(backtester)
+    analytics.trades_df = analytics.trades_df.iloc[:0]
+    assert analytics.win_rate() == 0
+    assert np.isnan(analytics.average_pnl()) and np.isnan(analytics.average_win())
+    assert analytics.profit_factor() == 1
+    assert analytics.number_of_trades() == 0
+
+
+def _reference_trade_log(trades):
+    """Trade log riga per riga: prima riga aperta e prima riga chiusa di ogni trade."""
+    rows = []
+    for trade_id in pd.unique(trades['trade_id']):
+        trade = trades[trades['trade_id'] == trade_id]
+        opened, closed = trade[trade['is_alive'] == True], trade[trade['is_alive'] == False]
+        if len(opened) and len(closed):
+            rows += [opened.iloc[0], closed.iloc[0]]
+    return pd.DataFrame(rows).reset_index(drop=True)
+
+
+def test_trade_log_pairs_open_and_close(backtester):
+    analytics = bt.Analytics(backtester)
+    log = analytics.trade_log()
+    pd.testing.assert_frame_equal(log, _reference_trade_log(backtester.positions_summary), check_dtype=False)
+    assert log['is_alive'].tolist() == [True, False] * (len(log) // 2)
+    assert analytics.trade_log() is not log
+
+
+def test_signals_by_symbol():
+    trades = pd.DataFrame({
+        'ref_date': ['d1', 'd1', 'd2', 'd2', 'd2', 'd3', 'd3', 'd3', 'd3'],
+        'trade_date': ['d1', 'd1', 'd1', 'd1', 'd2', 'd1', 'd1', 'd2', 'd3'],
+        'trade_id': [1, 2, 1, 2, 4, 1, 2, 4, 3],
+        'symbol': ['A', 'B', 'A', 'B', 'B', 'A', 'B', 'B', 'A'],
+        'side': [1, -1, 1, -1, 1, 1, -1, 1, 1],
+        'quantity': [5, 3, 5, 0, 0, 0, 0, 0, 2],
+        'entry_price': [10.0, 20.0, 10.0, 20.0, 21.0, 10.0, 20.0, 21.0, 11.0],
+        'is_alive': [True, True, True, False, False, False, False, False, True],
+        'closed_pnl': [0.0, 0.0, 0.0, 4.0, 1.5, -2.0, 4.0, 1.5, 0.0],
+    })
+    period_pnl = pd.DataFrame({'ref_date': ['d1', 'd2', 'd3'], 'daily_pnl': [100.0, 104.0, 102.0]})
+    source = type('Source', (), {'positions_summary': trades, 'period_pnl': period_pnl})()
+    analytics = bt.Analytics(source)
+
+    log = analytics.trade_log()
+    assert log['trade_id'].tolist() == [1, 1, 2, 2, 4, 4, 3, 3]
+    # trade 4 aperto e chiuso nello stesso step: l'apertura è ricostruita dalla sola riga chiusa
+    assert log.loc[4, ['ref_date', 'is_alive', 'closed_pnl']].tolist() == ['d2', True, 0.0]
+    assert np.isnan(log.loc[4, 'quantity'])
+    assert log.loc[5, ['ref_date', 'is_alive', 'closed_pnl']].tolist() == ['d2', False, 1.5]
+    # trade 3 ancora aperto: la chiusura resta a NaN
+    assert log.loc[6, ['ref_date', 'is_alive', 'quantity']].tolist() == ['d3', True, 2]
+    assert pd.isna(log.loc[7, 'ref_date']) and np.isnan(log.loc[7, 'closed_pnl'])
+    assert log.loc[7, 'symbol'] == 'A' and log.loc[7, 'entry_price'] == 11.0
+
+    signals = analytics.signals('A')
+    assert list(signals.index) == ['d1', 'd3', 'd3']
+    assert sorted(signals['signal'].loc['d3']) == [0, 1]
+    assert analytics.signals('B')['signal'].tolist() == [-1, 0, 1, 0]
+    assert analytics.signals('C').empty
@@ -0,0 +1,127 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import backtester as bt
+from backtester.core.pricing import price_options
+from backtester.market_store import MarketDataView
+from conftest import TICKERS, Crossover, make_store
+
+
+@pytest.fixture
+def market():
+    return MarketDataView(make_store())
+
+
+def _snapshot(market, date_iso):
+    return market[date_iso]['EOD']
+
+
+def test_trade_ids_are_per_portfolio(market):
+    snapshot = _snapshot(market, '2023-01-03')
+    first, second = bt.Portfolio(), bt.Portfolio()
+    for portfolio in (first, second):
+        portfolio.add_position(bt.EquityPosition(TICKERS[0], 1, snapshot, bt.PositionType.LONG,
+                                                 trade_ids=portfolio.trade_ids))
+        # senza allocatore l'id è assegnato da add_position
+        portfolio.add_position(bt.EquityPosition(TICKERS[1], 1, snapshot, bt.PositionType.SHORT))
+    assert [p.trade_id for p in first.positions] == [1, 2]
+    assert [p.trade_id for p in second.positions] == [1, 2]
+
+
+def test_backtests_do_not_share_trade_ids(data_path):
+    first = Crossover(TICKERS, '2023-02-01', '2023-06-30')
+    first.backtest()
+    other = Crossover(TICKERS, '2023-02-01', '2023-06-30', window=3)
+    other.backtest()
+    ids = first.positions_summary['trade_id'].unique()
+    np.testing.assert_array_equal(np.sort(ids), np.arange(1, len(ids) + 1))
+    # un secondo run dello stesso backtester riparte da 1 senza toccare l'altro
+    first.backtest()
+    np.testing.assert_array_equal(first.positions_summary['trade_id'].unique(), ids)
+    assert other.positions_summary['trade_id'].min() == 1
+
+
+def test_positions_columns_closed_rows():
+    store = make_store()
+    store.data['close'][10:, 1] = np.nan  # BBB non quota più dopo la chiusura
+    market = MarketDataView(store)
+    entry, exit, later = (_snapshot(market, d) for d in ('2023-01-03', '2023-01-10', '2023-01-20'))
+    portfolio = bt.Portfolio()
+    kept = bt.EquityPosition(TICKERS[0], 10, entry, bt.PositionType.LONG)
+    closed = bt.EquityPosition(TICKERS[1], 4, entry, bt.PositionType.SHORT)
+    quoted = bt.EquityPosition(TICKERS[2], 2, entry, bt.PositionType.LONG)
+    for position in (kept, closed, quoted):
+        portfolio.add_position(position)
+    closed.close_position(exit)
+    quoted.close_position(exit)
+    exit_price = exit['equity'][TICKERS[1]]['close']
+
+    columns = portfolio.positions_columns(later)
+    # current_value è il valore di mercato alla data anche per le chiuse, NaN se il simbolo non quota
+    assert np.isnan(columns['current_value'][1])
+    assert columns['current_value'][2] == later['equity'][TICKERS[2]]['close']
+    assert columns['current_value'][0] == later['equity'][TICKERS[0]]['close']
+    # il valore di uscita è in una colonna a parte
+    assert np.isnan(columns['exit_value'][0])
+    assert columns['exit_value'][1] == pytest.approx(exit_price)
+    assert columns['exit_value'][2] == pytest.approx(exit['equity'][TICKERS[2]]['close'])
+    assert columns['closed_pnl'][1] == pytest.approx((exit_price - closed.entry_price) * -4)
+    assert columns['open_pnl'][1] == 0
+    assert columns['global_pnl'][0] == pytest.approx((columns['current_value'][0] - kept.entry_price) * 10)
+
+
+def test_open_positions_index_and_quantities(market):
+    entry, exit = _snapshot(market, '2023-01-03'), _snapshot(market, '2023-01-05')
+    portfolio = bt.Portfolio()
+    longs = [bt.EquityPosition(TICKERS[0], q, entry, bt.PositionType.LONG) for q in (5, 3)]
+    short = bt.EquityPosition(TICKERS[0], 2, entry, bt.PositionType.SHORT)
+    other = bt.EquityPosition(TICKERS[1], 7, entry, bt.PositionType.LONG)
+    for position in (*longs, short, other):
+        portfolio.add_position(position)
+
+    key = (TICKERS[0], bt.AssetType.EQUITY)
+    assert portfolio.get_positions(*key) == [*longs, short]
+    assert portfolio.position_quantity(*key) == 10
+    assert portfolio.net_quantity(*key) == 6
+    assert portfolio.get_positions(TICKERS[2], bt.AssetType.EQUITY) == []
+    assert portfolio.position_quantity(TICKERS[2], bt.AssetType.EQUITY) == 0
+
+    longs[0].close_position(exit)
+    assert portfolio.get_positions(*key) == [longs[1], short]
+    assert portfolio.get_positions(*key, include_closed=True) == [longs[1], short, longs[0]]
+    assert portfolio.position_quantity(*key) == 5
+    assert portfolio.net_quantity(*key) == 1
+
+    portfolio.close_positions(TICKERS[0], bt.AssetType.EQUITY, exit)
+    assert portfolio.get_positions(*key) == []
+    assert portfolio.position_quantity(*key) == 0 and portfolio.net_quantity(*key) == 0
+    assert len(portfolio.get_positions(*key, include_closed=True)) == 3
+    assert portfolio.get_positions(TICKERS[1], bt.AssetType.EQUITY) == [other]
+
+
+def test_positions_columns_closed_options_at_market():
+    surface = {'moneyness': [0.8, 1.0, 1.2], 'tenor': [30, 90, 180],
+               'volatility': [[0.30, 0.28, 0.27], [0.25, 0.24, 0.23], [0.27, 0.26, 0.25]]}
+
+    def market(day, spot):
+        return {'ref_date': day, 'equity': {'AAA': {'close': spot}}, 'rate': {'riskfree': 0.03},
+                'volatility': {'AAA': surface}}
+
+    start = date(2023, 3, 1)
+    portfolio = bt.Portfolio()
+    options = [bt.OptionPosition('AAA', 1, market(start, 100.0), strike_price=100, option_type=bt.OptionType.CALL,
+                                 expiry_date=start + timedelta(days=days), position_type=bt.PositionType.LONG)
+               for days in (60, 10)]
+    for option in options:
+        portfolio.add_position(option)
+        option.close_position(market(start + timedelta(days=5), 104.0))
+
+    later = market(start + timedelta(days=20), 98.0)
+    columns = portfolio.positions_columns(later)
+    # chiusa e non scaduta: rivalutata alla data; scaduta: 0
+    assert columns['current_value'][0] == pytest.approx(price_options([options[0]], later)[0])
+    assert columns['current_value'][1] == 0
+    assert not columns['is_alive'].any()
+    assert np.isfinite(columns['exit_value']).all()
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+import QuantLib as ql
+
+import backtester as bt
+from backtester.core.pricing import SurfaceCache, bsm_price, price_options
+
+REF_DATE = date(2023, 6, 1)
+
+
+def _surface(level=0.25):
+    """Superficie con smile sulla moneyness e struttura a termine crescente."""
+    moneyness = np.array([0.7, 0.9, 1.0, 1.1, 1.3])
+    tenor = np.array([7, 30, 90, 180, 365])
+    volatility = level + 0.5 * (moneyness[:, None] - 1) ** 2 + 0.02 * tenor[None, :] / 365
+    return {'moneyness': moneyness.tolist(), 'tenor': tenor.tolist(), 'volatility': volatility.tolist()}
+
+
+def _market(ref_date=REF_DATE):
+    return {
+        'ref_date': ref_date,
+        'equity': {'AAA': {'close': 100.0}, 'BBB': {'close': 52.5, 'div_yield': 0.02}},
+        'rate': {'riskfree': 0.035},
+        'volatility': {'AAA': _surface(0.22), 'BBB': _surface(0.31)},
+    }
+
+
+def _options(market):
+    options = []
+    for symbol, spot in (('AAA', 100.0), ('BBB', 52.5)):
+        for moneyness in (0.8, 1.0, 1.15):
+            for days in (10, 45, 200):
+                for option_type in (bt.OptionType.CALL, bt.OptionType.PUT):
+                    options.append(bt.OptionPosition(symbol, 1, market, strike_price=round(spot * moneyness, 2),
+                                                     expiry_date=market['ref_date'] + timedelta(days=days),
+                                                     option_type=option_type, position_type=bt.PositionType.LONG))
+    return options
+
+
+def _quantlib_price(spot, strike, t, rate, div_yield, sigma, option_type):
+    today = ql.Date(1, 6, 2023)
+    ql.Settings.instance().evaluationDate = today
+    day_count = ql.Actual365Fixed()
+    maturity = today + int(round(t * 365))
+    option = ql.VanillaOption(ql.PlainVanillaPayoff(option_type, strike), ql.EuropeanExercise(maturity))
+    process = ql.BlackScholesMertonProcess(
+        ql.QuoteHandle(ql.SimpleQuote(spot)),
+        ql.YieldTermStructureHandle(ql.FlatForward(today, div_yield, day_count)),
+        ql.YieldTermStructureHandle(ql.FlatForward(today, rate, day_count)),
+        ql.BlackVolTermStructureHandle(ql.BlackConstantVol(today, ql.TARGET(), sigma, day_count)))
+    option.setPricingEngine(ql.AnalyticEuropeanEngine(process))
+    return option.NPV()
+
+
+@pytest.mark.parametrize('option_type', [ql.Option.Call, ql.Option.Put])
+def test_bsm_price_matches_quantlib(option_type):
+    strike = np.array([70.0, 95.0, 100.0, 110.0, 140.0])
+    t = np.array([5, 30, 91, 182, 730]) / 365
+    sigma = np.array([0.15, 0.2, 0.25, 0.4, 0.6])
+    prices = bsm_price(100.0, strike, t, 0.03, 0.01, sigma, option_type)
+    expected = [_quantlib_price(100.0, k, tt, 0.03, 0.01, s, option_type) for k, tt, s in zip(strike, t, sigma)]
+    np.testing.assert_allclose(prices, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_price_options_matches_calculate_value_ql():
+    market = _market()
+    options = _options(market)
+    batch = price_options(options, market, SurfaceCache())
+    expected = [option.calculate_value_ql(market) for option in options]
+    np.testing.assert_allclose(batch, expected, rtol=1e-9, atol=1e-10)
+    assert options[0].calculate_value(market) == pytest.approx(expected[0], rel=1e-9)
+    assert len(price_options([], market)) == 0
+
+
+def test_price_options_with_other_day_count():
+    market = _market()
+    option = bt.OptionPosition('AAA', 1, market, strike_price=100, expiry_date=REF_DATE + timedelta(days=120),
+                               option_type=bt.OptionType.CALL, position_type=bt.PositionType.LONG,
+                               day_count=ql.Actual360())
+    assert price_options([option], market, SurfaceCache())[0] == pytest.approx(option.calculate_value_ql(market), rel=1e-9)
+
+
+def test_surface_cache_reuses_interpolators():
+    cache = SurfaceCache()
+    market = _market()
+    first = cache.get('AAA', market)
+    assert cache.get('AAA', market) is first
+    assert cache.get('BBB', market) is not first
+    # nuova superficie per lo stesso giorno: l'interpolatore viene ricostruito
+    market['volatility']['AAA'] = _surface(0.3)
+    second = cache.get('AAA', market)
+    assert second is not first
+    # nuova data: la cache riparte da zero
+    later = _market(REF_DATE + timedelta(days=1))
+    later['volatility']['AAA'] = market['volatility']['AAA']
+    assert cache.get('AAA', later) is not second
+    assert cache._ref_date == later['ref_date']
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+import backtester as bt
+from conftest import TICKERS, Crossover
+
+
+def test_record_buffer_matches_concat():
+    steps = [
+        [{'symbol': 'A', 'pnl': 1.0}, {'symbol': 'B', 'pnl': 2.0}],
+        [],
+        [{'symbol': 'A', 'pnl': 3.0}],
+    ]
+    buffer = bt.RecordBuffer()
+    for records in steps:
+        buffer.append(records)
+    expected = pd.concat([pd.DataFrame(records) for records in steps if records])
+    pd.testing.assert_frame_equal(buffer.to_frame(), expected)
+    assert len(buffer) == 3
+
+
+def test_record_buffer_columns_and_cache():
+    buffer = bt.RecordBuffer()
+    buffer.extend({'a': np.array([1.0, 2.0])})
+    frame = buffer.to_frame()
+    assert buffer.to_frame() is frame
+    # colonna nuova in un blocco successivo: None per i blocchi precedenti e viceversa
+    buffer.extend({'b': ['x']})
+    frame = buffer.to_frame()
+    assert list(frame.columns) == ['a', 'b']
+    assert frame['a'].isna().tolist() == [False, False, True]
+    assert frame['b'].isna().tolist() == [True, True, False]
+    assert frame.index.tolist() == [0, 1, 0]
+
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.to_frame().empty
+
+
+def test_positions_summary_is_one_block_per_step(data_path):
+    backtester = Crossover(TICKERS, '2023-02-01', '2023-04-28')
+    backtester.backtest()
+    summary = backtester.positions_summary
+    assert backtester.positions_summary is summary
+    assert list(summary.columns[:3]) == ['ref_date', 'trade_date', 'trade_id']
+    # a ogni step ci sono tutte le posizioni aperte fino a quel giorno, indice da 0
+    for ref_date, block in summary.groupby('ref_date', sort=False):
+        assert block.index.tolist() == list(range(len(block)))
+        assert block['trade_id'].tolist() == sorted(block['trade_id'])
+    last = summary[summary['ref_date'] == summary['ref_date'].iloc[-1]]
+    assert not last['is_alive'].any()
+    final = backtester.period_pnl['daily_pnl'].iloc[-1]
+    assert last['global_pnl'].sum() + backtester.starting_balance == final
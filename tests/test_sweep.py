@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from backtester import data_handler
+from conftest import TICKERS, Crossover
+
+KWARGS = dict(universe=TICKERS, start_date='2023-02-01', end_date='2023-09-29')
+
+
+def test_param_grid():
+    assert bt.param_grid({'a': [1, 2], 'b': ['x']}) == [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'x'}]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_matches_single_runs(data_path, workers):
+    result = bt.sweep(Crossover, KWARGS, {'window': [3, 10]}, workers=workers)
+    assert list(result['window']) == [3, 10]
+    for i, window in enumerate([3, 10]):
+        backtester = Crossover(**KWARGS, window=window)
+        backtester.backtest()
+        expected = bt.Analytics(backtester).summary()
+        assert result.loc[i, 'Sharpe Ratio'] == pytest.approx(pd.to_numeric(expected['Sharpe Ratio']))
+        assert result.loc[i, 'N. Trade'] == pd.to_numeric(expected['N. Trade'])
+
+
+def test_attribute_params_are_set_before_backtest(data_path):
+    result = bt.sweep(Crossover, KWARGS, [{'window': 5, 'quantity': 10}, {'window': 5, 'quantity': 20}], workers=1)
+    assert list(result['quantity']) == [10, 20]
+    assert result.loc[1, 'Average P&L'] == pytest.approx(2 * result.loc[0, 'Average P&L'])
+
+
+def test_loaded_stores_are_bounded_and_reused(data_path, monkeypatch):
+    monkeypatch.setattr(data_handler, 'LOADED_SIZE', 2)
+    bt.MarketDataHandler.clear_loaded()
+    first = bt.MarketDataHandler()
+    first.load_market(TICKERS, '2023-02-01', '2023-03-31')
+    again = bt.MarketDataHandler()
+    again.load_market(TICKERS, '2023-02-01', '2023-03-31')
+    assert again.eod_store is first.eod_store
+    for end in ('2023-04-28', '2023-05-31'):
+        bt.MarketDataHandler().load_market(TICKERS, '2023-02-01', end)
+    assert len(data_handler._LOADED) == 2
+    evicted = bt.MarketDataHandler()
+    evicted.load_market(TICKERS, '2023-02-01', '2023-03-31')
+    assert evicted.eod_store is not first.eod_store
+    np.testing.assert_array_equal(evicted.eod_store.field('close'), first.eod_store.field('close'))
+
+
+def test_workers_open_the_loaded_window_memory_mapped(data_path, tmp_path):
+    market = bt.MarketDataHandler()
+    market.load_market(TICKERS[:2], '2023-02-01', '2023-03-31')
+    key = market.save_loaded(str(tmp_path), TICKERS[:2], '2023-02-01', '2023-03-31')
+    bt.MarketDataHandler.clear_loaded()
+    bt.MarketDataHandler.open_loaded(key, str(tmp_path))
+
+    worker = bt.MarketDataHandler()
+    worker.load_market(TICKERS[:2], '2023-02-01', '2023-03-31')
+    assert isinstance(worker.eod_store.field('close'), np.memmap)
+    assert worker.intraday_store is None
+    np.testing.assert_array_equal(worker.eod_store.field('close'), market.eod_store.field('close'))
+    assert worker.eod_store.tickers == market.eod_store.tickers
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from backtester.core.vectorized import weights_backtest
+from conftest import TICKERS
+
+
+class Idle(bt.Backtester):
+    def on_data(self):
+        pass
+
+
+def _reference(prices, weights, starting_balance, cost):
+    """Backtest a pesi giorno per giorno: quantità tenute, deriva dei prezzi e ribilanciamento in chiusura."""
+    weights = np.nan_to_num(np.array(weights, dtype=float))
+    weights[-1] = 0
+    equity, shares = starting_balance, np.zeros(prices.shape[1])
+    curve = []
+    for t in range(len(prices)):
+        pre_trade = equity + (shares @ (prices[t] - prices[t - 1]) if t else 0)
+        drifted = shares * prices[t] / pre_trade
+        equity = pre_trade * (1 - cost * np.abs(weights[t] - drifted).sum())
+        shares = weights[t] * equity / prices[t]
+        curve.append(equity)
+    return np.array(curve)
+
+
+def _random(seed=1, days=60):
+    rng = np.random.default_rng(seed)
+    prices = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (days, 3)), axis=0))
+    weights = np.round(rng.normal(0, 0.4, (days, 3)), 1)
+    weights[rng.random((days, 3)) < 0.3] = 0
+    return prices, weights
+
+
+@pytest.mark.parametrize('cost', [0.0, 0.001])
+def test_weights_backtest_matches_loop(cost):
+    prices, weights = _random()
+    result = weights_backtest(prices, weights, 1000.0, cost)
+    np.testing.assert_allclose(result['equity'], _reference(prices, weights, 1000.0, cost), rtol=1e-12)
+    # pnl per ticker e per trade riconciliano l'equity
+    np.testing.assert_allclose(1000.0 + np.cumsum(result['pnl'].sum(axis=1)), result['equity'], rtol=1e-12)
+    assert result['closed_pnl'].sum() == pytest.approx(result['equity'][-1] - 1000.0)
+
+
+def test_weights_backtest_trades():
+    prices = np.full((6, 1), 10.0)
+    weights = np.array([[0.5], [0.5], [-0.5], [0.0], [0.5], [0.5]])
+    result = weights_backtest(prices, weights, 100.0)
+    # long, short e long: tre trade, l'ultimo chiuso a fine backtest
+    assert result['trade_id'][:, 0].tolist() == [1, 1, 2, 0, 3, 0]
+    assert result['side'][:, 0].tolist() == [1, 1, -1, 0, 1, 0]
+    assert result['close_row'].tolist() == [0, 2, 3, 5]
+    np.testing.assert_allclose(result['quantity'][:, 0], [5, 5, 5, 0, 5, 0])
+
+
+def test_backtest_vectorized(data_path):
+    backtester = Idle(TICKERS, '2023-02-01', '2023-06-30', 100000, 4, 'EOD', False)
+    backtester._on_start()
+    dates = pd.to_datetime(backtester.valid_dates)
+    rng = np.random.default_rng(3)
+    signals = pd.DataFrame(rng.choice([-1, 0, 1], (len(dates), len(TICKERS))), index=dates, columns=TICKERS)
+
+    backtester.backtest_vectorized(signals, cost=0.0005, normalize=True)
+    gross = np.abs(signals.to_numpy()).sum(axis=1, keepdims=True)
+    weights = np.divide(signals.to_numpy(), gross, out=np.zeros(signals.shape), where=gross > 0)
+    prices = backtester.history.close
+    expected = _reference(prices, weights, 100000, 0.0005)
+    np.testing.assert_allclose(list(backtester.balance.values()), expected, rtol=1e-12)
+    np.testing.assert_allclose(backtester.equity_curve['equity'], expected, rtol=1e-12)
+
+    summary = backtester.positions_summary
+    closed = summary[~summary['is_alive']]
+    assert closed['trade_id'].is_unique
+    assert set(closed['trade_id']) == set(summary['trade_id'])
+    assert closed['closed_pnl'].sum() == pytest.approx(expected[-1] - 100000)
+    assert bt.Analytics(backtester).number_of_trades() == len(closed)
+
+    # pesi come funzione del backtester, righe mancanti riempite con l'ultima nota
+    sparse = signals.iloc[::5]
+    backtester.backtest_vectorized(lambda b: sparse, normalize=True)
+    filled = sparse.reindex(dates, method='ffill').to_numpy()
+    gross = np.abs(filled).sum(axis=1, keepdims=True)
+    weights = np.divide(filled, gross, out=np.zeros(filled.shape), where=gross > 0)
+    np.testing.assert_allclose(backtester.equity_curve['equity'], _reference(prices, weights, 100000, 0), rtol=1e-12)
+
+    with pytest.raises(KeyError):
+        backtester.backtest_vectorized(signals.rename(columns={TICKERS[0]: 'ZZZ US Equity'}))
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.interpolate import RegularGridInterpolator
+
+import backtester as bt
+from backtester.core.pricing import SurfaceCache
+
+MONEYNESS = [0.8, 0.9, 1.0, 1.1, 1.2]
+TENOR = [30, 60, 90, 180]
+DATES = ['2023-01-03', '2023-01-04', '2023-01-05']
+
+
+def _frame(seed=0, drop=()):
+    """File di volatilità in formato lungo: una riga per (data, moneyness, tenor)."""
+    rng = np.random.default_rng(seed)
+    rows = [(d, m, t, 0.2 + 0.1 * (m - 1) ** 2 + 0.0002 * t + rng.normal(0, 0.005))
+            for d in DATES for m in MONEYNESS for t in TENOR if (d, m) not in drop]
+    df = pd.DataFrame(rows, columns=['date', 'moneyness', 'tenor', 'implied_vol']).set_index('date')
+    return df.sample(frac=1, random_state=seed)
+
+
+def _points():
+    return np.array([[0.85, 45], [1.0, 90], [1.17, 170], [0.7, 20], [1.3, 400]])
+
+
+def test_add_frame_pivots_long_format():
+    df = _frame()
+    store = bt.VolSurfaceStore()
+    store.add_frame('AAA', df)
+    assert store.dates('AAA').astype(str).tolist() == DATES
+    surface = store.surface('AAA', '2023-01-04')
+    assert surface['moneyness'].tolist() == MONEYNESS and surface['tenor'].tolist() == TENOR
+    row = df.loc['2023-01-04']
+    row = row[(row['moneyness'] == 1.1) & (row['tenor'] == 60)]
+    assert surface['volatility'][3, 1] == row['implied_vol'].iloc[0]
+    assert dict(surface)['ref_date'] == '2023-01-04'
+    with pytest.raises(KeyError):
+        store.surface('AAA', '2023-01-06')
+    with pytest.raises(ValueError):
+        store.add('BBB', DATES, MONEYNESS, TENOR, np.zeros((3, 5, 3)))
+
+
+def test_save_and_lazy_load(tmp_path):
+    store = bt.VolSurfaceStore()
+    store.add_frame('AAA', _frame(0))
+    store.add_frame('BBB', _frame(1))
+    store.save(str(tmp_path))
+
+    loaded = bt.VolSurfaceStore(str(tmp_path))
+    assert loaded.symbols == ['AAA', 'BBB']
+    assert loaded._surfaces == {}
+    np.testing.assert_array_equal(loaded.surface('BBB', '2023-01-05')['volatility'],
+                                  store.surface('BBB', '2023-01-05')['volatility'])
+    assert list(loaded._surfaces) == ['BBB']
+    assert isinstance(loaded._surfaces['BBB']['vols'], np.memmap)
+
+    day = loaded.day('2023-01-03')
+    assert 'AAA' in day and 'CCC' not in day
+    assert sorted(day) == ['AAA', 'BBB'] and len(day) == 2
+
+
+@pytest.mark.parametrize('precompute', [False, True])
+def test_interpolate_matches_regular_grid(precompute):
+    store = bt.VolSurfaceStore(precompute=precompute)
+    store.add_frame('AAA', _frame())
+    surface = store.surface('AAA', '2023-01-05')
+    reference = RegularGridInterpolator((surface['moneyness'], surface['tenor']), surface['volatility'],
+                                        bounds_error=False, fill_value=None)
+    np.testing.assert_allclose(surface.interpolate(_points()), reference(_points()), rtol=1e-12)
+
+
+def test_sparse_surface_drops_empty_rows():
+    store = bt.VolSurfaceStore(precompute=True)
+    store.add_frame('AAA', _frame(drop={('2023-01-04', 0.9)}))
+    surface = store.surface('AAA', '2023-01-04')
+    assert not surface.is_dense
+    assert surface['moneyness'].tolist() == [0.8, 1.0, 1.1, 1.2]
+    assert surface['volatility'].shape == (4, len(TENOR))
+    reference = RegularGridInterpolator((surface['moneyness'], surface['tenor']), surface['volatility'],
+                                        bounds_error=False, fill_value=None)
+    np.testing.assert_allclose(surface.interpolate(_points()), reference(_points()), rtol=1e-12)
+    assert store.surface('AAA', '2023-01-03').is_dense
+
+
+def test_surface_cache_uses_store_interpolation():
+    store = bt.VolSurfaceStore()
+    store.add_frame('AAA', _frame())
+    market = {'ref_date': pd.Timestamp('2023-01-03').date(), 'volatility': store.day('2023-01-03')}
+    interp = SurfaceCache().get('AAA', market)
+    np.testing.assert_array_equal(interp(_points()), store.surface('AAA', '2023-01-03').interpolate(_points()))
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester as bt
+from conftest import TICKERS, Crossover
+
+
+class Trained(Crossover):
+    """Crossover che registra cosa vede on_train."""
+
+    def on_train(self, train_dates):
+        self.trained.append((train_dates[0], train_dates[-1], len(self.history), self.ref_date))
+
+
+def _trained():
+    backtester = Trained(TICKERS, '2023-01-02', '2023-08-31')
+    backtester.trained = []
+    return backtester
+
+
+def test_walk_forward_windows():
+    assert bt.walk_forward_windows(10, 4, 3) == [(0, 4, 4, 7), (3, 7, 7, 10)]
+    assert bt.walk_forward_windows(10, 4, 3, step=2) == [(0, 4, 4, 7), (2, 6, 6, 9), (4, 8, 8, 10)]
+    assert bt.walk_forward_windows(10, 4, 3, anchored=True) == [(0, 4, 4, 7), (0, 7, 7, 10)]
+    assert bt.walk_forward_windows(4, 4, 3) == []
+    with pytest.raises(ValueError):
+        bt.walk_forward_windows(10, 0, 3)
+
+
+def test_stitch_equity():
+    def curve(equity, realized, turnover):
+        equity = np.asarray(equity, dtype=float)
+        return pd.DataFrame({'ref_date': [f"d{i}" for i in range(len(equity))], 'equity': equity,
+                             'high_water_mark': equity, 'drawdown': 0.0, 'realized_pnl': realized,
+                             'unrealized_pnl': 0.0, 'turnover': turnover, 'positions': 1})
+
+    curves = [curve([100, 110, 105], [0, 5, 5], [10, 10, 20]), curve([], [], []), curve([95, 120], [0, 20], [5, 15])]
+    stitched = bt.stitch_equity(curves, 100)
+    assert stitched['window'].tolist() == [0, 0, 0, 2, 2]
+    np.testing.assert_allclose(stitched['equity'], [100, 110, 105, 100, 125])
+    np.testing.assert_allclose(stitched['realized_pnl'], [0, 5, 5, 5, 25])
+    np.testing.assert_allclose(stitched['turnover'], [10, 10, 20, 25, 35])
+    np.testing.assert_allclose(stitched['high_water_mark'], [100, 110, 110, 110, 125])
+    np.testing.assert_allclose(stitched['drawdown'], [0, 0, 105 / 110 - 1, 100 / 110 - 1, 0])
+    assert bt.stitch_equity([], 100).empty
+
+
+def test_walk_forward_runs_each_test_window(data_path):
+    backtester = _trained()
+    oos = backtester.walk_forward(train=60, test=30)
+    windows = bt.walk_forward_windows(len(backtester.valid_dates), 60, 30)
+    assert len(backtester.windows) == len(windows)
+    for result, (train_start, train_end, test_start, test_end), trained in zip(backtester.windows, windows,
+                                                                               backtester.trained):
+        dates = backtester.valid_dates
+        assert result['train'] == (dates[train_start], dates[train_end - 1])
+        assert result['test'] == (dates[test_start], dates[test_end - 1])
+        assert result['equity_curve']['ref_date'].tolist() == [d.isoformat() for d in dates[test_start:test_end]]
+        # on_train vede la storia fino all'ultimo giorno di train, non oltre
+        assert trained == (dates[train_start], dates[train_end - 1], train_end, dates[train_end - 1].isoformat())
+        # ogni test parte da un portafoglio vuoto con id dei trade da 1
+        assert result['positions_summary']['trade_id'].min() == 1
+
+    assert len(oos) == sum(test_end - test_start for *_, test_start, test_end in windows)
+    assert oos is backtester.oos_equity
+    last = [w['equity_curve']['equity'].iloc[-1] - backtester.starting_balance for w in backtester.windows]
+    assert oos['equity'].iloc[-1] == pytest.approx(backtester.starting_balance + sum(last))
+
+
+def test_walk_forward_in_parallel_matches_sequential(data_path):
+    sequential = _trained()
+    expected = sequential.walk_forward(train=60, test=30, anchored=True)
+    parallel = _trained()
+    result = parallel.walk_forward(train=60, test=30, anchored=True, workers=2)
+    pd.testing.assert_frame_equal(result, expected)
+    for a, b in zip(parallel.windows, sequential.windows):
+        pd.testing.assert_frame_equal(a['positions_summary'], b['positions_summary'])
+
+
+def test_walk_forward_needs_enough_dates(data_path):
+    with pytest.raises(ValueError):
+        _trained().walk_forward(train=1000, test=30)